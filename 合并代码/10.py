@@ -1,211 +1,398 @@
-# author_api.py
-from flask import Flask, Blueprint, request, jsonify
-import pymysql
-
-# 创建蓝图
-author_bp = Blueprint('author', __name__, url_prefix='/api/author')
-
-# 数据库配置
-DB_CONFIG = {
-    'host': 'localhost',
-    'user': 'root',
-    'password': 'password',
-    'database': 'flutterpage',
-    'charset': 'utf8mb4'
-}
-
-
-# 获取数据库连接
-def get_db_connection():
-    return pymysql.connect(**DB_CONFIG)
-
-
-# 用户会话验证
-user_sessions = {}
-
-
-def validate_session(session_id):
-    return session_id in user_sessions
-
-
-# 获取作者小说列表
-@author_bp.route('/novels', methods=['GET'])
-def get_author_novels():
-    # 验证会话
-    session_id = request.headers.get('X-Session-ID')
-    if not validate_session(session_id):
-        return jsonify({
-            'status': 'error',
-            'message': '未授权访问'
-        }), 401
-
-    user_info = user_sessions[session_id]
-
-    # 获取查询参数
-    status = request.args.get('status')
-    page = int(request.args.get('page', 1))
-    per_page = int(request.args.get('per_page', 10))
-    offset = (page - 1) * per_page
-
-    conn = get_db_connection()
-    cursor = conn.cursor(pymysql.cursors.DictCursor)
-
-    try:
-        # 构建查询条件
-        query = "SELECT * FROM novels WHERE Author_id = %s"
-        params = [user_info['user_id']]
-
-        if status and status in ['draft', 'review', 'published']:
-            query += " AND Status = %s"
-            params.append(status)
-
-        # 获取总数
-        count_query = query.replace("SELECT *", "SELECT COUNT(*) as count")
-        cursor.execute(count_query, params)
-        total = cursor.fetchone()['count']
-
-        # 获取小说列表
-        query += " ORDER BY Updated_at DESC LIMIT %s OFFSET %s"
-        params.extend([per_page, offset])
-
-        cursor.execute(query, params)
-        novels = cursor.fetchall()
-
-        # 添加统计信息
-        for novel in novels:
-            # 章节数
-            cursor.execute("""
-                SELECT COUNT(*) as count FROM chapters
-                WHERE Novel_id = %s
-            """, (novel['Novel_id'],))
-            novel['chapter_count'] = cursor.fetchone()['count']
-
-            # 收藏数
-            cursor.execute("""
-                SELECT COUNT(*) as count FROM favorites
-                WHERE Novel_id = %s
-            """, (novel['Novel_id'],))
-            novel['favorite_count'] = cursor.fetchone()['count']
-
-            # 评论数
-            cursor.execute("""
-                SELECT COUNT(*) as count FROM comments
-                WHERE Novel_id = %s
-            """, (novel['Novel_id'],))
-            novel['comment_count'] = cursor.fetchone()['count']
-
-        return jsonify({
-            'status': 'success',
-            'data': novels,
-            'pagination': {
-                'total': total,
-                'pages': (total + per_page - 1) // per_page,
-                'current_page': page,
-                'per_page': per_page
-            }
-        }), 200
-
-    finally:
-        cursor.close()
-        conn.close()
-
-
-# 小说统计数据
-@author_bp.route('/novels/<int:novel_id>/stats', methods=['GET'])
-def novel_stats(novel_id):
-    # 验证会话
-    session_id = request.headers.get('X-Session-ID')
-    if not validate_session(session_id):
-        return jsonify({
-            'status': 'error',
-            'message': '未授权访问'
-        }), 401
-
-    user_info = user_sessions[session_id]
-
-    conn = get_db_connection()
-    cursor = conn.cursor(pymysql.cursors.DictCursor)
-
-    try:
-        # 检查权限
-        cursor.execute("""
-            SELECT * FROM novels
-            WHERE Novel_id = %s AND Author_id = %s
-        """, (novel_id, user_info['user_id']))
-        novel = cursor.fetchone()
-
-        if not novel:
-            return jsonify({
-                'status': 'error',
-                'message': '小说不存在或无权限'
-            }), 403
-
-        # 获取统计数据
-        stats = {
-            'novel_id': novel['Novel_id'],
-            'title': novel['Title'],
-            'status': novel['Status'],
-            'word_count': novel['Word_count'],
-            'created_at': novel['Created_at'],
-            'updated_at': novel['Updated_at']
-        }
-
-        # 章节统计
-        cursor.execute("""
-            SELECT COUNT(*) as chapters, SUM(Word_count) as words
-            FROM chapters WHERE Novel_id = %s
-        """, (novel_id,))
-        chapter_stats = cursor.fetchone()
-        stats['chapters'] = chapter_stats['chapters']
-        stats['total_words'] = chapter_stats['words'] or 0
-
-        # 收藏统计
-        cursor.execute("""
-            SELECT COUNT(*) as count FROM favorites
-            WHERE Novel_id = %s
-        """, (novel_id,))
-        stats['favorites'] = cursor.fetchone()['count']
-
-        # 评论统计
-        cursor.execute("""
-            SELECT COUNT(*) as count FROM comments
-            WHERE Novel_id = %s
-        """, (novel_id,))
-        stats['comments'] = cursor.fetchone()['count']
-
-        # 阅读统计
-        cursor.execute("""
-            SELECT COUNT(DISTINCT User_id) as readers
-            FROM reading_records r
-            JOIN chapters c ON r.Chapter_id = c.Chapter_id
-            WHERE c.Novel_id = %s
-        """, (novel_id,))
-        stats['readers'] = cursor.fetchone()['readers'] or 0
-
-        return jsonify({
-            'status': 'success',
-            'data': stats
-        }), 200
-
-    finally:
-        cursor.close()
-        conn.close()
-
-
-# ========== Flask应用初始化 ==========
-# 创建Flask应用
-app = Flask(__name__)
-
-# 注册蓝图
-app.register_blueprint(author_bp)
-
-
-# 测试路由
-@app.route('/')
-def index():
-    return 'Flask API 已启动，请访问 /api/author/novels'
-
-
-if __name__ == '__main__':
-    # 启动Flask开发服务器
+# author_api.py
+from flask import Flask, Blueprint, request, jsonify
+import pymysql
+from compression import init_compression
+from query_profiler import connect, init_profiling
+from async_log import init_request_logging
+import income_ledger
+
+# 创建蓝图
+author_bp = Blueprint('author', __name__, url_prefix='/api/author')
+
+# 数据库配置
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': 'password',
+    'database': 'flutterpage',
+    'charset': 'utf8mb4'
+}
+
+
+# 获取数据库连接
+def get_db_connection():
+    return connect(**DB_CONFIG)
+
+
+# 用户会话验证
+user_sessions = {}
+
+
+def validate_session(session_id):
+    return session_id in user_sessions
+
+
+# 获取作者小说列表
+@author_bp.route('/novels', methods=['GET'])
+def get_author_novels():
+    # 验证会话
+    session_id = request.headers.get('X-Session-ID')
+    if not validate_session(session_id):
+        return jsonify({
+            'status': 'error',
+            'message': '未授权访问'
+        }), 401
+
+    user_info = user_sessions[session_id]
+
+    # 获取查询参数
+    status = request.args.get('status')
+    page = int(request.args.get('page', 1))
+    per_page = int(request.args.get('per_page', 10))
+    offset = (page - 1) * per_page
+
+    conn = get_db_connection()
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+
+    try:
+        # 构建查询条件
+        query = "SELECT * FROM novels WHERE Author_id = %s"
+        params = [user_info['user_id']]
+
+        if status and status in ['draft', 'review', 'published']:
+            query += " AND Status = %s"
+            params.append(status)
+
+        # 获取总数
+        count_query = query.replace("SELECT *", "SELECT COUNT(*) as count")
+        cursor.execute(count_query, params)
+        total = cursor.fetchone()['count']
+
+        # 获取小说列表
+        query += " ORDER BY Updated_at DESC LIMIT %s OFFSET %s"
+        params.extend([per_page, offset])
+
+        cursor.execute(query, params)
+        novels = cursor.fetchall()
+
+        # 添加统计信息
+        for novel in novels:
+            # 章节数
+            cursor.execute("""
+                SELECT COUNT(*) as count FROM chapters
+                WHERE Novel_id = %s
+            """, (novel['Novel_id'],))
+            novel['chapter_count'] = cursor.fetchone()['count']
+
+            # 收藏数
+            cursor.execute("""
+                SELECT COUNT(*) as count FROM favorites
+                WHERE Novel_id = %s
+            """, (novel['Novel_id'],))
+            novel['favorite_count'] = cursor.fetchone()['count']
+
+            # 评论数
+            cursor.execute("""
+                SELECT COUNT(*) as count FROM comments
+                WHERE Novel_id = %s
+            """, (novel['Novel_id'],))
+            novel['comment_count'] = cursor.fetchone()['count']
+
+        return jsonify({
+            'status': 'success',
+            'data': novels,
+            'pagination': {
+                'total': total,
+                'pages': (total + per_page - 1) // per_page,
+                'current_page': page,
+                'per_page': per_page
+            }
+        }), 200
+
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# 小说统计数据
+@author_bp.route('/novels/<int:novel_id>/stats', methods=['GET'])
+def novel_stats(novel_id):
+    # 验证会话
+    session_id = request.headers.get('X-Session-ID')
+    if not validate_session(session_id):
+        return jsonify({
+            'status': 'error',
+            'message': '未授权访问'
+        }), 401
+
+    user_info = user_sessions[session_id]
+
+    conn = get_db_connection()
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+
+    try:
+        # 检查权限
+        cursor.execute("""
+            SELECT * FROM novels
+            WHERE Novel_id = %s AND Author_id = %s
+        """, (novel_id, user_info['user_id']))
+        novel = cursor.fetchone()
+
+        if not novel:
+            return jsonify({
+                'status': 'error',
+                'message': '小说不存在或无权限'
+            }), 403
+
+        # 获取统计数据
+        stats = {
+            'novel_id': novel['Novel_id'],
+            'title': novel['Title'],
+            'status': novel['Status'],
+            'word_count': novel['Word_count'],
+            'created_at': novel['Created_at'],
+            'updated_at': novel['Updated_at']
+        }
+
+        # 章节统计
+        cursor.execute("""
+            SELECT COUNT(*) as chapters, SUM(Word_count) as words
+            FROM chapters WHERE Novel_id = %s
+        """, (novel_id,))
+        chapter_stats = cursor.fetchone()
+        stats['chapters'] = chapter_stats['chapters']
+        stats['total_words'] = chapter_stats['words'] or 0
+
+        # 收藏统计
+        cursor.execute("""
+            SELECT COUNT(*) as count FROM favorites
+            WHERE Novel_id = %s
+        """, (novel_id,))
+        stats['favorites'] = cursor.fetchone()['count']
+
+        # 评论统计
+        cursor.execute("""
+            SELECT COUNT(*) as count FROM comments
+            WHERE Novel_id = %s
+        """, (novel_id,))
+        stats['comments'] = cursor.fetchone()['count']
+
+        # 阅读统计
+        cursor.execute("""
+            SELECT COUNT(DISTINCT User_id) as readers
+            FROM reading_records r
+            JOIN chapters c ON r.Chapter_id = c.Chapter_id
+            WHERE c.Novel_id = %s
+        """, (novel_id,))
+        stats['readers'] = cursor.fetchone()['readers'] or 0
+
+        return jsonify({
+            'status': 'success',
+            'data': stats
+        }), 200
+
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# 收入概览：可提现余额来自账户余额快照
+@author_bp.route('/income/overview', methods=['GET'])
+def income_overview():
+    session_id = request.headers.get('X-Session-ID')
+    if not validate_session(session_id):
+        return jsonify({
+            'status': 'error',
+            'message': '未授权访问'
+        }), 401
+
+    conn = get_db_connection()
+
+    try:
+        return jsonify({
+            'status': 'success',
+            'data': income_ledger.overview(conn, user_sessions[session_id]['user_id'])
+        }), 200
+
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'数据库查询失败: {str(e)}'
+        }), 500
+
+    finally:
+        conn.close()
+
+
+# 收入流水：按ID倒序，before_id 翻页
+@author_bp.route('/income/records', methods=['GET'])
+def income_records():
+    session_id = request.headers.get('X-Session-ID')
+    if not validate_session(session_id):
+        return jsonify({
+            'status': 'error',
+            'message': '未授权访问'
+        }), 401
+
+    conn = get_db_connection()
+
+    try:
+        entries, next_id = income_ledger.list_entries(
+            conn, user_sessions[session_id]['user_id'],
+            before_id=request.args.get('before_id', type=int),
+            limit=request.args.get('limit', 20, type=int),
+            entry_type=request.args.get('type'))
+
+        return jsonify({
+            'status': 'success',
+            'data': entries,
+            'next_before_id': next_id
+        }), 200
+
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'数据库查询失败: {str(e)}'
+        }), 500
+
+    finally:
+        conn.close()
+
+
+# 提现记录
+@author_bp.route('/withdrawals', methods=['GET'])
+def withdrawal_records():
+    session_id = request.headers.get('X-Session-ID')
+    if not validate_session(session_id):
+        return jsonify({
+            'status': 'error',
+            'message': '未授权访问'
+        }), 401
+
+    conn = get_db_connection()
+
+    try:
+        rows, next_id = income_ledger.list_withdrawals(
+            conn, user_sessions[session_id]['user_id'],
+            before_id=request.args.get('before_id', type=int),
+            limit=request.args.get('limit', 20, type=int))
+
+        return jsonify({
+            'status': 'success',
+            'data': rows,
+            'next_before_id': next_id
+        }), 200
+
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'数据库查询失败: {str(e)}'
+        }), 500
+
+    finally:
+        conn.close()
+
+
+# 申请提现：请求头 Idempotency-Key 保证重复提交只生效一次；
+# balance_version 为概览接口返回的余额版本，余额在此期间变化时返回409
+@author_bp.route('/withdrawals', methods=['POST'])
+def create_withdrawal():
+    session_id = request.headers.get('X-Session-ID')
+    if not validate_session(session_id):
+        return jsonify({
+            'status': 'error',
+            'message': '未授权访问'
+        }), 401
+
+    data = request.get_json(silent=True)
+    request_key = request.headers.get('Idempotency-Key') or (data or {}).get('request_id')
+
+    if not data or 'amount' not in data or 'method' not in data:
+        return jsonify({
+            'status': 'error',
+            'message': '缺少字段：amount或method'
+        }), 400
+
+    if not request_key or len(request_key) > 64:
+        return jsonify({
+            'status': 'error',
+            'message': '缺少请求键（Idempotency-Key）或长度超过64'
+        }), 400
+
+    try:
+        amount = income_ledger.to_cents(data['amount'])
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+    conn = get_db_connection()
+
+    try:
+        withdrawal, created = income_ledger.request_withdrawal(
+            conn, user_sessions[session_id]['user_id'], request_key, amount, data['method'],
+            expected_version=data.get('balance_version'))
+
+        return jsonify({
+            'status': 'success',
+            'message': '提现申请已提交' if created else '提现申请已存在',
+            'data': {
+                'withdrawal_id': withdrawal['Withdrawal_id'],
+                'amount': income_ledger.to_yuan(withdrawal['Amount']),
+                'fee': income_ledger.to_yuan(withdrawal['Fee']),
+                'actual': income_ledger.to_yuan(withdrawal['Amount'] - withdrawal['Fee']),
+                'method': withdrawal['Method'],
+                'status': withdrawal['Status']
+            }
+        }), 201 if created else 200
+
+    except income_ledger.LedgerConflict as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e),
+            'balance_version': e.current_version
+        }), 409
+
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'提现失败: {str(e)}'
+        }), 500
+
+    finally:
+        conn.close()
+
+
+# ========== Flask应用初始化 ==========
+# 创建Flask应用
+app = Flask(__name__)
+
+# 注册蓝图
+app.register_blueprint(author_bp)
+
+# 注册响应压缩
+init_compression(app)
+
+# 注册SQL查询统计和 /metrics 端点
+init_profiling(app)
+
+# 注册请求ID和异步访问日志
+init_request_logging(app)
+
+
+# 测试路由
+@app.route('/')
+def index():
+    return 'Flask API 已启动，请访问 /api/author/novels'
+
+
+if __name__ == '__main__':
+    # 启动Flask开发服务器
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -1,214 +1,971 @@
-# chapter_api.py
-from flask import Flask, Blueprint, request, jsonify
-import pymysql
-from datetime import datetime
-
-# 创建Flask应用
-app = Flask(__name__)
-
-# 创建蓝图
-chapter_bp = Blueprint('chapter', __name__, url_prefix='/api/chapters')
-
-# 数据库配置
-DB_CONFIG = {
-    'host': 'localhost',
-    'user': 'root',
-    'password': '123456',
-    'database': 'flutterpage',
-    'charset': 'utf8mb4'
-}
-
-# 用户会话验证（临时测试数据）
-user_sessions = {
-    'test_session': {'user_id': 1}
-}
-
-
-# 获取数据库连接
-def get_db_connection():
-    return pymysql.connect(**DB_CONFIG)
-
-
-def validate_session(session_id):
-    return session_id in user_sessions
-
-
-# 健康检查端点
-@app.route('/')
-def hello():
-    return jsonify({
-        'status': 'success',
-        'message': 'Flask服务器正在运行！',
-        'endpoints': {
-            '添加章节': 'POST /api/chapters',
-            '获取章节列表': 'GET /api/chapters/novel/<novel_id>',
-            '获取章节详情': 'GET /api/chapters/<chapter_id>'
-        }
-    })
-
-
-# 上传章节API
-@chapter_bp.route('', methods=['POST'])
-def add_chapter():
-    # 验证会话
-    session_id = request.headers.get('X-Session-ID')
-    if not validate_session(session_id):
-        return jsonify({
-            'status': 'error',
-            'message': '未授权访问'
-        }), 401
-
-    user_info = user_sessions[session_id]
-    data = request.get_json()
-
-    # 检查是否提供了JSON数据
-    if not data:
-        return jsonify({
-            'status': 'error',
-            'message': '未提供JSON数据'
-        }), 400
-
-    # 检查必填字段
-    required_fields = ['novel_id', 'chapter_num', 'title', 'content']
-    for field in required_fields:
-        if field not in data:
-            return jsonify({
-                'status': 'error',
-                'message': f'缺少字段：{field}'
-            }), 400
-
-    conn = get_db_connection()
-    cursor = conn.cursor(pymysql.cursors.DictCursor)
-
-    try:
-        # 检查小说是否存在且属于当前用户
-        cursor.execute("""
-            SELECT * FROM novels 
-            WHERE Novel_id = %s AND Author_id = %s
-        """, (data['novel_id'], user_info['user_id']))
-
-        if not cursor.fetchone():
-            return jsonify({
-                'status': 'error',
-                'message': '小说不存在或无权限'
-            }), 403
-
-        # 计算字数（适用于中文）
-        word_count = len(data['content'].strip())
-
-        # 插入章节
-        cursor.execute("""
-            INSERT INTO chapters (Novel_id, Chapter_num, Title, Content,
-                                 Word_count, Created_at, Updated_at)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-        """, (
-            data['novel_id'],
-            data['chapter_num'],
-            data['title'],
-            data['content'],
-            word_count,
-            datetime.now(),
-            datetime.now()
-        ))
-        chapter_id = cursor.lastrowid
-
-        # 更新小说总字数
-        cursor.execute("""
-            UPDATE novels 
-            SET Word_count = Word_count + %s, Updated_at = %s
-            WHERE Novel_id = %s
-        """, (word_count, datetime.now(), data['novel_id']))
-
-        conn.commit()
-
-        return jsonify({
-            'status': 'success',
-            'message': '章节添加成功',
-            'chapter_id': chapter_id
-        }), 201
-
-    except Exception as e:
-        conn.rollback()
-        return jsonify({
-            'status': 'error',
-            'message': str(e)
-        }), 500
-
-    finally:
-        cursor.close()
-        conn.close()
-
-
-# 获取小说章节列表
-@chapter_bp.route('/novel/<int:novel_id>', methods=['GET'])
-def get_chapters(novel_id):
-    conn = get_db_connection()
-    cursor = conn.cursor(pymysql.cursors.DictCursor)
-
-    try:
-        cursor.execute("""
-            SELECT Chapter_id, Novel_id, Chapter_num, Title, Word_count, Created_at, Updated_at
-            FROM chapters 
-            WHERE Novel_id = %s 
-            ORDER BY Chapter_num ASC
-        """, (novel_id,))
-        chapters = cursor.fetchall()
-
-        return jsonify({
-            'status': 'success',
-            'data': chapters,
-            'total': len(chapters)
-        }), 200
-
-    except Exception as e:
-        return jsonify({
-            'status': 'error',
-            'message': str(e)
-        }), 500
-
-    finally:
-        cursor.close()
-        conn.close()
-
-
-# 获取章节详情
-@chapter_bp.route('/<int:chapter_id>', methods=['GET'])
-def get_chapter(chapter_id):
-    conn = get_db_connection()
-    cursor = conn.cursor(pymysql.cursors.DictCursor)
-
-    try:
-        cursor.execute("""
-            SELECT Chapter_id, Novel_id, Chapter_num, Title, Content, Word_count, Created_at, Updated_at
-            FROM chapters WHERE Chapter_id = %s
-        """, (chapter_id,))
-        chapter = cursor.fetchone()
-
-        if not chapter:
-            return jsonify({
-                'status': 'error',
-                'message': '章节不存在'
-            }), 404
-
-        return jsonify({
-            'status': 'success',
-            'data': chapter
-        }), 200
-
-    except Exception as e:
-        return jsonify({
-            'status': 'error',
-            'message': str(e)
-        }), 500
-
-    finally:
-        cursor.close()
-        conn.close()
-
-
-# 注册蓝图
-app.register_blueprint(chapter_bp)
-
-# 启动应用
-if __name__ == '__main__':
+# chapter_api.py
+from flask import Flask, Blueprint, Response, request, jsonify
+import pymysql
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from json_response import dumps, json_response
+from compression import PrecompressedBody, init_compression, negotiate_encoding
+from query_profiler import connect, init_profiling
+from async_log import get_logger, init_request_logging
+from http_cache import make_etag, not_modified, set_cache_headers
+from chapter_import import HEADING_PATTERNS, MAX_IMPORT_BYTES, detect_format, get_job, start_import
+from text_stats import count_words, text_stats
+import drafts
+import toc_index
+from reading_records import log_read, record_read
+
+# 创建Flask应用
+app = Flask(__name__)
+# 请求体上限：章节导入文件最大200MB加multipart开销；没有Content-Length的分块上传
+# 也会在读取超过上限时立即中止，而不是等整个请求体写入临时文件
+app.config['MAX_CONTENT_LENGTH'] = MAX_IMPORT_BYTES + 64 * 1024
+
+# 创建蓝图
+chapter_bp = Blueprint('chapter', __name__, url_prefix='/api/chapters')
+logger = get_logger('chapter')
+
+# 数据库配置
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': '123456',
+    'database': 'flutterpage',
+    'charset': 'utf8mb4'
+}
+
+# 用户会话验证（临时测试数据）
+user_sessions = {
+    'test_session': {'user_id': 1}
+}
+
+# 章节缓存：chapter_id -> (PrecompressedBody, 时间戳, Updated_at, ETag)，压缩结果随缓存保存
+chapter_cache = {}
+CHAPTER_CACHE_TIME = 600  # 缓存10分钟
+CHAPTER_CACHE_SIZE = 500  # 最多缓存的章节数
+# 缓存的响应体为 前缀 + 章节JSON + '}'，阅读接口只取中间的章节JSON拼入自己的响应
+CHAPTER_BODY_PREFIX = b'{"status":"success","data":'
+
+# 翻页时在后台预热下一章（读库、放入缓存、按客户端编码预先压缩）
+prefetch_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='chapter-prefetch')
+
+
+# 获取数据库连接
+def get_db_connection():
+    return connect(**DB_CONFIG)
+
+
+def validate_session(session_id):
+    return session_id in user_sessions
+
+
+def get_cached_chapter(chapter_id):
+    """返回未过期的 (响应体, Updated_at, ETag)，没有则返回 (None, None, None)"""
+    entry = chapter_cache.get(chapter_id)
+    if entry is None:
+        return None, None, None
+    body, timestamp, updated_at, etag = entry
+    if time.time() - timestamp > CHAPTER_CACHE_TIME:
+        chapter_cache.pop(chapter_id, None)
+        return None, None, None
+    return body, updated_at, etag
+
+
+def chapter_etag(chapter):
+    """章节详情的ETag：Updated_at加字数，同一秒内的修改一般也会改变字数"""
+    return make_etag('chapter', chapter['Chapter_id'], chapter['Updated_at'], chapter['Word_count'])
+
+
+def cache_chapter(chapter):
+    """把章节详情响应放入缓存，超出容量时淘汰最早放入的章节"""
+    body = PrecompressedBody(CHAPTER_BODY_PREFIX + dumps(chapter) + b'}')
+    while len(chapter_cache) >= CHAPTER_CACHE_SIZE:
+        try:
+            chapter_cache.pop(next(iter(chapter_cache)), None)
+        except (StopIteration, RuntimeError):
+            break
+    chapter_cache[chapter['Chapter_id']] = (body, time.time(), chapter['Updated_at'], chapter_etag(chapter))
+    return body
+
+
+def chapter_data(body):
+    """缓存响应体中的章节对象（不含外层 status/data），不复制正文"""
+    return memoryview(body.body)[len(CHAPTER_BODY_PREFIX):-1]
+
+
+# 健康检查端点
+@app.route('/')
+def hello():
+    return jsonify({
+        'status': 'success',
+        'message': 'Flask服务器正在运行！',
+        'endpoints': {
+            '添加章节': 'POST /api/chapters',
+            '实时字数统计': 'POST /api/chapters/word-count',
+            '批量导入章节': 'POST /api/chapters/import',
+            '导入任务进度': 'GET /api/chapters/import/<job_id>',
+            '草稿列表': 'GET /api/chapters/drafts',
+            '新建草稿': 'POST /api/chapters/drafts',
+            '获取草稿': 'GET /api/chapters/drafts/<draft_id>?version=',
+            '自动保存草稿': 'PATCH /api/chapters/drafts/<draft_id>',
+            '发布草稿': 'POST /api/chapters/drafts/<draft_id>/publish',
+            '获取章节列表': 'GET /api/chapters/novel/<novel_id>',
+            '章节目录（带版本号，支持区间）': 'GET /api/chapters/novel/<novel_id>/toc?from=&to=',
+            '获取章节详情': 'GET /api/chapters/<chapter_id>',
+            '阅读章节（含前后章、可附带下一章）': 'POST /api/chapters/<chapter_id>/read'
+        }
+    })
+
+
+def fetch_chapter(cursor, chapter_id):
+    cursor.execute("""
+        SELECT Chapter_id, Novel_id, Chapter_num, Title, Content, Word_count, Created_at, Updated_at
+        FROM chapters WHERE Chapter_id = %s
+    """, (chapter_id,))
+    return cursor.fetchone()
+
+
+def warm_chapter(chapter_id, encoding=None):
+    """把章节放入缓存，并提前生成客户端需要的压缩版本"""
+    body, _, _ = get_cached_chapter(chapter_id)
+    if body is None:
+        conn = get_db_connection()
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        try:
+            chapter = fetch_chapter(cursor, chapter_id)
+            if not chapter:
+                return
+            body = cache_chapter(chapter)
+        finally:
+            cursor.close()
+            conn.close()
+    body.get(encoding)
+
+
+# 上传章节API
+@chapter_bp.route('', methods=['POST'])
+def add_chapter():
+    # 验证会话
+    session_id = request.headers.get('X-Session-ID')
+    if not validate_session(session_id):
+        return jsonify({
+            'status': 'error',
+            'message': '未授权访问'
+        }), 401
+
+    user_info = user_sessions[session_id]
+    data = request.get_json()
+
+    # 检查是否提供了JSON数据
+    if not data:
+        return jsonify({
+            'status': 'error',
+            'message': '未提供JSON数据'
+        }), 400
+
+    # 检查必填字段
+    required_fields = ['novel_id', 'chapter_num', 'title', 'content']
+    for field in required_fields:
+        if field not in data:
+            return jsonify({
+                'status': 'error',
+                'message': f'缺少字段：{field}'
+            }), 400
+
+    # 数字字段可能以字符串传入，入库和更新目录索引前统一转为整数
+    try:
+        novel_id = int(data['novel_id'])
+        chapter_num = int(data['chapter_num'])
+    except (TypeError, ValueError):
+        return jsonify({
+            'status': 'error',
+            'message': 'novel_id和chapter_num必须是整数'
+        }), 400
+
+    conn = get_db_connection()
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+
+    try:
+        # 检查小说是否存在且属于当前用户
+        cursor.execute("""
+            SELECT * FROM novels 
+            WHERE Novel_id = %s AND Author_id = %s
+        """, (novel_id, user_info['user_id']))
+
+        if not cursor.fetchone():
+            return jsonify({
+                'status': 'error',
+                'message': '小说不存在或无权限'
+            }), 403
+
+        # 计算字数（中日韩文字 + 拉丁单词，不计标点和空白）
+        word_count = count_words(data['content'])
+        # 数据库DATETIME只精确到秒，目录索引用同一个时间判断是否过期
+        now = datetime.now().replace(microsecond=0)
+
+        # 插入章节
+        cursor.execute("""
+            INSERT INTO chapters (Novel_id, Chapter_num, Title, Content,
+                                 Word_count, Created_at, Updated_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, (
+            novel_id,
+            chapter_num,
+            data['title'],
+            data['content'],
+            word_count,
+            now,
+            now
+        ))
+        chapter_id = cursor.lastrowid
+
+        # 更新小说总字数
+        cursor.execute("""
+            UPDATE novels 
+            SET Word_count = Word_count + %s, Updated_at = %s
+            WHERE Novel_id = %s
+        """, (word_count, now, novel_id))
+
+        conn.commit()
+
+    except Exception as e:
+        conn.rollback()
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+    finally:
+        cursor.close()
+        conn.close()
+
+    # 章节已提交，缓存和索引更新失败只记录日志，不能让客户端重试插入重复章节
+    try:
+        toc_index.add_chapter(novel_id, {
+            'Chapter_id': chapter_id,
+            'Chapter_num': chapter_num,
+            'Title': data['title'],
+            'Word_count': word_count,
+            'Updated_at': now
+        }, now)
+    except Exception as e:
+        toc_index.invalidate(novel_id)
+        logger.error('章节目录索引更新失败', novel_id=novel_id, error=str(e))
+
+    return jsonify({
+        'status': 'success',
+        'message': '章节添加成功',
+        'chapter_id': chapter_id
+    }), 201
+
+
+# 实时字数统计API（写作页面边输入边统计，不写数据库）
+@chapter_bp.route('/word-count', methods=['POST'])
+def live_word_count():
+    session_id = request.headers.get('X-Session-ID')
+    if not validate_session(session_id):
+        return jsonify({
+            'status': 'error',
+            'message': '未授权访问'
+        }), 401
+
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('content'), str):
+        return jsonify({
+            'status': 'error',
+            'message': '缺少字段：content'
+        }), 400
+
+    return jsonify({
+        'status': 'success',
+        'data': text_stats(data['content'])
+    })
+
+
+def on_import_complete(novel_id):
+    """导入结束后让本进程的章节目录索引失效"""
+    toc_index.invalidate(novel_id)
+
+
+# 批量导入章节API（multipart上传 file 字段，支持 txt/epub/jsonl）
+@chapter_bp.route('/import', methods=['POST'])
+def import_chapters():
+    # 验证会话
+    session_id = request.headers.get('X-Session-ID')
+    if not validate_session(session_id):
+        return jsonify({
+            'status': 'error',
+            'message': '未授权访问'
+        }), 401
+
+    user_info = user_sessions[session_id]
+
+    upload = request.files.get('file')
+    if upload is None:
+        return jsonify({
+            'status': 'error',
+            'message': '缺少上传文件：file'
+        }), 400
+
+    novel_id = request.form.get('novel_id', type=int)
+    if not novel_id:
+        return jsonify({
+            'status': 'error',
+            'message': '缺少字段：novel_id'
+        }), 400
+
+    fmt = detect_format(upload.filename, request.form.get('format'))
+    if fmt is None:
+        return jsonify({
+            'status': 'error',
+            'message': '不支持的文件格式，仅支持 txt/epub/jsonl'
+        }), 400
+
+    # 章节标题格式只能从预定义的几种中选择，不接受自定义正则
+    heading_style = request.form.get('heading_style') or None
+    if heading_style and heading_style not in HEADING_PATTERNS:
+        return jsonify({
+            'status': 'error',
+            'message': f'不支持的章节标题格式，可选：{"/".join(HEADING_PATTERNS)}'
+        }), 400
+
+    start_num = request.form.get('start_num', type=int)
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        # 检查小说是否存在且属于当前用户
+        cursor.execute("""
+            SELECT Novel_id FROM novels 
+            WHERE Novel_id = %s AND Author_id = %s
+        """, (novel_id, user_info['user_id']))
+
+        if not cursor.fetchone():
+            return jsonify({
+                'status': 'error',
+                'message': '小说不存在或无权限'
+            }), 403
+
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+    finally:
+        cursor.close()
+        conn.close()
+
+    # 分块写入临时文件，解析由后台任务流式读取
+    fd, path = tempfile.mkstemp(prefix='chapter_import_', suffix='.' + fmt)
+    with os.fdopen(fd, 'wb') as f:
+        while True:
+            chunk = upload.stream.read(1024 * 1024)
+            if not chunk:
+                break
+            f.write(chunk)
+
+    job_id = start_import(path, fmt, novel_id, user_info['user_id'], get_db_connection,
+                          start_num=start_num, heading_style=heading_style,
+                          on_complete=on_import_complete)
+
+    return jsonify({
+        'status': 'success',
+        'message': '导入任务已提交',
+        'job_id': job_id
+    }), 202
+
+
+# 查询导入任务进度
+@chapter_bp.route('/import/<job_id>', methods=['GET'])
+def get_import_job(job_id):
+    session_id = request.headers.get('X-Session-ID')
+    if not validate_session(session_id):
+        return jsonify({
+            'status': 'error',
+            'message': '未授权访问'
+        }), 401
+
+    job = get_job(job_id)
+    if job is None or job['user_id'] != user_sessions[session_id]['user_id']:
+        return jsonify({
+            'status': 'error',
+            'message': '导入任务不存在'
+        }), 404
+
+    return jsonify({
+        'status': 'success',
+        'data': job
+    })
+
+
+# 我的草稿列表（不含正文）
+@chapter_bp.route('/drafts', methods=['GET'])
+def list_drafts():
+    session_id = request.headers.get('X-Session-ID')
+    if not validate_session(session_id):
+        return jsonify({
+            'status': 'error',
+            'message': '未授权访问'
+        }), 401
+
+    conn = get_db_connection()
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+
+    try:
+        cursor.execute("""
+            SELECT Draft_id, Novel_id, Chapter_id, Chapter_num, Title, Version,
+                   Published_version, Word_count, Created_at, Updated_at
+            FROM chapter_drafts
+            WHERE Author_id = %s
+            ORDER BY Updated_at DESC
+            LIMIT 20
+        """, (user_sessions[session_id]['user_id'],))
+
+        return jsonify({
+            'status': 'success',
+            'data': cursor.fetchall()
+        })
+
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# 新建草稿（chapter_id 不为空时表示修改已发布的章节）
+@chapter_bp.route('/drafts', methods=['POST'])
+def create_draft():
+    session_id = request.headers.get('X-Session-ID')
+    if not validate_session(session_id):
+        return jsonify({
+            'status': 'error',
+            'message': '未授权访问'
+        }), 401
+
+    user_info = user_sessions[session_id]
+    data = request.get_json()
+
+    if not data:
+        return jsonify({
+            'status': 'error',
+            'message': '未提供JSON数据'
+        }), 400
+
+    for field in ['novel_id', 'title']:
+        if field not in data:
+            return jsonify({
+                'status': 'error',
+                'message': f'缺少字段：{field}'
+            }), 400
+
+    conn = get_db_connection()
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+
+    try:
+        # 检查小说是否存在且属于当前用户
+        cursor.execute("""
+            SELECT Novel_id FROM novels 
+            WHERE Novel_id = %s AND Author_id = %s
+        """, (data['novel_id'], user_info['user_id']))
+
+        if not cursor.fetchone():
+            return jsonify({
+                'status': 'error',
+                'message': '小说不存在或无权限'
+            }), 403
+
+        content = data.get('content', '')
+        chapter_id = data.get('chapter_id')
+        if chapter_id:
+            # 修改已发布章节时以当前正文为起点
+            cursor.execute("""
+                SELECT Chapter_num, Content FROM chapters
+                WHERE Chapter_id = %s AND Novel_id = %s
+            """, (chapter_id, data['novel_id']))
+            chapter = cursor.fetchone()
+            if not chapter:
+                return jsonify({
+                    'status': 'error',
+                    'message': '章节不存在'
+                }), 404
+            if 'content' not in data:
+                content = chapter['Content'] or ''
+            data.setdefault('chapter_num', chapter['Chapter_num'])
+
+        draft_id = drafts.create_draft(conn, data['novel_id'], user_info['user_id'], data['title'],
+                                       content, data.get('chapter_num'), chapter_id)
+
+        return jsonify({
+            'status': 'success',
+            'message': '草稿已创建',
+            'draft_id': draft_id,
+            'version': 1
+        }), 201
+
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# 获取草稿（默认最新版本，?version= 获取历史版本）
+@chapter_bp.route('/drafts/<int:draft_id>', methods=['GET'])
+def get_draft(draft_id):
+    session_id = request.headers.get('X-Session-ID')
+    if not validate_session(session_id):
+        return jsonify({
+            'status': 'error',
+            'message': '未授权访问'
+        }), 401
+
+    conn = get_db_connection()
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+
+    try:
+        cursor.execute("""
+            SELECT Draft_id, Novel_id, Chapter_id, Chapter_num, Title, Version,
+                   Published_version, Word_count, Created_at, Updated_at
+            FROM chapter_drafts
+            WHERE Draft_id = %s AND Author_id = %s
+        """, (draft_id, user_sessions[session_id]['user_id']))
+        draft = cursor.fetchone()
+
+        if not draft:
+            return jsonify({
+                'status': 'error',
+                'message': '草稿不存在或无权限'
+            }), 404
+
+        version = request.args.get('version', draft['Version'], type=int)
+        if version < 1 or version > draft['Version']:
+            return jsonify({
+                'status': 'error',
+                'message': f'版本 {version} 不存在'
+            }), 404
+
+        draft['Content'] = drafts.rebuild(conn, draft_id, version)
+        draft['Content_version'] = version
+
+        return jsonify({
+            'status': 'success',
+            'data': draft
+        })
+
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# 自动保存：提交 base_version 和 ops（差异）或 content（全文）
+# ops 中保留/删除的长度按UTF-16码元计，与前端JavaScript字符串的下标一致
+@chapter_bp.route('/drafts/<int:draft_id>', methods=['PATCH'])
+def save_draft(draft_id):
+    session_id = request.headers.get('X-Session-ID')
+    if not validate_session(session_id):
+        return jsonify({
+            'status': 'error',
+            'message': '未授权访问'
+        }), 401
+
+    data = request.get_json()
+
+    if not data or 'base_version' not in data:
+        return jsonify({
+            'status': 'error',
+            'message': '缺少字段：base_version'
+        }), 400
+
+    if ('ops' in data) == ('content' in data):
+        return jsonify({
+            'status': 'error',
+            'message': 'ops和content需要且只能提供一个'
+        }), 400
+
+    if not isinstance(data['base_version'], int) or isinstance(data['base_version'], bool):
+        return jsonify({
+            'status': 'error',
+            'message': 'base_version必须是整数'
+        }), 400
+
+    for field in ['content', 'title']:
+        if data.get(field) is not None and not isinstance(data[field], str):
+            return jsonify({
+                'status': 'error',
+                'message': f'{field}必须是字符串'
+            }), 400
+
+    conn = get_db_connection()
+
+    try:
+        version, word_count = drafts.save_revision(
+            conn, draft_id, user_sessions[session_id]['user_id'], data['base_version'],
+            ops=data.get('ops'), content=data.get('content'), title=data.get('title'))
+
+        return jsonify({
+            'status': 'success',
+            'version': version,
+            'word_count': word_count
+        })
+
+    except drafts.DraftConflict as e:
+        # 客户端需要先拉取最新版本再重新计算差异
+        return jsonify({
+            'status': 'error',
+            'message': str(e),
+            'version': e.current_version
+        }), 409
+
+    except LookupError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 404
+
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'差异无效：{e}'
+        }), 400
+
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+    finally:
+        conn.close()
+
+
+# 发布草稿（默认最新版本）到章节
+@chapter_bp.route('/drafts/<int:draft_id>/publish', methods=['POST'])
+def publish_draft(draft_id):
+    session_id = request.headers.get('X-Session-ID')
+    if not validate_session(session_id):
+        return jsonify({
+            'status': 'error',
+            'message': '未授权访问'
+        }), 401
+
+    data = request.get_json(silent=True) or {}
+    conn = get_db_connection()
+
+    try:
+        chapter_id, novel_id, created = drafts.publish(
+            conn, draft_id, user_sessions[session_id]['user_id'], data.get('version'))
+
+        # 章节详情缓存和目录索引随之失效
+        chapter_cache.pop(chapter_id, None)
+        toc_index.invalidate(novel_id)
+
+        return jsonify({
+            'status': 'success',
+            'message': '章节发布成功' if created else '章节更新成功',
+            'chapter_id': chapter_id
+        }), 201 if created else 200
+
+    except LookupError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 404
+
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+    finally:
+        conn.close()
+
+
+# 获取小说章节列表
+@chapter_bp.route('/novel/<int:novel_id>', methods=['GET'])
+def get_chapters(novel_id):
+    conn = get_db_connection()
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+
+    try:
+        # 添加、修改章节时会更新novels的Updated_at和字数，用它们作为目录的版本，一次主键查询即可判断是否变化
+        cursor.execute("SELECT Updated_at, Word_count FROM novels WHERE Novel_id = %s", (novel_id,))
+        novel = cursor.fetchone()
+        etag = None
+        if novel:
+            etag = make_etag('chapters', novel_id, novel['Updated_at'], novel['Word_count'])
+            cached = not_modified(etag, novel['Updated_at'], 'chapter_list')
+            if cached:
+                return cached
+
+        cursor.execute("""
+            SELECT Chapter_id, Novel_id, Chapter_num, Title, Word_count, Created_at, Updated_at
+            FROM chapters 
+            WHERE Novel_id = %s 
+            ORDER BY Chapter_num ASC
+        """, (novel_id,))
+        chapters = cursor.fetchall()
+
+        # 行已全部取出（total 需要先知道），直接整体编码
+        response = json_response({
+            'status': 'success',
+            'total': len(chapters),
+            'data': chapters
+        })
+        if etag:
+            set_cache_headers(response, etag, novel['Updated_at'], 'chapter_list')
+        return response, 200
+
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def load_toc_rows(cursor, novel_id):
+    cursor.execute("""
+        SELECT Chapter_id, Chapter_num, Title, Word_count, Updated_at
+        FROM chapters
+        WHERE Novel_id = %s
+        ORDER BY Chapter_num ASC
+    """, (novel_id,))
+    return cursor.fetchall()
+
+
+# 章节目录：不带参数时返回完整目录（按列压缩存储，带版本号），?from=&to= 按章节号区间查询
+@chapter_bp.route('/novel/<int:novel_id>/toc', methods=['GET'])
+def get_toc(novel_id):
+    conn = get_db_connection()
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+
+    try:
+        cursor.execute("SELECT Updated_at FROM novels WHERE Novel_id = %s", (novel_id,))
+        novel = cursor.fetchone()
+        if not novel:
+            return jsonify({
+                'status': 'error',
+                'message': '小说不存在'
+            }), 404
+
+        index = toc_index.get_index(novel_id, novel['Updated_at'],
+                                    lambda: load_toc_rows(cursor, novel_id))
+
+        first_num = request.args.get('from', type=int)
+        last_num = request.args.get('to', type=int)
+        ranged = first_num is not None or last_num is not None
+
+        # 版本号不变时客户端无需重新下载目录
+        etag = make_etag('toc', novel_id, index.version, first_num, last_num)
+        cached = not_modified(etag, policy='chapter_list')
+        if cached:
+            return cached
+
+        if not ranged:
+            response = index.blob().to_response()
+        else:
+            first_num = 1 if first_num is None else first_num
+            last_num = first_num + 99 if last_num is None else last_num
+            chapters = index.range(first_num, last_num)
+            response = jsonify({
+                'status': 'success',
+                'version': index.version,
+                'total': len(index),
+                'data': chapters
+            })
+        return set_cache_headers(response, etag, policy='chapter_list'), 200
+
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# 获取章节详情
+@chapter_bp.route('/<int:chapter_id>', methods=['GET'])
+def get_chapter(chapter_id):
+    # 命中缓存时不访问数据库，直接返回304或已压缩的响应体
+    body, updated_at, etag = get_cached_chapter(chapter_id)
+    if body is not None:
+        cached = not_modified(etag, updated_at, 'chapter')
+        if cached:
+            return cached
+        return set_cache_headers(body.to_response(), etag, updated_at, 'chapter'), 200
+
+    conn = get_db_connection()
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+
+    try:
+        cursor.execute("SELECT Chapter_id, Updated_at, Word_count FROM chapters WHERE Chapter_id = %s",
+                       (chapter_id,))
+        row = cursor.fetchone()
+        if row:
+            cached = not_modified(chapter_etag(row), row['Updated_at'], 'chapter')
+            if cached:
+                return cached
+
+        chapter = fetch_chapter(cursor, chapter_id)
+
+        if not chapter:
+            return jsonify({
+                'status': 'error',
+                'message': '章节不存在'
+            }), 404
+
+        # 正文按UTF-8直接输出，不做\uXXXX转义
+        body = cache_chapter(chapter)
+        etag = chapter_etag(chapter)
+        return set_cache_headers(body.to_response(), etag, chapter['Updated_at'], 'chapter'), 200
+
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# 阅读章节：返回本章、前后章ID，prefetch=true 时附带下一章；登录时同时记录阅读进度
+# chapter / next 字段为章节对象，即 GET /api/chapters/<chapter_id> 响应中的 data，直接截取缓存的字节拼接
+@chapter_bp.route('/<int:chapter_id>/read', methods=['POST'])
+def read_chapter(chapter_id):
+    data = request.get_json(silent=True) or {}
+    session_id = request.headers.get('X-Session-ID')
+    user_info = user_sessions.get(session_id) if session_id else None
+
+    conn = get_db_connection()
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+
+    try:
+        cursor.execute("""
+            SELECT c.Novel_id, n.Updated_at AS Novel_updated
+            FROM chapters c JOIN novels n ON c.Novel_id = n.Novel_id
+            WHERE c.Chapter_id = %s
+        """, (chapter_id,))
+        row = cursor.fetchone()
+
+        if not row:
+            return jsonify({
+                'status': 'error',
+                'message': '章节不存在'
+            }), 404
+
+        novel_id = row['Novel_id']
+
+        # 本章优先取缓存
+        body, _, _ = get_cached_chapter(chapter_id)
+        if body is None:
+            body = cache_chapter(fetch_chapter(cursor, chapter_id))
+
+        # 前后章从目录索引中取，不再查库
+        index = toc_index.get_index(novel_id, row['Novel_updated'],
+                                    lambda: load_toc_rows(cursor, novel_id))
+        position = index.position(chapter_id)
+        prev_id = index.ids[position - 1] if position else None
+        next_id = index.ids[position + 1] if position is not None and position + 1 < len(index) else None
+        navigation = {
+            'novel_id': novel_id,
+            'prev_chapter_id': prev_id,
+            'next_chapter_id': next_id,
+            'position': None if position is None else position + 1,
+            'total': len(index)
+        }
+
+        encoding = negotiate_encoding(request.headers.get('Accept-Encoding', ''))
+        next_body = None
+        if next_id:
+            if data.get('prefetch'):
+                next_body, _, _ = get_cached_chapter(next_id)
+                if next_body is None:
+                    next_chapter = fetch_chapter(cursor, next_id)
+                    if next_chapter:
+                        next_body = cache_chapter(next_chapter)
+                if next_body is not None:
+                    prefetch_executor.submit(next_body.get, encoding)
+            else:
+                prefetch_executor.submit(warm_chapter, next_id, encoding)
+
+        if user_info:
+            duration = data.get('duration', 0)
+            progress, read_at = record_read(cursor, user_info['user_id'], chapter_id, novel_id,
+                                            data.get('progress'), duration)
+            conn.commit()
+            log_read(user_info['user_id'], chapter_id, novel_id, progress, duration, read_at)
+            navigation['progress'] = progress
+
+        parts = [b'{"status":"success","navigation":', dumps(navigation),
+                 b',"chapter":', chapter_data(body)]
+        if next_body is not None:
+            parts += [b',"next":', chapter_data(next_body)]
+        parts.append(b'}')
+
+        return Response(b''.join(parts), mimetype='application/json'), 200
+
+    except Exception as e:
+        conn.rollback()
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# 注册蓝图
+app.register_blueprint(chapter_bp)
+
+
+# 请求体超过 MAX_CONTENT_LENGTH
+@app.errorhandler(413)
+def request_too_large(e):
+    return jsonify({
+        'status': 'error',
+        'message': f'文件过大，最大支持{MAX_IMPORT_BYTES // 1024 // 1024}MB'
+    }), 413
+
+
+# 注册响应压缩
+init_compression(app)
+
+# 注册SQL查询统计和 /metrics 端点
+init_profiling(app)
+
+# 注册请求ID和异步访问日志
+init_request_logging(app)
+
+# 启动应用
+if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
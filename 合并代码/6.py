@@ -1,269 +1,422 @@
-# comment_api.py
-from flask import Flask, Blueprint, request, jsonify
-import pymysql
-from datetime import datetime
-
-# 创建Flask应用
-app = Flask(__name__)
-
-# 创建蓝图
-comment_bp = Blueprint('comment', __name__, url_prefix='/api/comments')
-
-# 数据库配置
-DB_CONFIG = {
-    'host': 'localhost',
-    'user': 'root',
-    'password': '123456',
-    'database': 'flutterpage',
-    'charset': 'utf8mb4'
-}
-
-
-# 初始化数据库表
-def init_database():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    try:
-        # 创建用户表
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                User_id INT AUTO_INCREMENT PRIMARY KEY,
-                Username VARCHAR(50) NOT NULL UNIQUE,
-                Email VARCHAR(100),
-                Created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-        # 创建小说表
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS novels (
-                Novel_id INT AUTO_INCREMENT PRIMARY KEY,
-                Title VARCHAR(255) NOT NULL,
-                Author VARCHAR(100),
-                Created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-        # 创建评论表
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS comments (
-                Comment_id INT AUTO_INCREMENT PRIMARY KEY,
-                Novel_id INT NOT NULL,
-                User_id INT NOT NULL,
-                Content TEXT NOT NULL,
-                Parent_id INT NULL,
-                Created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                Updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
-            )
-        """)
-
-        # 插入测试数据
-        cursor.execute(
-            "INSERT IGNORE INTO users (User_id, Username, Email) VALUES (1, 'test_user', 'test@example.com')")
-        cursor.execute("INSERT IGNORE INTO novels (Novel_id, Title, Author) VALUES (1, '测试小说', '测试作者')")
-
-        conn.commit()
-        print("数据库表初始化完成！")
-
-    except Exception as e:
-        print(f"数据库初始化错误: {e}")
-        conn.rollback()
-    finally:
-        cursor.close()
-        conn.close()
-
-
-# 获取数据库连接
-def get_db_connection():
-    return pymysql.connect(**DB_CONFIG)
-
-
-# 用户会话验证（简化测试版）
-user_sessions = {
-    'test_session': {'user_id': 1, 'username': 'test_user'}
-}
-
-
-def validate_session(session_id):
-    return session_id in user_sessions
-
-
-# 发表评论API
-@comment_bp.route('', methods=['POST'])
-def add_comment():
-    # 验证会话
-    session_id = request.headers.get('X-Session-ID')
-    if not validate_session(session_id):
-        return jsonify({
-            'status': 'error',
-            'message': '未授权访问'
-        }), 401
-
-    user_info = user_sessions[session_id]
-    data = request.get_json()
-
-    # 检查必填字段
-    if not data or 'novel_id' not in data or 'content' not in data:
-        return jsonify({
-            'status': 'error',
-            'message': '缺少小说ID或评论内容'
-        }), 400
-
-    conn = get_db_connection()
-    cursor = conn.cursor(pymysql.cursors.DictCursor)
-
-    try:
-        # 检查小说是否存在
-        cursor.execute("SELECT * FROM novels WHERE Novel_id = %s", (data['novel_id'],))
-        if not cursor.fetchone():
-            return jsonify({
-                'status': 'error',
-                'message': '小说不存在'
-            }), 404
-
-        # 插入评论
-        cursor.execute("""
-            INSERT INTO comments (Novel_id, User_id, Content, Parent_id, Created_at, Updated_at)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (
-            data['novel_id'],
-            user_info['user_id'],
-            data['content'],
-            data.get('parent_id'),
-            datetime.now(),
-            datetime.now()
-        ))
-        comment_id = cursor.lastrowid
-        conn.commit()
-
-        return jsonify({
-            'status': 'success',
-            'message': '评论发表成功',
-            'comment_id': comment_id
-        }), 201
-
-    except Exception as e:
-        conn.rollback()
-        return jsonify({
-            'status': 'error',
-            'message': str(e)
-        }), 500
-
-    finally:
-        cursor.close()
-        conn.close()
-
-
-# 获取小说评论列表
-@comment_bp.route('/novel/<int:novel_id>', methods=['GET'])
-def get_comments(novel_id):
-    # 获取分页参数
-    page = int(request.args.get('page', 1))
-    per_page = int(request.args.get('per_page', 20))
-    offset = (page - 1) * per_page
-
-    conn = get_db_connection()
-    cursor = conn.cursor(pymysql.cursors.DictCursor)
-
-    try:
-        # 获取评论总数
-        cursor.execute("""
-            SELECT COUNT(*) as count FROM comments 
-            WHERE Novel_id = %s AND Parent_id IS NULL
-        """, (novel_id,))
-        total = cursor.fetchone()['count']
-
-        # 获取顶级评论
-        cursor.execute("""
-            SELECT c.*, u.Username FROM comments c
-            LEFT JOIN users u ON c.User_id = u.User_id
-            WHERE c.Novel_id = %s AND c.Parent_id IS NULL
-            ORDER BY c.Created_at DESC
-            LIMIT %s OFFSET %s
-        """, (novel_id, per_page, offset))
-        comments = cursor.fetchall()
-
-        # 获取每条评论的回复
-        for comment in comments:
-            cursor.execute("""
-                SELECT c.*, u.Username FROM comments c
-                LEFT JOIN users u ON c.User_id = u.User_id
-                WHERE c.Parent_id = %s
-                ORDER BY c.Created_at ASC
-            """, (comment['Comment_id'],))
-            comment['replies'] = cursor.fetchall()
-
-        return jsonify({
-            'status': 'success',
-            'data': comments,
-            'pagination': {
-                'total': total,
-                'pages': (total + per_page - 1) // per_page,
-                'current_page': page,
-                'per_page': per_page
-            }
-        }), 200
-
-    except Exception as e:
-        return jsonify({
-            'status': 'error',
-            'message': str(e)
-        }), 500
-    finally:
-        cursor.close()
-        conn.close()
-
-
-# 测试接口 - 添加一些示例评论
-@comment_bp.route('/test', methods=['POST'])
-def add_test_comments():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    try:
-        # 清空现有评论
-        cursor.execute("DELETE FROM comments")
-
-        # 添加测试评论
-        test_comments = [
-            (1, 1, '这是一条很好的评论！', None),
-            (1, 1, '我非常喜欢这本小说！', None),
-            (1, 1, '作者写得真好！', 1),  # 回复第一条评论
-            (1, 1, '同意你的观点！', 2)  # 回复第二条评论
-        ]
-
-        for comment in test_comments:
-            cursor.execute("""
-                INSERT INTO comments (Novel_id, User_id, Content, Parent_id)
-                VALUES (%s, %s, %s, %s)
-            """, comment)
-
-        conn.commit()
-        return jsonify({'status': 'success', 'message': '测试评论添加成功'})
-
-    except Exception as e:
-        conn.rollback()
-        return jsonify({'status': 'error', 'message': str(e)}), 500
-    finally:
-        cursor.close()
-        conn.close()
-
-
-# 注册蓝图到Flask应用
-app.register_blueprint(comment_bp)
-
-
-@app.route('/')
-def hello():
-    return '评论API服务运行中！<br><a href="/api/comments/novel/1">查看评论</a><br><a href="/api/comments/test" method="post">添加测试评论</a>'
-
-
-# 启动Flask应用
-if __name__ == '__main__':
-    print("初始化数据库...")
-    init_database()
-    print("启动评论API服务...")
-    print("访问 http://localhost:5000/ 查看测试页面")
-    print("访问 http://localhost:5000/api/comments/novel/1 测试评论接口")
+# comment_api.py
+from flask import Flask, Blueprint, request, jsonify
+import pymysql
+from datetime import datetime
+from compression import init_compression
+from query_profiler import connect, init_profiling
+from async_log import init_request_logging
+from migrations import migrate
+from http_cache import make_etag, not_modified, set_cache_headers
+import comment_moderation
+import comment_scoring
+
+# 创建Flask应用
+app = Flask(__name__)
+
+# 创建蓝图
+comment_bp = Blueprint('comment', __name__, url_prefix='/api/comments')
+
+# 数据库配置
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': '123456',
+    'database': 'flutterpage',
+    'charset': 'utf8mb4'
+}
+
+
+# 初始化数据库表
+def init_database():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        # 表结构和索引统一由迁移管理
+        migrate(conn)
+
+        # 插入测试数据
+        cursor.execute(
+            "INSERT IGNORE INTO users (User_id, Username, Email) VALUES (1, 'test_user', 'test@example.com')")
+        cursor.execute("INSERT IGNORE INTO novels (Novel_id, Title, Author_id) VALUES (1, '测试小说', 1)")
+
+        conn.commit()
+        print("数据库表初始化完成！")
+
+    except Exception as e:
+        print(f"数据库初始化错误: {e}")
+        conn.rollback()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# 获取数据库连接
+def get_db_connection():
+    return connect(**DB_CONFIG)
+
+
+# 用户会话验证（简化测试版）
+user_sessions = {
+    'test_session': {'user_id': 1, 'username': 'test_user'}
+}
+
+
+def validate_session(session_id):
+    return session_id in user_sessions
+
+
+# 发表评论API
+@comment_bp.route('', methods=['POST'])
+def add_comment():
+    # 验证会话
+    session_id = request.headers.get('X-Session-ID')
+    if not validate_session(session_id):
+        return jsonify({
+            'status': 'error',
+            'message': '未授权访问'
+        }), 401
+
+    user_info = user_sessions[session_id]
+    data = request.get_json()
+
+    # 检查必填字段
+    if not data or 'novel_id' not in data or 'content' not in data:
+        return jsonify({
+            'status': 'error',
+            'message': '缺少小说ID或评论内容'
+        }), 400
+
+    conn = get_db_connection()
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+
+    try:
+        # 检查小说是否存在
+        cursor.execute("SELECT * FROM novels WHERE Novel_id = %s", (data['novel_id'],))
+        novel = cursor.fetchone()
+        if not novel:
+            return jsonify({
+                'status': 'error',
+                'message': '小说不存在'
+            }), 404
+
+        # 只能回复本作品的顶层评论，回复的回复在评论列表中不会显示
+        if data.get('parent_id') is not None:
+            try:
+                comment_moderation.check_parent(cursor, novel['Novel_id'], data['parent_id'])
+            except LookupError as e:
+                return jsonify({
+                    'status': 'error',
+                    'message': str(e)
+                }), 404
+            except ValueError as e:
+                return jsonify({
+                    'status': 'error',
+                    'message': str(e)
+                }), 400
+
+        # 插入评论
+        cursor.execute("""
+            INSERT INTO comments (Novel_id, User_id, Content, Parent_id, Created_at, Updated_at)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, (
+            data['novel_id'],
+            user_info['user_id'],
+            data['content'],
+            data.get('parent_id'),
+            datetime.now(),
+            datetime.now()
+        ))
+        comment_id = cursor.lastrowid
+        # 作者评论管理的归属、未读计数和回复状态
+        comment_moderation.comment_added(cursor, novel, comment_id, user_info['user_id'],
+                                         data.get('parent_id'))
+        conn.commit()
+
+        # 情感和垃圾评论打分在后台线程批量进行
+        comment_scoring.submit(comment_id, data['content'])
+
+        return jsonify({
+            'status': 'success',
+            'message': '评论发表成功',
+            'comment_id': comment_id
+        }), 201
+
+    except Exception as e:
+        conn.rollback()
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# 获取小说评论列表
+@comment_bp.route('/novel/<int:novel_id>', methods=['GET'])
+def get_comments(novel_id):
+    # 获取分页参数
+    page = int(request.args.get('page', 1))
+    per_page = int(request.args.get('per_page', 20))
+    offset = (page - 1) * per_page
+
+    conn = get_db_connection()
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+
+    try:
+        # 用评论数和最后更新时间作为版本（走Novel_id索引，不读取评论内容），未变化时返回304
+        cursor.execute("""
+            SELECT COUNT(*) as count, MAX(Updated_at) as updated FROM comments
+            WHERE Novel_id = %s
+        """, (novel_id,))
+        version = cursor.fetchone()
+        etag = make_etag('comments', novel_id, version['count'], version['updated'], page, per_page)
+        cached = not_modified(etag, version['updated'], 'comments')
+        if cached:
+            return cached
+
+        # 获取评论总数
+        cursor.execute("""
+            SELECT COUNT(*) as count FROM comments 
+            WHERE Novel_id = %s AND Parent_id IS NULL AND Is_spam = 0
+        """, (novel_id,))
+        total = cursor.fetchone()['count']
+
+        # 获取顶级评论
+        cursor.execute("""
+            SELECT c.*, u.Username FROM comments c
+            LEFT JOIN users u ON c.User_id = u.User_id
+            WHERE c.Novel_id = %s AND c.Parent_id IS NULL AND c.Is_spam = 0
+            ORDER BY c.Created_at DESC
+            LIMIT %s OFFSET %s
+        """, (novel_id, per_page, offset))
+        comments = cursor.fetchall()
+
+        # 获取每条评论的回复
+        for comment in comments:
+            cursor.execute("""
+                SELECT c.*, u.Username FROM comments c
+                LEFT JOIN users u ON c.User_id = u.User_id
+                WHERE c.Parent_id = %s AND c.Is_spam = 0
+                ORDER BY c.Created_at ASC
+            """, (comment['Comment_id'],))
+            comment['replies'] = cursor.fetchall()
+
+        response = jsonify({
+            'status': 'success',
+            'data': comments,
+            'pagination': {
+                'total': total,
+                'pages': (total + per_page - 1) // per_page,
+                'current_page': page,
+                'per_page': per_page
+            }
+        })
+        return set_cache_headers(response, etag, version['updated'], 'comments'), 200
+
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# ==================== 作者评论管理 ====================
+# 作者收到的评论：novel_id / status(unread|unreplied|replied|spam) / sentiment / q 筛选，
+# sort(newest|oldest|replies) 排序，cursor 翻页
+@comment_bp.route('/author', methods=['GET'])
+def get_author_comments():
+    session_id = request.headers.get('X-Session-ID')
+    if not validate_session(session_id):
+        return jsonify({
+            'status': 'error',
+            'message': '未授权访问'
+        }), 401
+
+    author_id = user_sessions[session_id]['user_id']
+    conn = get_db_connection()
+
+    try:
+        comments, next_cursor = comment_moderation.list_comments(
+            conn, author_id,
+            novel_id=request.args.get('novel_id', type=int),
+            status=request.args.get('status'),
+            sentiment=request.args.get('sentiment'),
+            q=(request.args.get('q') or '').strip(),
+            sort=request.args.get('sort', 'newest'),
+            cursor_value=request.args.get('cursor'),
+            limit=request.args.get('limit', 20, type=int))
+
+        return jsonify({
+            'status': 'success',
+            'data': comments,
+            'counters': comment_moderation.get_counters(conn, author_id),
+            'next_cursor': next_cursor
+        }), 200
+
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+    finally:
+        conn.close()
+
+
+# 未读数、未回复数、总数（单行读取）
+@comment_bp.route('/author/counters', methods=['GET'])
+def get_author_comment_counters():
+    session_id = request.headers.get('X-Session-ID')
+    if not validate_session(session_id):
+        return jsonify({
+            'status': 'error',
+            'message': '未授权访问'
+        }), 401
+
+    conn = get_db_connection()
+
+    try:
+        return jsonify({
+            'status': 'success',
+            'data': comment_moderation.get_counters(conn, user_sessions[session_id]['user_id'])
+        }), 200
+
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+    finally:
+        conn.close()
+
+
+# 批量操作：action 为 read / reply / delete，comment_ids 为评论ID列表，reply 需要 content
+@comment_bp.route('/author/batch', methods=['POST'])
+def author_comment_batch():
+    session_id = request.headers.get('X-Session-ID')
+    if not validate_session(session_id):
+        return jsonify({
+            'status': 'error',
+            'message': '未授权访问'
+        }), 401
+
+    data = request.get_json(silent=True) or {}
+    action = data.get('action')
+    if action not in ('read', 'reply', 'delete'):
+        return jsonify({
+            'status': 'error',
+            'message': 'action 必须是 read、reply 或 delete'
+        }), 400
+
+    author_id = user_sessions[session_id]['user_id']
+    conn = get_db_connection()
+
+    try:
+        # 回复和删除改变评论条数，公开评论列表的ETag随之变化
+        if action == 'read':
+            affected = comment_moderation.mark_read(conn, author_id, data.get('comment_ids'))
+        elif action == 'reply':
+            affected, _ = comment_moderation.batch_reply(
+                conn, author_id, data.get('comment_ids'), data.get('content'))
+        else:
+            affected, _ = comment_moderation.batch_delete(conn, author_id, data.get('comment_ids'))
+
+        return jsonify({
+            'status': 'success',
+            'affected': affected,
+            'counters': comment_moderation.get_counters(conn, author_id)
+        }), 200
+
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+    finally:
+        conn.close()
+
+
+# 测试接口 - 添加一些示例评论
+@comment_bp.route('/test', methods=['POST'])
+def add_test_comments():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        # 清空现有评论
+        cursor.execute("DELETE FROM comments")
+
+        # 添加测试评论
+        test_comments = [
+            (1, 1, '这是一条很好的评论！', None),
+            (1, 1, '我非常喜欢这本小说！', None),
+            (1, 1, '作者写得真好！', 1),  # 回复第一条评论
+            (1, 1, '同意你的观点！', 2)  # 回复第二条评论
+        ]
+
+        for comment in test_comments:
+            cursor.execute("""
+                INSERT INTO comments (Novel_id, User_id, Content, Parent_id)
+                VALUES (%s, %s, %s, %s)
+            """, comment)
+
+        conn.commit()
+        return jsonify({'status': 'success', 'message': '测试评论添加成功'})
+
+    except Exception as e:
+        conn.rollback()
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# 注册蓝图到Flask应用
+app.register_blueprint(comment_bp)
+
+# 注册响应压缩
+init_compression(app)
+
+# 注册SQL查询统计和 /metrics 端点
+init_profiling(app)
+
+# 注册请求ID和异步访问日志
+init_request_logging(app)
+
+# 启动评论打分工作线程
+comment_scoring.init_scoring(get_db_connection)
+
+
+@app.route('/')
+def hello():
+    return '评论API服务运行中！<br><a href="/api/comments/novel/1">查看评论</a><br><a href="/api/comments/test" method="post">添加测试评论</a>'
+
+
+# 启动Flask应用
+if __name__ == '__main__':
+    print("初始化数据库...")
+    init_database()
+    print("启动评论API服务...")
+    print("访问 http://localhost:5000/ 查看测试页面")
+    print("访问 http://localhost:5000/api/comments/novel/1 测试评论接口")
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,379 @@
+# admin.py
+"""
+管理后台接口（/api/admin）
+- 用户检索：用户名/邮箱前缀走普通索引，子串走ngram全文索引；注册日期区间筛选；键集分页（不用OFFSET）
+- 批量封禁/解封：一条 UPDATE ... WHERE User_id IN (...) 完成，并踢掉被封用户的会话
+- 每次管理操作写审计日志（后台线程批量入库，见 audit_log.py）
+- 平台指标看板读取预聚合的每日计数（见 platform_metrics.py）
+- 作者提现的打款结果登记（见 income_ledger.py）
+- 由 3.py 调用 init_admin 注册，沿用其会话表
+"""
+import re
+from datetime import datetime, timedelta
+from functools import wraps
+
+import pymysql
+from flask import Blueprint, g, jsonify, request
+
+import audit_log
+import income_ledger
+import platform_metrics
+
+admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
+
+# 每页最大条数、单次批量操作最多的用户数
+MAX_PAGE_SIZE = 100
+MAX_BULK_USERS = 1000
+
+# 全文检索布尔模式的运算符，子串搜索时去掉
+_BOOLEAN_OPERATORS = re.compile(r'[+\-<>()~*"@]')
+
+USER_COLUMNS = """
+    User_id, Username, Email, Phone, Created_at, Status, Banned_at, Ban_reason, Is_admin
+"""
+
+_connect = None
+_sessions = {}
+
+
+def init_admin(app, connect, sessions):
+    """注册管理后台蓝图；connect: 获取数据库连接的函数，sessions: 会话表"""
+    global _connect, _sessions
+    _connect = connect
+    _sessions = sessions
+    app.register_blueprint(admin_bp)
+    audit_log.init_audit(connect)
+    return app
+
+
+def admin_required(view):
+    """要求请求头 X-Session-ID 对应管理员会话"""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        session = _sessions.get(request.headers.get('X-Session-ID'))
+        if not session:
+            return jsonify({
+                'status': 'error',
+                'message': '未授权访问'
+            }), 401
+        if not session.get('is_admin'):
+            return jsonify({
+                'status': 'error',
+                'message': '需要管理员权限'
+            }), 403
+        g.admin_id = session['user_id']
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+def _parse_date(value, name):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise ValueError(f'{name} 格式应为 YYYY-MM-DD')
+
+
+def encode_cursor(row):
+    """键集分页游标：最后一行的 (Created_at, User_id)"""
+    return f"{row['Created_at'].strftime('%Y%m%d%H%M%S')}_{row['User_id']}"
+
+
+def decode_cursor(value):
+    try:
+        created, user_id = value.split('_')
+        return datetime.strptime(created, '%Y%m%d%H%M%S'), int(user_id)
+    except ValueError:
+        raise ValueError('无效的分页游标')
+
+
+def build_user_query(args):
+    """根据查询参数构造 (WHERE子句列表, 参数列表)"""
+    conditions = []
+    params = []
+
+    keyword = (args.get('q') or '').strip()
+    if keyword:
+        match = args.get('match', 'prefix')
+        terms = _BOOLEAN_OPERATORS.sub(' ', keyword).split()
+        if match == 'substring' and terms and min(len(t) for t in terms) >= 2:
+            # ngram 全文索引的短语匹配即子串匹配（ngram_token_size 默认为2）
+            conditions.append("MATCH(Username, Email) AGAINST (%s IN BOOLEAN MODE)")
+            params.append(' '.join(f'+"{term}"' for term in terms))
+        else:
+            # 前缀匹配走 Username 唯一索引和 Email 索引
+            escaped = keyword.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            conditions.append("(Username LIKE %s OR Email LIKE %s)")
+            params.extend([escaped + '%', escaped + '%'])
+
+    if args.get('created_from'):
+        conditions.append("Created_at >= %s")
+        params.append(_parse_date(args['created_from'], 'created_from'))
+    if args.get('created_to'):
+        # 截止日期当天包含在内
+        conditions.append("Created_at < %s")
+        params.append(_parse_date(args['created_to'], 'created_to') + timedelta(days=1))
+
+    status = args.get('status')
+    if status in ('active', 'banned'):
+        conditions.append("Status = %s")
+        params.append(status)
+
+    if args.get('cursor'):
+        created, user_id = decode_cursor(args['cursor'])
+        conditions.append("(Created_at < %s OR (Created_at = %s AND User_id < %s))")
+        params.extend([created, created, user_id])
+
+    return conditions, params
+
+
+# 用户检索
+@admin_bp.route('/users', methods=['GET'])
+@admin_required
+def search_users():
+    limit = max(1, min(request.args.get('limit', 20, type=int), MAX_PAGE_SIZE))
+    try:
+        conditions, params = build_user_query(request.args)
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+    query = f"SELECT {USER_COLUMNS} FROM users"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    # 多取一行判断是否还有下一页
+    query += " ORDER BY Created_at DESC, User_id DESC LIMIT %s"
+    params.append(limit + 1)
+
+    conn = _connect()
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+
+    try:
+        cursor.execute(query, params)
+        users = cursor.fetchall()
+        has_more = len(users) > limit
+        users = users[:limit]
+
+        return jsonify({
+            'status': 'success',
+            'data': users,
+            'pagination': {
+                'limit': limit,
+                'has_more': has_more,
+                'next_cursor': encode_cursor(users[-1]) if has_more else None
+            }
+        }), 200
+
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'数据库查询失败: {str(e)}'
+        }), 500
+
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _bulk_user_ids(data):
+    user_ids = data.get('user_ids') if data else None
+    if not isinstance(user_ids, list) or not user_ids:
+        raise ValueError('user_ids 不能为空')
+    try:
+        user_ids = sorted({int(user_id) for user_id in user_ids})
+    except (TypeError, ValueError):
+        raise ValueError('user_ids 必须是整数列表')
+    if len(user_ids) > MAX_BULK_USERS:
+        raise ValueError(f'单次最多操作 {MAX_BULK_USERS} 个用户')
+    return user_ids
+
+
+def _set_user_status(action):
+    data = request.get_json(silent=True)
+    try:
+        user_ids = _bulk_user_ids(data)
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+    reason = ((data.get('reason') or '').strip() or None) if action == 'ban' else None
+    placeholders = ', '.join(['%s'] * len(user_ids))
+
+    conn = _connect()
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+
+    try:
+        # 一条语句完成批量修改；管理员账号不能被封禁
+        if action == 'ban':
+            cursor.execute(f"""
+                UPDATE users SET Status = 'banned', Banned_at = %s, Ban_reason = %s
+                WHERE User_id IN ({placeholders}) AND Status <> 'banned' AND Is_admin = 0
+            """, [datetime.now(), reason] + user_ids)
+        else:
+            cursor.execute(f"""
+                UPDATE users SET Status = 'active', Banned_at = NULL, Ban_reason = NULL
+                WHERE User_id IN ({placeholders}) AND Status = 'banned'
+            """, user_ids)
+        affected = cursor.rowcount
+        conn.commit()
+
+        if action == 'ban':
+            # 被封禁的用户立即下线
+            banned = set(user_ids)
+            for session_id, session in list(_sessions.items()):
+                if session.get('user_id') in banned and not session.get('is_admin'):
+                    _sessions.pop(session_id, None)
+
+        audit_log.record(g.admin_id, action, 'user', user_ids, {'affected': affected, 'reason': reason})
+
+        return jsonify({
+            'status': 'success',
+            'message': f'{"封禁" if action == "ban" else "解封"}成功',
+            'requested': len(user_ids),
+            'affected': affected
+        }), 200
+
+    except Exception as e:
+        conn.rollback()
+        return jsonify({
+            'status': 'error',
+            'message': f'数据库操作失败: {str(e)}'
+        }), 500
+
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# 批量封禁
+@admin_bp.route('/users/ban', methods=['POST'])
+@admin_required
+def ban_users():
+    return _set_user_status('ban')
+
+
+# 批量解封
+@admin_bp.route('/users/unban', methods=['POST'])
+@admin_required
+def unban_users():
+    return _set_user_status('unban')
+
+
+# 审计日志（按ID倒序，键集分页）
+@admin_bp.route('/audit', methods=['GET'])
+@admin_required
+def audit_entries():
+    limit = max(1, min(request.args.get('limit', 50, type=int), MAX_PAGE_SIZE))
+    before_id = request.args.get('before_id', type=int)
+    admin_id = request.args.get('admin_id', type=int)
+
+    conditions = []
+    params = []
+    if before_id:
+        conditions.append("Audit_id < %s")
+        params.append(before_id)
+    if admin_id:
+        conditions.append("Admin_id = %s")
+        params.append(admin_id)
+
+    query = "SELECT * FROM admin_audit_log"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY Audit_id DESC LIMIT %s"
+    params.append(limit)
+
+    conn = _connect()
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+
+    try:
+        cursor.execute(query, params)
+        entries = cursor.fetchall()
+        return jsonify({
+            'status': 'success',
+            'data': entries,
+            'next_before_id': entries[-1]['Audit_id'] if len(entries) == limit else None
+        }), 200
+
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'数据库查询失败: {str(e)}'
+        }), 500
+
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# 平台指标：用户增长、作品增长、分类分布
+@admin_bp.route('/metrics', methods=['GET'])
+@admin_required
+def platform_dashboard():
+    days = request.args.get('days', 30, type=int)
+    try:
+        dashboard = platform_metrics.get_dashboard(_connect, days)
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'数据库查询失败: {str(e)}'
+        }), 500
+
+    return jsonify({
+        'status': 'success',
+        'data': dashboard
+    }), 200
+
+
+# 登记提现结果：completed 打款成功，failed 退回作者可提现余额
+@admin_bp.route('/withdrawals/<int:withdrawal_id>', methods=['POST'])
+@admin_required
+def settle_withdrawal(withdrawal_id):
+    data = request.get_json(silent=True) or {}
+    result = data.get('result')
+    if result not in ('completed', 'failed'):
+        return jsonify({
+            'status': 'error',
+            'message': 'result 必须是 completed 或 failed'
+        }), 400
+
+    conn = _connect()
+
+    try:
+        withdrawal = income_ledger.settle_withdrawal(conn, withdrawal_id, result == 'completed')
+        audit_log.record(g.admin_id, f'withdrawal_{result}', 'withdrawal', [withdrawal_id],
+                         {'author_id': withdrawal['Author_id'], 'amount': withdrawal['Amount']})
+
+        return jsonify({
+            'status': 'success',
+            'message': '提现已处理',
+            'data': {
+                'withdrawal_id': withdrawal_id,
+                'status': withdrawal['Status']
+            }
+        }), 200
+
+    except LookupError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 404
+
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 409
+
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'数据库操作失败: {str(e)}'
+        }), 500
+
+    finally:
+        conn.close()
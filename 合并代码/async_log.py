@@ -0,0 +1,206 @@
+# async_log.py
+"""
+异步结构化日志
+- 请求线程只把日志记录追加到内存队列（deque.append为原子操作，不加锁），由后台线程批量写出
+- 输出JSON Lines，每行自动带上当前请求的 request_id
+- 按logger设置采样率，WARNING及以上级别不采样
+- 队列满时直接丢弃并计数，绝不阻塞请求线程
+"""
+import atexit
+import contextvars
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+
+from flask import g, request
+
+from json_response import dumps
+
+# 队列上限，超过后新日志直接丢弃
+LOG_QUEUE_SIZE = 10000
+
+# 后台线程的刷新间隔（秒）
+FLUSH_INTERVAL = 0.2
+
+LEVELS = {'DEBUG': 10, 'INFO': 20, 'WARNING': 30, 'ERROR': 40}
+
+# 全局最低输出级别
+MIN_LEVEL = LEVELS['INFO']
+
+# 当前请求ID，所有蓝图共享
+request_id_var = contextvars.ContextVar('request_id', default=None)
+
+_queue = deque()
+_wakeup = threading.Event()
+_writer = None
+_writer_lock = threading.Lock()
+_output = sys.stdout
+
+# logger名称 -> 采样率(0~1)
+sample_rates = {}
+
+# 丢弃统计
+dropped = {'backpressure': 0, 'sampled': 0}
+
+_loggers = {}
+
+
+class AsyncLogger:
+    """只负责组装记录并入队，不做任何IO"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def log(self, level, message, **fields):
+        levelno = LEVELS[level]
+        if levelno < MIN_LEVEL:
+            return
+
+        rate = sample_rates.get(self.name, 1.0)
+        if levelno < LEVELS['WARNING'] and rate < 1.0 and random.random() >= rate:
+            dropped['sampled'] += 1
+            return
+
+        if len(_queue) >= LOG_QUEUE_SIZE:
+            dropped['backpressure'] += 1
+            return
+
+        record = {
+            'ts': time.time(),
+            'level': level,
+            'logger': self.name,
+            'msg': message
+        }
+        request_id = request_id_var.get()
+        if request_id:
+            record['request_id'] = request_id
+        if fields:
+            record.update(fields)
+
+        _queue.append(record)
+        _ensure_writer()
+
+    def debug(self, message, **fields):
+        self.log('DEBUG', message, **fields)
+
+    def info(self, message, **fields):
+        self.log('INFO', message, **fields)
+
+    def warning(self, message, **fields):
+        self.log('WARNING', message, **fields)
+
+    def error(self, message, **fields):
+        self.log('ERROR', message, **fields)
+
+
+def get_logger(name, sample_rate=None):
+    """获取logger，可同时设置该logger的采样率"""
+    logger = _loggers.get(name)
+    if logger is None:
+        logger = _loggers.setdefault(name, AsyncLogger(name))
+    if sample_rate is not None:
+        set_sample_rate(name, sample_rate)
+    return logger
+
+
+def set_sample_rate(name, rate):
+    sample_rates[name] = min(1.0, max(0.0, rate))
+
+
+def configure(output=None, min_level=None, queue_size=None):
+    """修改输出目标（文件对象或路径）、最低级别和队列上限"""
+    global _output, MIN_LEVEL, LOG_QUEUE_SIZE
+    if isinstance(output, str):
+        output = open(output, 'a', encoding='utf-8', buffering=1)
+    if output is not None:
+        _output = output
+    if min_level is not None:
+        MIN_LEVEL = LEVELS[min_level]
+    if queue_size is not None:
+        LOG_QUEUE_SIZE = queue_size
+
+
+# ==================== 后台写线程 ====================
+def _format(record):
+    record['ts'] = datetime.fromtimestamp(record['ts']).isoformat(timespec='milliseconds')
+    try:
+        return dumps(record).decode('utf-8')
+    except TypeError:
+        return dumps({k: str(v) for k, v in record.items()}).decode('utf-8')
+
+
+def flush():
+    """把队列中的日志全部写出"""
+    lines = []
+    while True:
+        try:
+            lines.append(_format(_queue.popleft()))
+        except IndexError:
+            break
+    if lines:
+        try:
+            _output.write('\n'.join(lines) + '\n')
+            _output.flush()
+        except (OSError, ValueError):
+            # 输出不可用时丢弃，不影响请求
+            dropped['backpressure'] += len(lines)
+
+
+def _writer_loop():
+    while True:
+        _wakeup.wait(FLUSH_INTERVAL)
+        _wakeup.clear()
+        flush()
+
+
+def _ensure_writer():
+    global _writer
+    if _writer is not None and _writer.is_alive():
+        return
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=_writer_loop, name='async-log-writer', daemon=True)
+            _writer.start()
+
+
+atexit.register(flush)
+
+
+# ==================== Flask集成 ====================
+def init_request_logging(app, access_log=True):
+    """
+    为Flask应用注册请求ID上下文和访问日志
+    请求ID优先取请求头 X-Request-ID，否则生成新的，并在响应头中返回
+    """
+    access_logger = get_logger('access')
+
+    @app.before_request
+    def bind_request_id():
+        request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+        g.request_id = request_id
+        g.log_start = time.perf_counter()
+        g.request_id_token = request_id_var.set(request_id)
+
+    @app.after_request
+    def log_access(response):
+        request_id = g.get('request_id')
+        if request_id:
+            response.headers['X-Request-ID'] = request_id
+        if access_log:
+            elapsed = time.perf_counter() - g.get('log_start', time.perf_counter())
+            access_logger.info('request', method=request.method, path=request.path,
+                               endpoint=request.endpoint, status=response.status_code,
+                               ms=round(elapsed * 1000, 3))
+        return response
+
+    @app.teardown_request
+    def unbind_request_id(exc):
+        token = g.pop('request_id_token', None)
+        if token is not None:
+            request_id_var.reset(token)
+
+    return app
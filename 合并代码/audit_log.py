@@ -0,0 +1,105 @@
+# audit_log.py
+"""
+管理操作审计日志
+- 请求线程只把记录追加到内存队列，由后台线程批量写入 admin_audit_log（executemany），不占用请求的事务和连接
+- 写入失败时记录放回队列下次重试，队列满时丢弃最旧的记录
+- 进程退出时尽量把剩余记录写完
+"""
+import atexit
+import threading
+from collections import deque
+from datetime import datetime
+
+from async_log import get_logger
+from json_response import dumps
+
+# 队列上限，数据库长时间不可用时丢弃最旧的记录
+AUDIT_QUEUE_SIZE = 10000
+
+# 后台线程的刷新间隔（秒）与单批最多写入条数
+FLUSH_INTERVAL = 1.0
+BATCH_SIZE = 500
+
+_queue = deque(maxlen=AUDIT_QUEUE_SIZE)
+_wakeup = threading.Event()
+_writer = None
+_writer_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_connect = None
+
+stats = {'written': 0, 'failed_batches': 0}
+
+logger = get_logger('audit')
+
+
+def init_audit(connect):
+    """设置数据库连接函数并启动后台写线程"""
+    global _connect
+    _connect = connect
+    _ensure_writer()
+
+
+def record(admin_id, action, target_type, target_ids, detail=None):
+    """
+    追加一条审计记录（不做IO）
+    action: 如 'ban' / 'unban'；target_ids: 受影响对象ID列表；detail: 任意可序列化为JSON的附加信息
+    """
+    if len(_queue) == _queue.maxlen:
+        logger.warning('审计队列已满，丢弃最旧记录')
+    _queue.append((admin_id, action, target_type, dumps(list(target_ids)).decode('utf-8'),
+                   dumps(detail).decode('utf-8') if detail is not None else None, datetime.now()))
+    _wakeup.set()
+
+
+def flush():
+    """把队列中的记录写入数据库，返回写入条数"""
+    if _connect is None or not _queue:
+        return 0
+    with _flush_lock:
+        written = 0
+        while _queue:
+            batch = []
+            while _queue and len(batch) < BATCH_SIZE:
+                batch.append(_queue.popleft())
+            conn = None
+            try:
+                conn = _connect()
+                cursor = conn.cursor()
+                cursor.executemany("""
+                    INSERT INTO admin_audit_log (Admin_id, Action, Target_type, Target_ids, Detail, Created_at)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                """, batch)
+                conn.commit()
+                cursor.close()
+            except Exception as e:
+                # 放回队列头部，下次重试
+                _queue.extendleft(reversed(batch))
+                stats['failed_batches'] += 1
+                logger.error('审计日志写入失败', error=str(e), pending=len(_queue))
+                break
+            finally:
+                if conn is not None:
+                    conn.close()
+            written += len(batch)
+        stats['written'] += written
+        return written
+
+
+def _writer_loop():
+    while True:
+        _wakeup.wait(FLUSH_INTERVAL)
+        _wakeup.clear()
+        flush()
+
+
+def _ensure_writer():
+    global _writer
+    if _writer is not None and _writer.is_alive():
+        return
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=_writer_loop, name='audit-log-writer', daemon=True)
+            _writer.start()
+
+
+atexit.register(flush)
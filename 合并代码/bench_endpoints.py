@@ -0,0 +1,372 @@
+# bench_endpoints.py
+"""
+接口压测与基准对比
+1. 把各脚本中的蓝图合并到一个Flask应用，连接独立的压测数据库（默认 flutterpage_bench）
+2. 用 datagen 按数据规模档位灌入测试数据（full: 10万小说 / 1000万章节 / 5000万阅读记录 / 500万收藏 / 2000万评论）
+3. 运行混合负载：读者阅读、作者后台、搜索突发、阅读进度心跳
+4. 统计 p50/p95/p99 延迟、吞吐量、每请求数据库往返次数（来自 Server-Timing 头）
+5. 与保存的基准结果对比，性能退化时返回非0
+
+用法:
+    python bench_endpoints.py --seed --profile small
+    python bench_endpoints.py --scenario all --duration 30 --save-baseline
+    python bench_endpoints.py --scenario all --duration 30 --compare
+"""
+import argparse
+import http.client
+import importlib.util
+import json
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+import pymysql
+from flask import Blueprint, Flask
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from compression import init_compression
+from datagen import PROFILES, generate
+from query_profiler import init_profiling
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 压测数据库配置，可用环境变量覆盖
+BENCH_DB_CONFIG = {
+    'host': os.environ.get('BENCH_DB_HOST', 'localhost'),
+    'port': int(os.environ.get('BENCH_DB_PORT', 3306)),
+    'user': os.environ.get('BENCH_DB_USER', 'root'),
+    'password': os.environ.get('BENCH_DB_PASSWORD', '123456'),
+    'database': os.environ.get('BENCH_DB_NAME', 'flutterpage_bench'),
+    'charset': 'utf8mb4'
+}
+
+# 脚本文件 -> 模块名（与文件头注释一致）
+API_MODULES = {
+    '4.py': 'novel_api',
+    '5.py': 'chapter_api',
+    '6.py': 'comment_api',
+    '7.py': 'search_api',
+    '8.py': 'reading_api',
+    '9.py': 'favorite_api',
+    '10.py': 'author_api'
+}
+
+# 压测会话数
+BENCH_SESSIONS = 200
+
+BASELINE_FILE = os.path.join(BASE_DIR, 'bench_baseline.json')
+
+_SERVER_TIMING_DB = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries"')
+
+
+# ==================== 应用组装 ====================
+def load_api_modules():
+    """按文件路径加载各接口脚本（文件名是数字，不能直接import）"""
+    modules = {}
+    for filename, name in API_MODULES.items():
+        spec = importlib.util.spec_from_file_location(name, os.path.join(BASE_DIR, filename))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        modules[name] = module
+    return modules
+
+
+def build_app(modules, sessions):
+    """把所有蓝图注册到同一个应用，数据库指向压测库，并注入压测会话"""
+    app = Flask('bench')
+    for module in modules.values():
+        module.DB_CONFIG.clear()
+        module.DB_CONFIG.update(BENCH_DB_CONFIG)
+        if hasattr(module, 'user_sessions'):
+            module.user_sessions.update(sessions)
+        for value in vars(module).values():
+            if isinstance(value, Blueprint) and value.name not in app.blueprints:
+                app.register_blueprint(value)
+
+    init_compression(app)
+    init_profiling(app)
+    return app
+
+
+def start_server(app, port):
+    # HTTP/1.1 以便客户端复用连接
+    WSGIRequestHandler.protocol_version = 'HTTP/1.1'
+    server = make_server('127.0.0.1', port, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+# ==================== 数据灌入 ====================
+def seed_database(profile_name, workers=None):
+    """重建压测库并用数据生成器灌入数据"""
+    server_config = dict(BENCH_DB_CONFIG)
+    database = server_config.pop('database')
+    conn = pymysql.connect(**server_config)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP DATABASE IF EXISTS {database}")
+            cursor.execute(f"CREATE DATABASE {database} DEFAULT CHARSET utf8mb4")
+        conn.commit()
+    finally:
+        conn.close()
+
+    totals = generate(PROFILES[profile_name], db_config=BENCH_DB_CONFIG, workers=workers)
+    print(f"✅ 压测数据灌入完成: {totals}")
+
+
+def database_counts():
+    """读取当前压测库的数据量，用于生成请求参数"""
+    conn = pymysql.connect(**BENCH_DB_CONFIG)
+    try:
+        with conn.cursor() as cursor:
+            counts = {}
+            for table, column in [('users', 'User_id'), ('novels', 'Novel_id'),
+                                  ('chapters', 'Chapter_id')]:
+                cursor.execute(f"SELECT MAX({column}) FROM {table}")
+                counts[table] = cursor.fetchone()[0] or 1
+            return counts
+    finally:
+        conn.close()
+
+
+# ==================== 负载定义 ====================
+def _skewed(rng, n):
+    """偏向小ID的随机数，模拟热门内容"""
+    return int(n * rng.random() ** 3) + 1
+
+
+def _session(rng):
+    return f'bench-{rng.randint(1, BENCH_SESSIONS)}'
+
+
+SEARCH_WORDS = ['小说', '第1', '简介', '1', '23', '本']
+
+
+def reader_request(rng, counts):
+    novel_id = _skewed(rng, counts['novels'])
+    choice = rng.random()
+    if choice < 0.2:
+        return 'novels.list', 'GET', f'/api/novels?page={rng.randint(1, 20)}', None
+    if choice < 0.35:
+        return 'novels.detail', 'GET', f'/api/novels/{novel_id}', None
+    if choice < 0.5:
+        return 'chapters.list', 'GET', f'/api/chapters/novel/{novel_id}', None
+    if choice < 0.8:
+        return 'chapters.detail', 'GET', f'/api/chapters/{_skewed(rng, counts["chapters"])}', None
+    if choice < 0.9:
+        return 'comments.list', 'GET', f'/api/comments/novel/{novel_id}', None
+    return 'favorites.my', 'GET', '/api/favorites/my', None
+
+
+def author_request(rng, counts):
+    if rng.random() < 0.6:
+        return 'author.novels', 'GET', '/api/author/novels', None
+    return 'author.stats', 'GET', f'/api/author/novels/{_skewed(rng, counts["novels"])}/stats', None
+
+
+def search_request(rng, counts):
+    if rng.random() < 0.8:
+        word = rng.choice(SEARCH_WORDS)
+        return 'search.novels', 'GET', f'/api/search/novels?keyword={word}&page={rng.randint(1, 3)}', None
+    return 'search.popular', 'GET', '/api/search/popular', None
+
+
+def heartbeat_request(rng, counts):
+    body = {
+        'chapter_id': _skewed(rng, counts['chapters']),
+        'progress': rng.randint(0, 100),
+        'duration': 30
+    }
+    return 'reading.record', 'POST', '/api/reading/record', body
+
+
+SCENARIOS = {
+    'reader': [(reader_request, 1.0)],
+    'author': [(author_request, 1.0)],
+    'search': [(search_request, 1.0)],
+    'heartbeat': [(heartbeat_request, 1.0)],
+    'mixed': [(reader_request, 0.6), (heartbeat_request, 0.25),
+              (search_request, 0.1), (author_request, 0.05)]
+}
+
+
+def _pick_generator(rng, mix):
+    value = rng.random()
+    for generator, weight in mix:
+        value -= weight
+        if value <= 0:
+            return generator
+    return mix[-1][0]
+
+
+# ==================== 压测执行 ====================
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+def run_scenario(name, port, counts, threads, duration, seed):
+    mix = SCENARIOS[name]
+    samples = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        local = []
+        while time.perf_counter() < deadline:
+            label, method, path, body = _pick_generator(rng, mix)(rng, counts)
+            headers = {'X-Session-ID': _session(rng), 'Accept-Encoding': 'gzip'}
+            payload = None
+            if body is not None:
+                payload = json.dumps(body)
+                headers['Content-Type'] = 'application/json'
+
+            start = time.perf_counter()
+            try:
+                conn.request(method, path, body=payload, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+                timing = response.getheader('Server-Timing', '')
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                status, timing = 0, ''
+            elapsed = time.perf_counter() - start
+
+            match = _SERVER_TIMING_DB.search(timing)
+            queries = int(match.group(2)) if match else 0
+            local.append((label, elapsed, status, queries))
+        conn.close()
+        with lock:
+            samples.extend(local)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    wall = time.perf_counter() - started
+
+    return summarize(samples, wall)
+
+
+def summarize(samples, wall):
+    """汇总为 总体 + 按接口 的统计"""
+    groups = {'_all': samples}
+    for sample in samples:
+        groups.setdefault(sample[0], []).append(sample)
+
+    result = {}
+    for label, items in groups.items():
+        latencies = [s[1] * 1000 for s in items]
+        errors = sum(1 for s in items if s[2] == 0 or s[2] >= 500)
+        result[label] = {
+            'requests': len(items),
+            'throughput': len(items) / wall if wall else 0.0,
+            'p50_ms': _percentile(latencies, 0.50),
+            'p95_ms': _percentile(latencies, 0.95),
+            'p99_ms': _percentile(latencies, 0.99),
+            'db_round_trips': sum(s[3] for s in items) / len(items) if items else 0.0,
+            'errors': errors
+        }
+    return result
+
+
+def print_report(name, result):
+    print(f"\n📊 场景 {name}")
+    print(f"{'接口':<18}{'请求数':>8}{'吞吐(req/s)':>13}{'p50(ms)':>10}{'p95(ms)':>10}"
+          f"{'p99(ms)':>10}{'DB往返':>8}{'错误':>6}")
+    for label in sorted(result, key=lambda k: (k != '_all', k)):
+        r = result[label]
+        print(f"{label:<18}{r['requests']:>8}{r['throughput']:>13.1f}{r['p50_ms']:>10.2f}"
+              f"{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['db_round_trips']:>8.1f}{r['errors']:>6}")
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """p95/p99变慢、吞吐下降或DB往返增加超过容忍度时视为退化"""
+    regressions = []
+    for scenario, groups in results.items():
+        for label, current in groups.items():
+            previous = baseline.get(scenario, {}).get(label)
+            if not previous:
+                continue
+            for key in ('p95_ms', 'p99_ms'):
+                if previous[key] and current[key] > previous[key] * (1 + tolerance):
+                    regressions.append(f"{scenario}/{label} {key}: {previous[key]:.2f} -> {current[key]:.2f}")
+            if previous['throughput'] and current['throughput'] < previous['throughput'] * (1 - tolerance):
+                regressions.append(f"{scenario}/{label} throughput: "
+                                   f"{previous['throughput']:.1f} -> {current['throughput']:.1f}")
+            if current['db_round_trips'] > previous['db_round_trips'] + 0.5:
+                regressions.append(f"{scenario}/{label} db_round_trips: "
+                                   f"{previous['db_round_trips']:.1f} -> {current['db_round_trips']:.1f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='FlutterPage 接口压测')
+    parser.add_argument('--seed', action='store_true', help='重建压测库并灌入数据')
+    parser.add_argument('--workers', type=int, default=None, help='灌数据的进程数')
+    parser.add_argument('--profile', default='small', choices=sorted(PROFILES))
+    parser.add_argument('--scenario', default='mixed', help='场景名或 all')
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=20.0, help='每个场景的秒数')
+    parser.add_argument('--warmup', type=float, default=3.0)
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--random-seed', type=int, default=42)
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--compare', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+
+    if args.seed:
+        seed_database(args.profile, args.workers)
+
+    counts = database_counts()
+    sessions = {f'bench-{i}': {'user_id': i, 'username': f'user{i}'}
+                for i in range(1, BENCH_SESSIONS + 1)}
+    modules = load_api_modules()
+    server = start_server(build_app(modules, sessions), args.port)
+
+    scenarios = list(SCENARIOS) if args.scenario == 'all' else [args.scenario]
+    results = {}
+    try:
+        for name in scenarios:
+            if args.warmup > 0:
+                run_scenario(name, args.port, counts, args.threads, args.warmup, args.random_seed)
+            results[name] = run_scenario(name, args.port, counts, args.threads,
+                                         args.duration, args.random_seed)
+            print_report(name, results[name])
+    finally:
+        server.shutdown()
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 基准结果已保存: {args.baseline}")
+
+    if args.compare:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print("\n❌ 性能退化:")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print("\n✅ 与基准相比无退化")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+# bench_json.py
+"""
+JSON序列化基准测试
+对比旧写法（逐行isoformat + jsonify）与 json_response 编码器：
+- 100行小说分页（get_novels）
+- 20000字章节正文（get_chapter）
+运行: python bench_json.py
+"""
+import copy
+import random
+import timeit
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from flask import Flask, jsonify
+
+import json_response as jr
+
+app = Flask(__name__)
+
+# 用于生成正文的常用汉字
+HANZI = '的一是了我不人在他有这个上们来到时大地为子中你说生国年着就那和要她出也得里后自以会家可下而过天去能对小多然于心学么之都好看起发当没成只如事把还用第样道想作种开美总从无情己面最女但现前些所同日手又行意动方期它头经长儿回位分爱老因很给名法间斯知世什两次使身者被高已亲其进此话常与活正感'
+
+
+def make_novel_rows(n=100):
+    """生成模拟DictCursor返回的小说行"""
+    base = datetime(2024, 1, 1, 8, 0, 0)
+    rows = []
+    for i in range(n):
+        rows.append({
+            'Novel_id': i + 1,
+            'Author_id': random.randint(1, 1000),
+            'Title': ''.join(random.choices(HANZI, k=8)),
+            'Description': ''.join(random.choices(HANZI, k=120)),
+            'Cover_url': f'/static/covers/{i + 1}.jpg',
+            'Status': 'published',
+            'Word_count': random.randint(10000, 3000000),
+            'Created_at': base + timedelta(hours=i),
+            'Updated_at': base + timedelta(days=i, minutes=7),
+        })
+    return rows
+
+
+def make_chapter_row(chars=20000):
+    return {
+        'Chapter_id': 1,
+        'Novel_id': 1,
+        'Chapter_num': 1,
+        'Title': '第一章 ' + ''.join(random.choices(HANZI, k=6)),
+        'Content': ''.join(random.choices(HANZI + '，。！？\n', k=chars)),
+        'Word_count': Decimal(chars),
+        'Created_at': datetime(2024, 1, 1, 8, 0, 0),
+        'Updated_at': datetime(2024, 1, 2, 9, 30, 0),
+    }
+
+
+def legacy_novels(rows):
+    """旧写法：逐行转换日期后jsonify"""
+    for novel in rows:
+        for field in ['Created_at', 'Updated_at']:
+            if novel[field] and isinstance(novel[field], datetime):
+                novel[field] = novel[field].isoformat()
+    return jsonify({'status': 'success', 'data': rows}).get_data()
+
+
+def new_novels(rows):
+    return jr.json_response({'status': 'success', 'data': rows}).get_data()
+
+
+def legacy_chapter(row):
+    return jsonify({'status': 'success', 'data': row}).get_data()
+
+
+def new_chapter(row):
+    return jr.json_response({'status': 'success', 'data': row}).get_data()
+
+
+def bench(name, func, make_input, number):
+    # 旧写法会原地修改行，每轮都给一份新拷贝，拷贝时间在两边都计入
+    inputs = [make_input() for _ in range(number)]
+    it = iter(inputs)
+    seconds = timeit.timeit(lambda: func(next(it)), number=number)
+    size = len(func(make_input()))
+    print(f'{name:<28} {seconds / number * 1e6:>10.1f} us/次   {size:>8} 字节')
+
+
+def main():
+    random.seed(42)
+    novels = make_novel_rows(100)
+    chapter = make_chapter_row(20000)
+    backend = 'orjson' if jr.orjson is not None else 'json(标准库)'
+
+    with app.test_request_context('/'):
+        print('=' * 60)
+        print(f'编码后端: {backend}')
+        print('=' * 60)
+        bench('100行小说 - 旧写法', legacy_novels, lambda: copy.deepcopy(novels), 500)
+        bench('100行小说 - json_response', new_novels, lambda: copy.deepcopy(novels), 500)
+        bench('20000字章节 - 旧写法', legacy_chapter, lambda: chapter, 500)
+        bench('20000字章节 - json_response', new_chapter, lambda: chapter, 500)
+        print('=' * 60)
+
+
+if __name__ == '__main__':
+    main()
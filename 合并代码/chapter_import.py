@@ -0,0 +1,348 @@
+# chapter_import.py
+"""
+整本书稿批量导入
+- 支持 TXT（按预定义的章节标题格式切分）、EPUB（按spine顺序，每个文档一章）、JSONL（每行一章）
+- 边解析边处理：每攒够一批章节，用进程池计算字数，再在一个事务里批量插入
+- 每批章节与小说字数、Updated_at 的累加在同一事务中提交，中途失败时已导入部分的字数也是准确的
+- 缓存失效回调执行完后才把任务标记为 done
+- 任务在后台线程执行，进度通过 import_jobs 查询
+"""
+import html
+import json
+import os
+import re
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from html.parser import HTMLParser
+from xml.etree import ElementTree
+
+from async_log import get_logger
+from text_stats import count_words
+
+# 可选的章节标题格式：只接受预定义的正则，不执行请求中传入的正则（避免回溯爆炸）
+_CHINESE_HEADING = r'第[零一二三四五六七八九十百千万两〇\d]+[章节回卷集部篇][^\n]{0,40}'
+_ENGLISH_HEADING = r'Chapter\s+\d+[^\n]{0,40}'
+HEADING_PATTERNS = {
+    # 第X章/节/回/卷，或 Chapter N
+    'default': rf'^\s*({_CHINESE_HEADING}|{_ENGLISH_HEADING})\s*$',
+    'chinese': rf'^\s*{_CHINESE_HEADING}\s*$',
+    'english': rf'^\s*{_ENGLISH_HEADING}\s*$',
+    # 1. 标题 / 1、标题
+    'numbered': r'^\s*\d{1,5}[.、．][^\n]{1,40}$',
+    # Markdown 一到三级标题
+    'markdown': r'^#{1,3}\s[^\n]{1,60}$'
+}
+DEFAULT_HEADING_STYLE = 'default'
+
+# 每个事务插入的章节数
+IMPORT_BATCH = 200
+
+# 单个上传文件上限
+MAX_IMPORT_BYTES = 200 * 1024 * 1024
+
+# 同时执行的导入任务数
+MAX_IMPORT_JOBS = 2
+
+SUPPORTED_FORMATS = ('txt', 'epub', 'jsonl')
+
+# 已结束（完成或失败）的任务保留多久供查询进度（秒）
+FINISHED_JOB_TTL = 3600
+
+# job_id -> 任务状态
+import_jobs = {}
+_jobs_lock = threading.Lock()
+
+_job_executor = ThreadPoolExecutor(max_workers=MAX_IMPORT_JOBS, thread_name_prefix='chapter-import')
+_count_pool = None
+_count_pool_lock = threading.Lock()
+
+logger = get_logger('chapter_import')
+
+
+def _get_count_pool():
+    global _count_pool
+    with _count_pool_lock:
+        if _count_pool is None:
+            _count_pool = ProcessPoolExecutor()
+        return _count_pool
+
+
+def detect_format(filename, declared=None):
+    if declared:
+        declared = declared.lower()
+        return declared if declared in SUPPORTED_FORMATS else None
+    ext = os.path.splitext(filename or '')[1].lower().lstrip('.')
+    if ext == 'json':
+        ext = 'jsonl'
+    return ext if ext in SUPPORTED_FORMATS else None
+
+
+# ==================== 解析器（生成器，逐章产出 (标题, 正文)） ====================
+def _detect_encoding(path):
+    """TXT书稿常见UTF-8和GB18030两种编码"""
+    with open(path, 'rb') as f:
+        head = f.read(65536)
+    try:
+        head.decode('utf-8')
+        return 'utf-8-sig'
+    except UnicodeDecodeError as e:
+        # 截断在多字节字符中间不算错误
+        if e.start >= len(head) - 3:
+            return 'utf-8-sig'
+        return 'gb18030'
+
+
+def parse_txt(path, heading_style=None):
+    heading = re.compile(HEADING_PATTERNS[heading_style or DEFAULT_HEADING_STYLE])
+    title = None
+    lines = []
+
+    with open(path, encoding=_detect_encoding(path), errors='replace') as f:
+        for line in f:
+            line = line.rstrip('\r\n')
+            if heading.match(line):
+                body = '\n'.join(lines).strip()
+                if title is not None or body:
+                    yield (title or '序章'), body
+                title = line.strip()
+                lines = []
+            else:
+                lines.append(line)
+
+    body = '\n'.join(lines).strip()
+    if title is not None or body:
+        yield (title or '正文'), body
+
+
+def parse_jsonl(path, heading_style=None):
+    count = 0
+    with open(path, encoding='utf-8-sig') as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                raise ValueError(f'第{number}行不是有效的JSON')
+            if 'content' not in item:
+                raise ValueError(f'第{number}行缺少content字段')
+            count += 1
+            yield item.get('title') or f'第{count}章', item['content']
+
+
+class _TextExtractor(HTMLParser):
+    """从XHTML中提取纯文本和标题"""
+    BLOCK_TAGS = {'p', 'div', 'br', 'h1', 'h2', 'h3', 'h4', 'li', 'section'}
+
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self.title = None
+        self._in_heading = False
+        self._heading = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ('script', 'style', 'head'):
+            self._skip += 1
+        elif tag in ('h1', 'h2', 'h3') and self.title is None:
+            self._in_heading = True
+        if tag in self.BLOCK_TAGS:
+            self.parts.append('\n')
+
+    def handle_endtag(self, tag):
+        if tag in ('script', 'style', 'head'):
+            self._skip = max(0, self._skip - 1)
+        elif tag in ('h1', 'h2', 'h3') and self._in_heading:
+            self._in_heading = False
+            self.title = ''.join(self._heading).strip() or None
+            # 标题不计入正文
+            return
+        if tag in self.BLOCK_TAGS:
+            self.parts.append('\n')
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        if self._in_heading:
+            self._heading.append(data)
+        else:
+            self.parts.append(data)
+
+    def text(self):
+        text = html.unescape(''.join(self.parts))
+        return '\n'.join(line.strip() for line in text.splitlines() if line.strip())
+
+
+def parse_epub(path, heading_style=None):
+    ns = {
+        'c': 'urn:oasis:names:tc:opendocument:xmlns:container',
+        'opf': 'http://www.idpf.org/2007/opf'
+    }
+    with zipfile.ZipFile(path) as book:
+        container = ElementTree.fromstring(book.read('META-INF/container.xml'))
+        rootfile = container.find('.//c:rootfile', ns).get('full-path')
+        base = os.path.dirname(rootfile)
+        opf = ElementTree.fromstring(book.read(rootfile))
+
+        manifest = {item.get('id'): item for item in opf.find('opf:manifest', ns)}
+        for itemref in opf.find('opf:spine', ns):
+            item = manifest.get(itemref.get('idref'))
+            if item is None or 'nav' in (item.get('properties') or ''):
+                continue
+            href = item.get('href')
+            name = f'{base}/{href}' if base else href
+            parser = _TextExtractor()
+            parser.feed(book.read(name).decode('utf-8', errors='replace'))
+            content = parser.text()
+            if content:
+                yield parser.title or os.path.splitext(os.path.basename(href))[0], content
+
+
+PARSERS = {
+    'txt': parse_txt,
+    'jsonl': parse_jsonl,
+    'epub': parse_epub
+}
+
+
+# ==================== 任务 ====================
+def _update_job(job_id, **fields):
+    with _jobs_lock:
+        import_jobs[job_id].update(fields, updated_at=time.time())
+
+
+def _expire_jobs():
+    """清理结束超过 FINISHED_JOB_TTL 的任务，调用方需持有 _jobs_lock"""
+    deadline = time.time() - FINISHED_JOB_TTL
+    for job_id in [job_id for job_id, job in import_jobs.items()
+                   if job['status'] in ('done', 'failed') and job['updated_at'] < deadline]:
+        del import_jobs[job_id]
+
+
+def get_job(job_id):
+    with _jobs_lock:
+        _expire_jobs()
+        job = import_jobs.get(job_id)
+        return dict(job) if job else None
+
+
+def _batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _insert_batch(conn, novel_id, start_num, batch, word_counts):
+    """插入一批章节，并在同一事务中累加小说字数、更新 Updated_at"""
+    now = datetime.now()
+    rows = [
+        (novel_id, start_num + i, title[:200], content, words, now, now)
+        for i, ((title, content), words) in enumerate(zip(batch, word_counts))
+    ]
+    cursor = conn.cursor()
+    try:
+        cursor.executemany("""
+            INSERT INTO chapters (Novel_id, Chapter_num, Title, Content,
+                                 Word_count, Created_at, Updated_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, rows)
+        cursor.execute("""
+            UPDATE novels
+            SET Word_count = Word_count + %s, Updated_at = %s
+            WHERE Novel_id = %s
+        """, (sum(word_counts), now, novel_id))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def _run_import(job_id, path, fmt, novel_id, start_num, heading_style, connect, on_complete):
+    conn = None
+    imported = 0
+    total_words = 0
+    try:
+        _update_job(job_id, status='running')
+        conn = connect()
+
+        if start_num is None:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COALESCE(MAX(Chapter_num), 0) FROM chapters WHERE Novel_id = %s",
+                           (novel_id,))
+            start_num = cursor.fetchone()[0] + 1
+            cursor.close()
+
+        pool = _get_count_pool()
+        for batch in _batched(PARSERS[fmt](path, heading_style), IMPORT_BATCH):
+            word_counts = list(pool.map(count_words, [content for _, content in batch], chunksize=16))
+            _insert_batch(conn, novel_id, start_num + imported, batch, word_counts)
+            imported += len(batch)
+            total_words += sum(word_counts)
+            _update_job(job_id, imported=imported, words=total_words)
+
+    except Exception as e:
+        error = str(e)
+        logger.error('章节导入失败', job_id=job_id, novel_id=novel_id, imported=imported, error=error)
+
+    else:
+        error = None
+        logger.info('章节导入完成', job_id=job_id, novel_id=novel_id, chapters=imported, words=total_words)
+
+    finally:
+        if conn is not None:
+            conn.close()
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    # 已提交的章节无论成功失败都要让缓存失效，之后再公布任务结果
+    if imported and on_complete:
+        try:
+            on_complete(novel_id)
+        except Exception as e:
+            logger.error('导入后缓存失效失败', job_id=job_id, novel_id=novel_id, error=str(e))
+    if error is None:
+        _update_job(job_id, status='done')
+    else:
+        _update_job(job_id, status='failed', error=error)
+
+
+def start_import(path, fmt, novel_id, user_id, connect, start_num=None,
+                 heading_style=None, on_complete=None):
+    """
+    提交导入任务，返回job_id
+    heading_style: TXT章节标题格式，HEADING_PATTERNS 的键
+    connect: 创建数据库连接的函数；on_complete(novel_id): 导入结束后的回调（如让缓存失效）
+    """
+    job_id = uuid.uuid4().hex
+    with _jobs_lock:
+        _expire_jobs()
+        import_jobs[job_id] = {
+            'job_id': job_id,
+            'novel_id': novel_id,
+            'user_id': user_id,
+            'format': fmt,
+            'status': 'queued',
+            'imported': 0,
+            'words': 0,
+            'error': None,
+            'created_at': time.time(),
+            'updated_at': time.time()
+        }
+    _job_executor.submit(_run_import, job_id, path, fmt, novel_id, start_num,
+                         heading_style, connect, on_complete)
+    return job_id
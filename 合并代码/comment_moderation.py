@@ -0,0 +1,363 @@
+# comment_moderation.py
+"""
+作者评论管理
+- 读者对作品的顶层评论在 comments.Novel_author_id 记下作品作者，作者的所有评论按该列走索引，
+  不再把全部评论下发到前端筛选
+- 筛选（作品、已读/回复状态、情感）、搜索、排序都在服务端完成，按 Comment_id（或回复数+ID）键集分页
+- author_comment_counters 保存每位作者的未读数、未回复数和总数，发表/回复/标记已读/删除时在同一事务里增减；
+  被判为垃圾的评论不计入未读数和未回复数
+- 只能回复顶层评论；删除评论时连同其下所有回复一起删除
+- 批量回复、标记已读、删除各自在一个事务内完成
+- 只修改管理状态时写 Updated_at = Updated_at，不影响评论列表的 ETag
+"""
+from datetime import datetime
+
+import pymysql
+
+# 每页最大条数、单次批量操作最多的评论数、每条评论附带的回复数
+MAX_PAGE_SIZE = 100
+MAX_BATCH = 200
+REPLIES_PER_COMMENT = 5
+
+SENTIMENTS = ('positive', 'neutral', 'negative')
+STATUSES = ('unread', 'unreplied', 'replied', 'spam')
+SORTS = ('newest', 'oldest', 'replies')
+
+
+# ==================== 计数 ====================
+def _bump_counters(cursor, author_id, unread=0, unreplied=0, total=0):
+    if not (unread or unreplied or total):
+        return
+    cursor.execute("""
+        INSERT INTO author_comment_counters (Author_id, Unread, Unreplied, Total, Updated_at)
+        VALUES (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE Unread = Unread + VALUES(Unread), Unreplied = Unreplied + VALUES(Unreplied),
+                                Total = Total + VALUES(Total), Updated_at = VALUES(Updated_at)
+    """, (author_id, unread, unreplied, total, datetime.now()))
+
+
+def _pending_counts(comments):
+    """计数中的 (未读数, 未回复数)：垃圾评论不计入"""
+    unread = sum(1 for c in comments if not c['Is_read'] and not c['Is_spam'])
+    unreplied = sum(1 for c in comments if not c['Author_replied'] and not c['Is_spam'])
+    return unread, unreplied
+
+
+def get_counters(conn, author_id):
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    try:
+        cursor.execute("""
+            SELECT Unread, Unreplied, Total FROM author_comment_counters WHERE Author_id = %s
+        """, (author_id,))
+        row = cursor.fetchone() or {'Unread': 0, 'Unreplied': 0, 'Total': 0}
+        return {'unread': row['Unread'], 'unreplied': row['Unreplied'], 'total': row['Total']}
+    finally:
+        cursor.close()
+
+
+def comment_added(cursor, novel, comment_id, user_id, parent_id=None):
+    """
+    发表评论后在同一事务里调用；novel 为小说行（需要 Author_id）
+    读者的顶层评论进入作者的评论管理；作者回复时标记被回复的评论
+    """
+    author_id = novel['Author_id']
+    if parent_id is None:
+        if user_id != author_id:
+            cursor.execute("""
+                UPDATE comments SET Novel_author_id = %s, Updated_at = Updated_at WHERE Comment_id = %s
+            """, (author_id, comment_id))
+            _bump_counters(cursor, author_id, unread=1, unreplied=1, total=1)
+        return
+
+    cursor.execute("""
+        SELECT Novel_author_id, Is_read, Author_replied, Is_spam FROM comments WHERE Comment_id = %s FOR UPDATE
+    """, (parent_id,))
+    parent = cursor.fetchone()
+    if parent is None:
+        return
+    if user_id == author_id and parent['Novel_author_id'] == author_id:
+        cursor.execute("""
+            UPDATE comments SET Reply_count = Reply_count + 1, Author_replied = 1, Is_read = 1,
+                                Updated_at = Updated_at
+            WHERE Comment_id = %s
+        """, (parent_id,))
+        unread, unreplied = _pending_counts([parent])
+        _bump_counters(cursor, author_id, unread=-unread, unreplied=-unreplied)
+    else:
+        cursor.execute("""
+            UPDATE comments SET Reply_count = Reply_count + 1, Updated_at = Updated_at WHERE Comment_id = %s
+        """, (parent_id,))
+
+
+def check_parent(cursor, novel_id, parent_id):
+    """
+    发表回复前校验被回复的评论：必须存在、属于同一本小说且是顶层评论
+    不存在时抛出 LookupError，其它情况抛出 ValueError
+    """
+    cursor.execute("SELECT Novel_id, Parent_id FROM comments WHERE Comment_id = %s", (parent_id,))
+    parent = cursor.fetchone()
+    if parent is None:
+        raise LookupError('回复的评论不存在')
+    if parent['Novel_id'] != novel_id or parent['Parent_id'] is not None:
+        raise ValueError('只能回复本作品的顶层评论')
+
+
+def spam_flagged(conn, comment_ids):
+    """
+    评论即将被标记为垃圾时在调用方的事务里调用（不提交）：
+    从作者的未读数、未回复数中扣除这些评论，已是垃圾的评论不重复扣除
+    """
+    if not comment_ids:
+        return
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    try:
+        cursor.execute(f"""
+            SELECT Novel_author_id, Is_read, Author_replied, Is_spam FROM comments
+            WHERE Comment_id IN ({', '.join(['%s'] * len(comment_ids))}) AND Novel_author_id IS NOT NULL
+            FOR UPDATE
+        """, list(comment_ids))
+        by_author = {}
+        for comment in cursor.fetchall():
+            by_author.setdefault(comment['Novel_author_id'], []).append(comment)
+        for author_id, comments in by_author.items():
+            unread, unreplied = _pending_counts(comments)
+            _bump_counters(cursor, author_id, unread=-unread, unreplied=-unreplied)
+    finally:
+        cursor.close()
+
+
+# ==================== 查询 ====================
+def encode_cursor(comment, sort):
+    if sort == 'replies':
+        return f"{comment['Reply_count']}_{comment['Comment_id']}"
+    return str(comment['Comment_id'])
+
+
+def _decode_cursor(value, sort):
+    try:
+        if sort == 'replies':
+            reply_count, comment_id = value.split('_')
+            return int(reply_count), int(comment_id)
+        return int(value)
+    except ValueError:
+        raise ValueError('无效的分页游标')
+
+
+def list_comments(conn, author_id, novel_id=None, status=None, sentiment=None, q=None,
+                  sort='newest', cursor_value=None, limit=20):
+    """
+    作者收到的顶层评论，每条附带最早的几条回复
+    返回 (评论列表, 下一页游标)
+    """
+    if sort not in SORTS:
+        raise ValueError(f'sort 只能是 {"/".join(SORTS)}')
+    if status and status not in STATUSES:
+        raise ValueError(f'status 只能是 {"/".join(STATUSES)}')
+    if sentiment and sentiment not in SENTIMENTS:
+        raise ValueError(f'sentiment 只能是 {"/".join(SENTIMENTS)}')
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    # 所有条件都以 Novel_author_id 开头，走 (Novel_author_id, ...) 组合索引
+    conditions = ["c.Novel_author_id = %s"]
+    params = [author_id]
+    if novel_id:
+        conditions.append("c.Novel_id = %s")
+        params.append(novel_id)
+    # 未读、未回复与计数一致，不含垃圾评论
+    if status == 'unread':
+        conditions.append("c.Is_read = 0 AND c.Is_spam = 0")
+    elif status == 'unreplied':
+        conditions.append("c.Author_replied = 0 AND c.Is_spam = 0")
+    elif status == 'replied':
+        conditions.append("c.Author_replied = 1")
+    elif status == 'spam':
+        conditions.append("c.Is_spam = 1")
+    if sentiment:
+        conditions.append("c.Sentiment = %s")
+        params.append(sentiment)
+    if q:
+        # 子串搜索只在该作者的评论范围内扫描，遇到 LIMIT 即停
+        escaped = '%' + q.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        conditions.append("(c.Content LIKE %s OR u.Username LIKE %s OR n.Title LIKE %s)")
+        params.extend([escaped, escaped, escaped])
+
+    if cursor_value:
+        position = _decode_cursor(cursor_value, sort)
+        if sort == 'replies':
+            conditions.append("(c.Reply_count < %s OR (c.Reply_count = %s AND c.Comment_id < %s))")
+            params.extend([position[0], position[0], position[1]])
+        elif sort == 'oldest':
+            conditions.append("c.Comment_id > %s")
+            params.append(position)
+        else:
+            conditions.append("c.Comment_id < %s")
+            params.append(position)
+
+    order = {
+        'newest': "c.Comment_id DESC",
+        'oldest': "c.Comment_id ASC",
+        'replies': "c.Reply_count DESC, c.Comment_id DESC"
+    }[sort]
+
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    try:
+        cursor.execute(f"""
+            SELECT c.Comment_id, c.Novel_id, n.Title AS novel_title, c.User_id, u.Username,
+                   c.Content, c.Is_read, c.Author_replied, c.Reply_count, c.Sentiment,
+                   c.Sentiment_score, c.Spam_score, c.Is_spam, c.Created_at
+            FROM comments c
+            LEFT JOIN users u ON u.User_id = c.User_id
+            LEFT JOIN novels n ON n.Novel_id = c.Novel_id
+            WHERE {' AND '.join(conditions)}
+            ORDER BY {order}
+            LIMIT %s
+        """, params + [limit + 1])
+        comments = cursor.fetchall()
+        has_more = len(comments) > limit
+        comments = comments[:limit]
+
+        if comments:
+            # 一次查询取出本页每条评论最早的几条回复：每个分支走 idx_comments_parent_created
+            # 只读 REPLIES_PER_COMMENT 行，热门评论回复再多也不会整体读出
+            ids = [c['Comment_id'] for c in comments]
+            branch = """
+                (SELECT Comment_id, Parent_id, User_id, Content, Created_at FROM comments
+                 WHERE Parent_id = %s ORDER BY Created_at ASC LIMIT %s)
+            """
+            cursor.execute(f"""
+                SELECT r.Comment_id, r.Parent_id, r.User_id, u.Username, r.Content, r.Created_at
+                FROM ({' UNION ALL '.join([branch] * len(ids))}) r
+                LEFT JOIN users u ON u.User_id = r.User_id
+                ORDER BY r.Parent_id, r.Created_at ASC
+            """, [value for comment_id in ids for value in (comment_id, REPLIES_PER_COMMENT)])
+            replies = {}
+            for reply in cursor.fetchall():
+                reply['is_author'] = reply['User_id'] == author_id
+                replies.setdefault(reply['Parent_id'], []).append(reply)
+            for comment in comments:
+                comment['replies'] = replies.get(comment['Comment_id'], [])
+
+        next_cursor = encode_cursor(comments[-1], sort) if has_more else None
+        return comments, next_cursor
+    finally:
+        cursor.close()
+
+
+# ==================== 批量操作 ====================
+def _comment_ids(comment_ids):
+    if not isinstance(comment_ids, list) or not comment_ids:
+        raise ValueError('comment_ids 不能为空')
+    try:
+        comment_ids = sorted({int(comment_id) for comment_id in comment_ids})
+    except (TypeError, ValueError):
+        raise ValueError('comment_ids 必须是整数列表')
+    if len(comment_ids) > MAX_BATCH:
+        raise ValueError(f'单次最多操作 {MAX_BATCH} 条评论')
+    return comment_ids
+
+
+def _lock_comments(cursor, author_id, comment_ids):
+    """锁定属于该作者的评论，不属于的ID直接忽略"""
+    cursor.execute(f"""
+        SELECT Comment_id, Novel_id, Is_read, Author_replied, Is_spam FROM comments
+        WHERE Comment_id IN ({', '.join(['%s'] * len(comment_ids))}) AND Novel_author_id = %s
+        FOR UPDATE
+    """, comment_ids + [author_id])
+    return cursor.fetchall()
+
+
+def _run(conn, func):
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    try:
+        result = func(cursor)
+        conn.commit()
+        return result
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def mark_read(conn, author_id, comment_ids):
+    """标记已读，返回实际改变的条数"""
+    comment_ids = _comment_ids(comment_ids)
+
+    def apply(cursor):
+        unread = [c for c in _lock_comments(cursor, author_id, comment_ids) if not c['Is_read']]
+        if unread:
+            cursor.execute(f"""
+                UPDATE comments SET Is_read = 1, Updated_at = Updated_at
+                WHERE Comment_id IN ({', '.join(['%s'] * len(unread))})
+            """, [c['Comment_id'] for c in unread])
+            _bump_counters(cursor, author_id, unread=-_pending_counts(unread)[0])
+        return len(unread)
+
+    return _run(conn, apply)
+
+
+def batch_reply(conn, author_id, comment_ids, content):
+    """
+    用同一内容回复多条评论（回复者为作者本人），同时标记已读、已回复
+    返回 (回复的评论数, 涉及的小说ID集合)
+    """
+    comment_ids = _comment_ids(comment_ids)
+    content = (content or '').strip()
+    if not content:
+        raise ValueError('回复内容不能为空')
+
+    def apply(cursor):
+        comments = _lock_comments(cursor, author_id, comment_ids)
+        if not comments:
+            return 0, set()
+
+        now = datetime.now()
+        cursor.executemany("""
+            INSERT INTO comments (Novel_id, User_id, Content, Parent_id, Created_at, Updated_at)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, [(c['Novel_id'], author_id, content, c['Comment_id'], now, now) for c in comments])
+
+        ids = [c['Comment_id'] for c in comments]
+        cursor.execute(f"""
+            UPDATE comments SET Reply_count = Reply_count + 1, Author_replied = 1, Is_read = 1,
+                                Updated_at = Updated_at
+            WHERE Comment_id IN ({', '.join(['%s'] * len(ids))})
+        """, ids)
+        unread, unreplied = _pending_counts(comments)
+        _bump_counters(cursor, author_id, unread=-unread, unreplied=-unreplied)
+        return len(comments), {c['Novel_id'] for c in comments}
+
+    return _run(conn, apply)
+
+
+def batch_delete(conn, author_id, comment_ids):
+    """
+    删除评论及其下所有回复（包括早期数据中回复的回复）
+    返回 (删除的评论数, 涉及的小说ID集合)
+    """
+    comment_ids = _comment_ids(comment_ids)
+
+    def apply(cursor):
+        comments = _lock_comments(cursor, author_id, comment_ids)
+        if not comments:
+            return 0, set()
+
+        ids = [c['Comment_id'] for c in comments]
+        # 逐层找出回复，走 Parent_id 索引；回复只在 Parent_id 下，不影响作者计数
+        subtree = list(ids)
+        level = ids
+        while level:
+            cursor.execute(f"""
+                SELECT Comment_id FROM comments WHERE Parent_id IN ({', '.join(['%s'] * len(level))})
+            """, level)
+            level = [row['Comment_id'] for row in cursor.fetchall()]
+            subtree.extend(level)
+        # 先删最深层的回复，再删上层评论
+        for i in range(len(subtree), 0, -MAX_BATCH):
+            chunk = subtree[max(0, i - MAX_BATCH):i]
+            cursor.execute(f"DELETE FROM comments WHERE Comment_id IN ({', '.join(['%s'] * len(chunk))})", chunk)
+        unread, unreplied = _pending_counts(comments)
+        _bump_counters(cursor, author_id, unread=-unread, unreplied=-unreplied, total=-len(comments))
+        return len(comments), {c['Novel_id'] for c in comments}
+
+    return _run(conn, apply)
@@ -0,0 +1,322 @@
+# comment_scoring.py
+"""
+评论情感与垃圾评论打分（离线、异步）
+- 发表评论只把 (Comment_id, 内容) 放入内存队列，不在请求里打分
+- 若干工作线程从队列取评论，攒成一批后打分，用一个事务批量写回 comments
+- 打分：词典最长匹配得到词频特征，加上链接、联系方式、重复字符等规则特征，
+  与权重矩阵相乘得到情感分和垃圾分（有NumPy时整批做矩阵乘法，没有时退回纯Python）
+- 队列满、进程重启或其它进程写入的评论，由巡检线程按 Scored_at IS NULL 补扫
+- 判为垃圾的评论更新 Updated_at，公开评论列表的ETag随之失效，并在同一事务里从作者的未读、未回复计数中扣除
+
+用法:
+    python comment_scoring.py backfill   给所有未打分的评论打分
+"""
+import math
+import queue
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import comment_moderation
+from async_log import get_logger
+from search_text import normalize
+
+# 队列上限，满了直接丢弃，由巡检补扫
+SCORING_QUEUE_SIZE = 10000
+
+# 工作线程数、每批最多条数、凑批最长等待（秒）
+SCORING_WORKERS = 2
+BATCH_SIZE = 200
+BATCH_WAIT = 0.5
+
+# 巡检间隔（秒）；只补扫创建时间早于 SWEEP_DELAY 秒的评论，避免与队列中的重复
+SWEEP_INTERVAL = 60
+SWEEP_DELAY = 30
+
+# 情感分阈值、垃圾分阈值
+SENTIMENT_THRESHOLD = 0.25
+SPAM_THRESHOLD = 0.8
+SPAM_BIAS = -3.0
+
+# 只看前若干个字，超长评论不拖慢整批
+MAX_SCORE_CHARS = 500
+
+# 词 -> (情感权重, 垃圾权重)；匹配时取最长的词，'不好看' 不会再算作 '好看'
+LEXICON = {
+    # 正面
+    '好看': (2.0, 0), '精彩': (2.0, 0), '喜欢': (1.5, 0), '不错': (1.5, 0), '好': (0.5, 0),
+    '棒': (1.5, 0), '赞': (1.5, 0), '支持': (1.0, 0), '期待': (1.0, 0), '感动': (1.5, 0),
+    '爽': (1.0, 0), '神作': (2.5, 0), '好文': (2.0, 0), '推荐': (1.0, 0), '加油': (1.0, 0),
+    '有趣': (1.0, 0), '优秀': (1.5, 0), '厉害': (1.0, 0), '经典': (1.5, 0), '惊艳': (2.0, 0),
+    '细腻': (1.0, 0), '催更': (0.5, 0), '追更': (0.5, 0), '太好了': (1.5, 0), '好评': (1.5, 0),
+    # 负面（含否定搭配）
+    '难看': (-2.0, 0), '烂': (-2.0, 0), '垃圾': (-2.5, 0.5), '无聊': (-1.5, 0), '失望': (-2.0, 0),
+    '注水': (-1.5, 0), '弃坑': (-2.0, 0), '弃了': (-1.5, 0), '太监': (-2.0, 0), '烂尾': (-2.5, 0),
+    '拖沓': (-1.5, 0), '狗血': (-1.0, 0), '毒点': (-1.5, 0), '差': (-1.0, 0), '一般': (-0.5, 0),
+    '恶心': (-2.0, 0), '崩了': (-1.5, 0), '看不下去': (-2.0, 0), '退钱': (-2.0, 0), '差评': (-1.5, 0),
+    '不好': (-1.5, 0), '不好看': (-2.0, 0), '不喜欢': (-1.5, 0), '不精彩': (-1.5, 0), '不行': (-1.5, 0),
+    '不推荐': (-1.5, 0), '没意思': (-1.5, 0),
+    # 广告/引流
+    '加微信': (0, 3.0), '加v': (0, 3.0), '微信': (0, 1.5), 'vx': (0, 2.0), 'qq': (0, 1.5),
+    '兼职': (0, 2.5), '刷单': (0, 3.0), '代写': (0, 2.0), '免费领取': (0, 3.0), '点击': (0, 1.0),
+    '链接': (0, 1.0), '优惠': (0, 1.5), '返利': (0, 2.5), '日赚': (0, 3.0), '私聊': (0, 1.5),
+    '福利': (0, 1.0), '扫码': (0, 2.5), '网址': (0, 2.0), '代练': (0, 2.0), '博彩': (0, 3.5),
+    '彩票': (0, 2.0), '贷款': (0, 2.5), '看片': (0, 3.0)
+}
+
+# 规则特征：(名称, 正则, 垃圾权重)，取值为命中次数（最多计3次）
+RULES = [
+    ('url', re.compile(r'https?://|www\.|\.(?:com|cn|net|top|xyz)\b'), 3.0),
+    ('contact', re.compile(r'\d{6,}'), 2.0),
+    ('repeat', re.compile(r'(.)\1{4,}'), 1.5)
+]
+
+VOCAB = list(LEXICON)
+VOCAB_INDEX = {word: i for i, word in enumerate(VOCAB)}
+MAX_WORD_LEN = max(len(word) for word in VOCAB)
+FEATURES = len(VOCAB) + len(RULES)
+
+# 权重矩阵：每行一个特征，列为 (情感, 垃圾)
+WEIGHTS = [list(LEXICON[word]) for word in VOCAB] + [[0.0, weight] for _, _, weight in RULES]
+if np is not None:
+    WEIGHT_MATRIX = np.array(WEIGHTS, dtype=np.float32)
+
+_queue = queue.Queue(maxsize=SCORING_QUEUE_SIZE)
+_workers = []
+_workers_lock = threading.Lock()
+_connect = None
+
+stats = {'scored': 0, 'spam': 0, 'dropped': 0, 'failed_batches': 0}
+
+logger = get_logger('comment_scoring')
+
+
+# ==================== 打分 ====================
+def extract_features(text):
+    """返回 [(特征下标, 次数)]：词典最长匹配 + 规则特征"""
+    text = normalize(text)[:MAX_SCORE_CHARS]
+    counts = {}
+    i, n = 0, len(text)
+    while i < n:
+        for length in range(min(MAX_WORD_LEN, n - i), 0, -1):
+            index = VOCAB_INDEX.get(text[i:i + length])
+            if index is not None:
+                counts[index] = counts.get(index, 0) + 1
+                i += length
+                break
+        else:
+            i += 1
+    for offset, (_, pattern, _) in enumerate(RULES):
+        hits = len(pattern.findall(text))
+        if hits:
+            counts[len(VOCAB) + offset] = min(hits, 3)
+    return list(counts.items())
+
+
+def _label(sentiment):
+    if sentiment > SENTIMENT_THRESHOLD:
+        return 'positive'
+    if sentiment < -SENTIMENT_THRESHOLD:
+        return 'negative'
+    return 'neutral'
+
+
+def score_texts(texts):
+    """
+    批量打分，返回 [(情感标签, 情感分[-1, 1], 垃圾分[0, 1])]
+    """
+    features = [extract_features(text) for text in texts]
+
+    if np is not None:
+        rows = np.fromiter((r for r, f in enumerate(features) for _ in f), dtype=np.int64)
+        cols = np.fromiter((c for f in features for c, _ in f), dtype=np.int64)
+        values = np.fromiter((v for f in features for _, v in f), dtype=np.float32)
+        matrix = np.zeros((len(texts), FEATURES), dtype=np.float32)
+        np.add.at(matrix, (rows, cols), values)
+        raw = matrix @ WEIGHT_MATRIX
+        sentiments = np.tanh(raw[:, 0] / 2)
+        spams = 1 / (1 + np.exp(-(raw[:, 1] + SPAM_BIAS)))
+        return [(_label(s), round(s, 4), round(p, 4))
+                for s, p in zip(sentiments.tolist(), spams.tolist())]
+
+    results = []
+    for feature in features:
+        sentiment = sum(WEIGHTS[c][0] * v for c, v in feature)
+        spam = sum(WEIGHTS[c][1] * v for c, v in feature)
+        sentiment = math.tanh(sentiment / 2)
+        spam = 1 / (1 + math.exp(-(spam + SPAM_BIAS)))
+        results.append((_label(sentiment), round(sentiment, 4), round(spam, 4)))
+    return results
+
+
+def score_and_save(connect, comments):
+    """comments: [(Comment_id, Content)]；打分并在一个事务里写回，返回条数"""
+    if not comments:
+        return 0
+    scores = score_texts([content or '' for _, content in comments])
+    now = datetime.now()
+
+    normal, spam = [], []
+    for (comment_id, _), (label, sentiment, spam_score) in zip(comments, scores):
+        is_spam = spam_score >= SPAM_THRESHOLD
+        if is_spam:
+            spam.append((label, sentiment, spam_score, now, now, comment_id))
+        else:
+            normal.append((label, sentiment, spam_score, now, comment_id))
+
+    conn = connect()
+    cursor = conn.cursor()
+    try:
+        # 只写打分结果时保持 Updated_at 不变；垃圾评论会从公开列表隐藏，需要更新 Updated_at
+        if normal:
+            cursor.executemany("""
+                UPDATE comments SET Sentiment = %s, Sentiment_score = %s, Spam_score = %s,
+                                    Is_spam = 0, Scored_at = %s, Updated_at = Updated_at
+                WHERE Comment_id = %s
+            """, normal)
+        if spam:
+            comment_moderation.spam_flagged(conn, [row[-1] for row in spam])
+            cursor.executemany("""
+                UPDATE comments SET Sentiment = %s, Sentiment_score = %s, Spam_score = %s,
+                                    Is_spam = 1, Scored_at = %s, Updated_at = %s
+                WHERE Comment_id = %s
+            """, spam)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+    stats['scored'] += len(comments)
+    stats['spam'] += len(spam)
+    return len(comments)
+
+
+# ==================== 队列与工作线程 ====================
+def submit(comment_id, content):
+    """发表评论后调用，只入队不阻塞；队列满时丢弃，由巡检补扫"""
+    try:
+        _queue.put_nowait((comment_id, content))
+    except queue.Full:
+        stats['dropped'] += 1
+
+
+def _next_batch():
+    """阻塞等待第一条，然后在 BATCH_WAIT 内尽量凑满一批"""
+    batch = [_queue.get()]
+    deadline = time.monotonic() + BATCH_WAIT
+    while len(batch) < BATCH_SIZE:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(_queue.get(timeout=remaining))
+        except queue.Empty:
+            break
+    return batch
+
+
+def _worker_loop():
+    while True:
+        batch = _next_batch()
+        try:
+            score_and_save(_connect, batch)
+        except Exception as e:
+            # 未写回的评论 Scored_at 仍为空，巡检时会再次打分
+            stats['failed_batches'] += 1
+            logger.error('评论打分写回失败', error=str(e), size=len(batch))
+
+
+def fetch_unscored(connect, after_id=0, before=None, limit=BATCH_SIZE):
+    """Scored_at 为空的评论，按 Comment_id 顺序"""
+    conn = connect()
+    cursor = conn.cursor()
+    try:
+        query = """
+            SELECT Comment_id, Content FROM comments
+            WHERE Scored_at IS NULL AND Comment_id > %s
+        """
+        params = [after_id]
+        if before is not None:
+            query += " AND Created_at < %s"
+            params.append(before)
+        query += " ORDER BY Comment_id LIMIT %s"
+        params.append(limit)
+        cursor.execute(query, params)
+        return [(row[0], row[1]) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def sweep(connect):
+    """补扫未打分的评论（队列满被丢弃、写回失败、进程重启），返回条数"""
+    total, after_id = 0, 0
+    before = datetime.now() - timedelta(seconds=SWEEP_DELAY)
+    while True:
+        rows = fetch_unscored(connect, after_id, before)
+        if not rows:
+            return total
+        total += score_and_save(connect, rows)
+        after_id = rows[-1][0]
+
+
+def _sweeper_loop():
+    while True:
+        time.sleep(SWEEP_INTERVAL)
+        try:
+            count = sweep(_connect)
+            if count:
+                logger.info('补扫未打分评论', count=count)
+        except Exception as e:
+            logger.warning('评论打分巡检失败', error=str(e))
+
+
+def init_scoring(connect, workers=SCORING_WORKERS):
+    """设置数据库连接函数，启动工作线程和巡检线程"""
+    global _connect
+    _connect = connect
+    with _workers_lock:
+        if _workers:
+            return
+        for i in range(workers):
+            thread = threading.Thread(target=_worker_loop, name=f'comment-scoring-{i}', daemon=True)
+            thread.start()
+            _workers.append(thread)
+        sweeper = threading.Thread(target=_sweeper_loop, name='comment-scoring-sweep', daemon=True)
+        sweeper.start()
+        _workers.append(sweeper)
+
+
+def main(argv):
+    if len(argv) < 2 or argv[1] != 'backfill':
+        print(__doc__)
+        return 1
+
+    from migrations import get_db_connection
+
+    started = time.perf_counter()
+    total, after_id = 0, 0
+    while True:
+        rows = fetch_unscored(get_db_connection, after_id, limit=1000)
+        if not rows:
+            break
+        total += score_and_save(get_db_connection, rows)
+        after_id = rows[-1][0]
+    print(f"✅ 打分 {total} 条评论，其中垃圾评论 {stats['spam']} 条，"
+          f"{(time.perf_counter() - started) * 1000:.1f} ms"
+          f"（{'NumPy' if np is not None else '纯Python'}）")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
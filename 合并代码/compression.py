@@ -0,0 +1,208 @@
+# compression.py
+"""
+响应压缩中间件
+- 按 Accept-Encoding 协商 br / gzip / deflate（brotli为可选依赖）
+- 小于阈值的响应不压缩
+- 流式响应边生成边压缩
+- PrecompressedBody 供缓存使用：压缩结果随缓存保存，热点响应只压缩一次
+"""
+import gzip
+import threading
+import zlib
+
+from flask import Response, current_app, has_app_context, request
+
+try:
+    import brotli
+except ImportError:  # 未安装brotli时只提供gzip/deflate
+    brotli = None
+
+# 小于该字节数的响应不压缩
+COMPRESS_MIN_SIZE = 1024
+
+# 各算法默认压缩级别；init_compression(levels=...) 的覆盖值保存在各应用的 app.config
+COMPRESS_LEVELS = {
+    'br': 5,
+    'gzip': 6,
+    'deflate': 6
+}
+
+# 同等q值时的优先顺序
+ENCODING_PREFERENCE = ['br', 'gzip', 'deflate']
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'text/html',
+    'text/plain',
+    'text/css',
+    'text/javascript',
+    'application/javascript'
+}
+
+
+def supported_encodings():
+    return [enc for enc in ENCODING_PREFERENCE if enc != 'br' or brotli is not None]
+
+
+def negotiate_encoding(accept_encoding):
+    """根据Accept-Encoding选出最合适的编码，不可压缩时返回None"""
+    if not accept_encoding:
+        return None
+
+    weights = {}
+    for item in accept_encoding.split(','):
+        parts = item.strip().split(';')
+        name = parts[0].strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in parts[1:]:
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+
+    best, best_q = None, 0.0
+    for enc in supported_encodings():
+        q = weights.get(enc, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = enc, q
+    return best
+
+
+def _app_level(encoding):
+    """当前应用配置的压缩级别，不在应用上下文中时用默认值"""
+    if has_app_context():
+        return current_app.config.get('COMPRESS_LEVELS', COMPRESS_LEVELS)[encoding]
+    return COMPRESS_LEVELS[encoding]
+
+
+def compress_bytes(data, encoding, level=None):
+    """一次性压缩整个字节串"""
+    if level is None:
+        level = _app_level(encoding)
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    if encoding == 'deflate':
+        return zlib.compress(data, level)
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    raise ValueError(f'不支持的压缩编码: {encoding}')
+
+
+def _stream_compressor(encoding, level=None):
+    """返回 (compress, flush) 两个函数，用于流式响应"""
+    if level is None:
+        level = _app_level(encoding)
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=level)
+        return compressor.process, compressor.finish
+    # gzip的wbits为31，deflate（zlib格式）为15
+    wbits = 31 if encoding == 'gzip' else 15
+    compressor = zlib.compressobj(level, zlib.DEFLATED, wbits)
+    return compressor.compress, compressor.flush
+
+
+def _compress_stream(chunks, encoding, level=None):
+    compress, flush = _stream_compressor(encoding, level)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        data = compress(chunk)
+        if data:
+            yield data
+    yield flush()
+
+
+def _add_vary(response):
+    vary = response.headers.get('Vary')
+    if not vary:
+        response.headers['Vary'] = 'Accept-Encoding'
+    elif 'accept-encoding' not in vary.lower():
+        response.headers['Vary'] = vary + ', Accept-Encoding'
+
+
+class PrecompressedBody:
+    """
+    缓存用的响应体：保存原始字节，并在首次需要时生成各编码的压缩版本
+    同一缓存项后续命中直接复用压缩结果
+    """
+
+    def __init__(self, body, mimetype='application/json', min_size=None):
+        self.body = body
+        self.mimetype = mimetype
+        self.min_size = COMPRESS_MIN_SIZE if min_size is None else min_size
+        self.variants = {}
+        self._lock = threading.Lock()
+
+    def get(self, encoding):
+        """返回指定编码的响应体，encoding为None时返回原始字节"""
+        if encoding is None or len(self.body) < self.min_size:
+            return self.body
+        variant = self.variants.get(encoding)
+        if variant is None:
+            with self._lock:
+                variant = self.variants.get(encoding)
+                if variant is None:
+                    variant = compress_bytes(self.body, encoding)
+                    self.variants[encoding] = variant
+        return variant
+
+    def to_response(self):
+        """按当前请求的Accept-Encoding构造响应"""
+        encoding = negotiate_encoding(request.headers.get('Accept-Encoding', ''))
+        if len(self.body) < self.min_size:
+            encoding = None
+
+        response = Response(self.get(encoding), mimetype=self.mimetype)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        _add_vary(response)
+        return response
+
+
+def init_compression(app, min_size=None, levels=None):
+    """
+    为Flask应用注册压缩中间件，应用下所有蓝图的响应都会经过这里
+    min_size: 最小压缩字节数；levels: 如 {'gzip': 9} 覆盖默认压缩级别
+    """
+    threshold = COMPRESS_MIN_SIZE if min_size is None else min_size
+    # 只影响本应用，不修改模块级默认值
+    app_levels = dict(COMPRESS_LEVELS, **(levels or {}))
+    app.config['COMPRESS_LEVELS'] = app_levels
+
+    @app.after_request
+    def compress_response(response):
+        if response.status_code < 200 or response.status_code >= 300 or response.status_code == 204:
+            return response
+        if 'Content-Encoding' in response.headers:
+            # 已由PrecompressedBody处理
+            return response
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+            return response
+        if response.direct_passthrough:
+            # send_file等文件响应不处理
+            return response
+
+        encoding = negotiate_encoding(request.headers.get('Accept-Encoding', ''))
+        _add_vary(response)
+        if not encoding:
+            return response
+
+        if response.is_streamed:
+            # 流式响应在请求上下文结束后才生成，级别在此时确定
+            response.response = _compress_stream(response.response, encoding, app_levels[encoding])
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < threshold:
+                return response
+            response.set_data(compress_bytes(data, encoding, app_levels[encoding]))
+
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    return app
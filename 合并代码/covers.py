@@ -0,0 +1,279 @@
+# covers.py
+"""
+作品封面上传与缩略图
+- 上传按块写入临时文件，同时计算 sha256，不在内存中缓存整个文件
+- 按内容寻址存储：COVERS_DIR/<hash前2位>/<hash>/original.<扩展名>，相同图片只存一份
+- 缩略图（small/medium × webp/jpeg）在进程池中生成，不占用请求线程和GIL
+- /covers/<hash>/<文件名> 的内容永不改变，返回一年的 immutable 缓存；
+  文件由 send_file 发送（WSGI服务器支持时走 sendfile，设置 USE_X_SENDFILE 后交给前端代理）
+- 未安装 Pillow 时只保存原图，缩略图地址回退为原图
+"""
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import jsonify, send_file
+
+from async_log import get_logger
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+COVERS_DIR = os.environ.get('COVERS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'covers'))
+URL_PREFIX = '/covers'
+
+# 与前端 works-management.js 的限制一致
+MAX_COVER_BYTES = 5 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+# 缩略图规格：名称 -> (最大宽, 最大高)，封面比例按 3:4
+THUMB_SIZES = {
+    'small': (150, 200),
+    'medium': (300, 400)
+}
+# 格式 -> (PIL格式名, 保存参数)
+THUMB_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True})
+}
+
+# 文件头 -> 扩展名
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif')
+)
+MIMETYPES = {
+    'jpg': 'image/jpeg',
+    'png': 'image/png',
+    'gif': 'image/gif',
+    'webp': 'image/webp'
+}
+
+# 内容不变的文件缓存一年
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+_DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+_NAME_RE = re.compile(r'^(original|small|medium)\.(jpg|png|gif|webp)$')
+_COVER_URL_RE = re.compile(r'^' + URL_PREFIX + r'/([0-9a-f]{64})/original\.\w+$')
+
+_thumb_pool = None
+_thumb_pool_lock = threading.Lock()
+
+# 正在生成缩略图的hash，避免重复提交
+_pending = set()
+_pending_lock = threading.Lock()
+
+logger = get_logger('covers')
+
+
+def _get_thumb_pool():
+    global _thumb_pool
+    with _thumb_pool_lock:
+        if _thumb_pool is None:
+            _thumb_pool = ProcessPoolExecutor(max_workers=2)
+        return _thumb_pool
+
+
+def thumbnails_enabled():
+    return Image is not None
+
+
+def detect_type(head):
+    """根据文件头判断图片类型，不是支持的图片时返回None"""
+    for signature, ext in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return ext
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+def _cover_dir(digest):
+    return os.path.join(COVERS_DIR, digest[:2], digest)
+
+
+def _find_original(digest):
+    directory = _cover_dir(digest)
+    for ext in MIMETYPES:
+        path = os.path.join(directory, 'original.' + ext)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def cover_url(digest, name):
+    return f'{URL_PREFIX}/{digest}/{name}'
+
+
+def thumbnail_urls(digest):
+    """各规格缩略图地址，未安装 Pillow 时为空"""
+    if not thumbnails_enabled():
+        return {}
+    return {size: {fmt: cover_url(digest, f'{size}.{fmt}') for fmt in THUMB_FORMATS}
+            for size in THUMB_SIZES}
+
+
+def thumbnail_url(url, size='small', fmt='webp'):
+    """由 Cover_url 推出缩略图地址；外部图片或未安装 Pillow 时原样返回"""
+    match = _COVER_URL_RE.match(url or '')
+    if not match or not thumbnails_enabled():
+        return url
+    return cover_url(match.group(1), f'{size}.{fmt}')
+
+
+# ==================== 上传 ====================
+def save_upload(stream, max_bytes=MAX_COVER_BYTES):
+    """
+    把上传流分块写入临时文件并计算hash，再原子地移动到内容寻址路径
+    返回 (hash, 扩展名, 是否新文件)；超过大小或不是图片时抛出 ValueError
+    """
+    os.makedirs(COVERS_DIR, exist_ok=True)
+    # 临时文件与目标在同一文件系统，os.replace 才是原子的
+    fd, tmp_path = tempfile.mkstemp(prefix='upload_', dir=COVERS_DIR)
+    try:
+        digest = hashlib.sha256()
+        size = 0
+        ext = None
+        with os.fdopen(fd, 'wb') as f:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if ext is None:
+                    ext = detect_type(chunk[:16])
+                    if ext is None:
+                        raise ValueError('不支持的图片格式，仅支持 jpg/png/gif/webp')
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ValueError(f'图片大小不能超过{max_bytes // 1024 // 1024}MB')
+                digest.update(chunk)
+                f.write(chunk)
+
+        if ext is None:
+            raise ValueError('上传文件为空')
+
+        digest = digest.hexdigest()
+        existing = _find_original(digest)
+        if existing:
+            os.remove(tmp_path)
+            return digest, existing.rsplit('.', 1)[1], False
+
+        # mkstemp 创建的文件权限为0600，前端代理以其它用户运行时无法读取
+        os.chmod(tmp_path, 0o644)
+        os.makedirs(_cover_dir(digest), exist_ok=True)
+        os.replace(tmp_path, os.path.join(_cover_dir(digest), 'original.' + ext))
+        return digest, ext, True
+
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+# ==================== 缩略图 ====================
+def _make_thumbnails(source, directory):
+    """在子进程中执行：按各规格和格式生成缩略图，返回生成的文件名"""
+    written = []
+    with Image.open(source) as img:
+        # JPEG 可以在解码时直接按比例缩小，大图省去大部分解码工作
+        img.draft('RGB', max(THUMB_SIZES.values()))
+        img = ImageOps.exif_transpose(img)
+        if img.mode in ('RGBA', 'LA', 'P'):
+            img = img.convert('RGBA')
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            background.paste(img, mask=img.getchannel('A'))
+            img = background
+        else:
+            img = img.convert('RGB')
+
+        for size, box in sorted(THUMB_SIZES.items(), key=lambda item: -item[1][0]):
+            img.thumbnail(box, Image.LANCZOS)
+            for fmt, (pil_format, options) in THUMB_FORMATS.items():
+                name = f'{size}.{fmt}'
+                fd, tmp_path = tempfile.mkstemp(prefix='thumb_', dir=directory)
+                with os.fdopen(fd, 'wb') as f:
+                    img.save(f, pil_format, **options)
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, os.path.join(directory, name))
+                written.append(name)
+    return written
+
+
+def _thumbnails_done(digest, future):
+    with _pending_lock:
+        _pending.discard(digest)
+    error = future.exception()
+    if error is not None:
+        logger.error('缩略图生成失败', digest=digest, error=repr(error))
+    else:
+        logger.info('缩略图已生成', digest=digest, files=len(future.result()))
+
+
+def submit_thumbnails(digest):
+    """缩略图缺失时提交到进程池，已在生成中则跳过；返回是否提交"""
+    if not thumbnails_enabled():
+        return False
+    source = _find_original(digest)
+    if source is None:
+        return False
+
+    directory = _cover_dir(digest)
+    if all(os.path.exists(os.path.join(directory, f'{size}.{fmt}'))
+           for size in THUMB_SIZES for fmt in THUMB_FORMATS):
+        return False
+
+    with _pending_lock:
+        if digest in _pending:
+            return False
+        _pending.add(digest)
+
+    future = _get_thumb_pool().submit(_make_thumbnails, source, directory)
+    future.add_done_callback(lambda f: _thumbnails_done(digest, f))
+    return True
+
+
+# ==================== 访问 ====================
+def _not_found():
+    return jsonify({
+        'status': 'error',
+        'message': '封面不存在'
+    }), 404
+
+
+def serve_cover(digest, name):
+    """发送封面文件；缩略图尚未生成时临时返回原图且不缓存"""
+    match = _NAME_RE.match(name)
+    if not _DIGEST_RE.match(digest) or not match:
+        return _not_found()
+
+    path = os.path.join(_cover_dir(digest), name)
+    if os.path.exists(path):
+        response = send_file(path, mimetype=MIMETYPES[match.group(2)],
+                             conditional=True, etag=digest + '-' + name,
+                             max_age=IMMUTABLE_MAX_AGE)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+    original = _find_original(digest)
+    if match.group(1) == 'original' or original is None:
+        return _not_found()
+
+    submit_thumbnails(digest)
+    response = send_file(original, mimetype=MIMETYPES[original.rsplit('.', 1)[1]],
+                         conditional=True, max_age=0)
+    response.cache_control.no_cache = True
+    return response
+
+
+def init_covers(app):
+    """注册封面访问路由"""
+    app.add_url_rule(URL_PREFIX + '/<digest>/<name>', 'serve_cover', serve_cover, methods=['GET'])
+    return app
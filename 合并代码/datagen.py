@@ -0,0 +1,528 @@
+# datagen.py
+"""
+大规模测试数据生成器
+- 小说热度、读者活跃度服从幂律（Zipf/Pareto）分布，热门书的阅读、收藏、评论集中
+- 章节数、章节字数服从对数正态分布，正文为按常用字频生成的中文段落
+- 评论带楼中楼回复（回复挂在同一本书较早的顶级评论下）
+- 每本小说有分类和1~4个标签，分类、标签的热度同样是长尾分布
+- 阅读记录、收藏按读者取模分到各分片，分片内不放回抽样，(读者, 章节/小说) 不会重复
+- 按ID区间切分为分片，多进程并行生成；每个分片写成MySQL默认格式的制表符分隔文件，
+  用 LOAD DATA LOCAL INFILE 导入（不可用时退回多行INSERT）
+- 导入后重跑迁移中的回填（小说字数、继续阅读索引、评论归属作者与计数）和每日指标对账，
+  迁移在空表上执行时这些回填没有数据可处理
+- 相同种子生成完全相同的数据
+
+用法:
+    python datagen.py --profile small --workers 8
+    python datagen.py --profile full --workers 16 --out /data/flutterpage_csv --no-load
+"""
+import argparse
+import bisect
+import itertools
+import math
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import pymysql
+
+import platform_metrics
+from migrations import backfill_comment_moderation, migrate, rebuild_reading_positions
+
+# 数据库配置
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': '123456',
+    'database': 'flutterpage',
+    'charset': 'utf8mb4'
+}
+
+# 数据规模档位
+PROFILES = {
+    'full': {'users': 1000000, 'novels': 100000, 'chapters': 10000000,
+             'reading_records': 50000000, 'favorites': 5000000, 'comments': 20000000},
+    'small': {'users': 10000, 'novels': 1000, 'chapters': 100000,
+              'reading_records': 500000, 'favorites': 50000, 'comments': 200000},
+    'tiny': {'users': 200, 'novels': 50, 'chapters': 2000,
+             'reading_records': 5000, 'favorites': 500, 'comments': 2000}
+}
+
+# 每个分片的行数
+SHARD_ROWS = 200000
+
+# 多行INSERT每条语句的行数
+INSERT_BATCH = 2000
+
+# 热度分布参数
+NOVEL_ZIPF_S = 1.1      # 小说热度 Zipf 指数
+USER_PARETO_ALPHA = 1.3  # 读者活跃度 Pareto 指数
+REPLY_RATIO = 0.35       # 评论中回复的比例
+
+# 分片内去重抽样的最大尝试倍数（热门组合反复命中时放弃，分片少生成几行）
+MAX_PICK_ATTEMPTS = 20
+
+# 数据时间范围
+BASE_TIME = datetime(2023, 1, 1)
+TIME_SPAN_SECONDS = 86400 * 600
+
+# 按字频排列的常用汉字，越靠前出现越多
+COMMON_HANZI = (
+    '的一是了不在人有我他这个们中来上大为和国地到以说时要就出会可也你对生能而子那得于着下自之年过发后作里'
+    '用道行所然家种事成方多经么去法学如都同现当没动面起看定天分还进好小部其些主样理心她本前开但因只从想实'
+    '日军者意无力它与长把机十民第公此已工使情明性知全三又关点正业外将两高间由问很最重并物手应战向头文体政'
+    '美相见被利什二等产或新己制身果加西斯月话合回特代内信表化老给世位次度门任常先海通教儿原东声提立及比员'
+    '解水名真论处走义各入几口认条平系气题活尔更别打女变四神总何电数安少报才结反受目太量再感建务做接必场件'
+    '计管期市直德资命山金指克许统区保至队形社便空决治展马科司五基眼书非则听白却界达光放强即像难且权思王象'
+    '完设式色路记南品住告类求据程北边死张该交规万取拉格望觉术领共确传师观清今切院让识候带导争运笑飞风步改'
+    '收根干造言联持组每济车亲极林服快办议往元英士证近失转夫令准布始怎呢存未远叫台单影具罗字爱击流备兵连调'
+)
+PUNCTUATION = '，，，，。。。！？；：'
+
+# 分类和标签，越靠前越常见
+CATEGORIES = ('玄幻', '都市', '仙侠', '历史', '科幻', '悬疑', '游戏', '言情', '武侠', '军事')
+TAGS = ('爽文', '系统', '穿越', '重生', '升级', '热血', '轻松', '腹黑', '无敌', '种田',
+        '末世', '废柴', '群像', '推理', '搞笑', '历史向', '赛博朋克', '克苏鲁', '慢热', '完本')
+MAX_TAGS = 4
+
+# 章节字数（对数正态）
+CHAPTER_WORDS_MU = math.log(3000)
+CHAPTER_WORDS_SIGMA = 0.35
+
+
+# ==================== 分布工具 ====================
+def zipf_cum_weights(n, s):
+    """Zipf累计权重：第k名的权重为 1/k^s"""
+    return list(itertools.accumulate(1.0 / (k ** s) for k in range(1, n + 1)))
+
+
+def pareto_cum_weights(n, alpha, rng):
+    """每个个体的活跃度取自Pareto分布"""
+    return list(itertools.accumulate(rng.paretovariate(alpha) for _ in range(n)))
+
+
+def weighted_pick(rng, cum_weights, ids=None):
+    """按累计权重二分抽样，返回1起始的ID（或 ids 中对应元素）"""
+    index = bisect.bisect(cum_weights, rng.random() * cum_weights[-1])
+    index = min(index, len(cum_weights) - 1)
+    return ids[index] if ids is not None else index + 1
+
+
+def shard_user_weights(user_weights, shard, shards):
+    """第 shard 个分片负责 User_id % shards == shard 的读者，返回 (这些读者的累计权重, 读者ID)"""
+    ids = list(range(shard + 1, len(user_weights) + 1, shards))
+    cum_weights = list(itertools.accumulate(
+        user_weights[i - 1] - (user_weights[i - 2] if i > 1 else 0.0) for i in ids))
+    return cum_weights, ids
+
+
+def unique_pairs(rng, count, pick):
+    """调用 pick() 生成 count 个不重复的 (读者, 对象, ...)，按前两项去重"""
+    seen = set()
+    rows = []
+    attempts = 0
+    while len(rows) < count and attempts < count * MAX_PICK_ATTEMPTS:
+        attempts += 1
+        row = pick()
+        if row[:2] not in seen:
+            seen.add(row[:2])
+            rows.append(row)
+    return rows
+
+
+def random_time(rng, start=BASE_TIME, span=TIME_SPAN_SECONDS):
+    return start + timedelta(seconds=rng.randrange(span))
+
+
+class TextGenerator:
+    """预先生成句子池，之后按句子拼段落，避免逐字随机"""
+
+    def __init__(self, rng, pool_size=3000):
+        weights = list(itertools.accumulate(1.0 / (k ** 0.9) for k in range(1, len(COMMON_HANZI) + 1)))
+        self.sentences = []
+        for _ in range(pool_size):
+            length = rng.randint(6, 28)
+            chars = rng.choices(COMMON_HANZI, cum_weights=weights, k=length)
+            # 句中偶尔插入逗号
+            if length > 12:
+                chars.insert(rng.randint(5, length - 5), '，')
+            self.sentences.append(''.join(chars) + rng.choice(PUNCTUATION[4:]))
+        self.rng = rng
+
+    def text(self, chars):
+        """生成约 chars 个字的正文，每段3~8句"""
+        paragraphs = []
+        total = 0
+        while total < chars:
+            paragraph = ''.join(self.rng.choices(self.sentences, k=self.rng.randint(3, 8)))
+            paragraphs.append('　　' + paragraph)
+            total += len(paragraph)
+        return '\n'.join(paragraphs)
+
+    def sentence(self, count=1):
+        return ''.join(self.rng.choices(self.sentences, k=count))
+
+
+# ==================== 全局布局（主进程计算，传给各分片） ====================
+def build_layout(profile, seed):
+    """确定每本书的章节数及章节ID区间，保证各分片的数据互相一致"""
+    rng = random.Random(seed)
+    novels = profile['novels']
+
+    # 章节数：对数正态，再按总章节数缩放
+    raw = [rng.lognormvariate(0, 1.0) for _ in range(novels)]
+    scale = profile['chapters'] / sum(raw)
+    counts = [max(1, int(x * scale)) for x in raw]
+    # 修正取整误差，使总数精确等于目标值
+    diff = profile['chapters'] - sum(counts)
+    i = 0
+    while diff != 0:
+        index = i % novels
+        if diff > 0:
+            counts[index] += 1
+            diff -= 1
+        elif counts[index] > 1:
+            counts[index] -= 1
+            diff += 1
+        i += 1
+
+    # chapter_starts[k] 为第k+1本书第一章的Chapter_id
+    chapter_starts = [1]
+    for count in counts[:-1]:
+        chapter_starts.append(chapter_starts[-1] + count)
+
+    # 热度排名随机打乱到小说ID上，避免热门书都是小ID
+    popularity_order = list(range(1, novels + 1))
+    rng.shuffle(popularity_order)
+
+    return {
+        'chapter_counts': counts,
+        'chapter_starts': chapter_starts,
+        'popularity_order': popularity_order
+    }
+
+
+# ==================== 各表分片生成 ====================
+def gen_users(rng, start, count, profile, layout, options):
+    rows = []
+    for user_id in range(start, start + count):
+        rows.append((user_id, f'reader{user_id}', 'x:x', f'reader{user_id}@example.com',
+                     '', random_time(rng)))
+    return rows
+
+
+def gen_novels(rng, start, count, profile, layout, options):
+    text = TextGenerator(rng, pool_size=500)
+    statuses = ['published'] * 8 + ['review', 'draft']
+    # 作者集中在前5%的用户中
+    authors = max(1, profile['users'] // 20)
+    category_weights = zipf_cum_weights(len(CATEGORIES), 0.8)
+    rows = []
+    for novel_id in range(start, start + count):
+        created = random_time(rng)
+        rows.append((novel_id, rng.randint(1, authors), text.sentence(1)[:rng.randint(2, 12)],
+                     text.sentence(rng.randint(3, 8)), f'/static/covers/{novel_id}.jpg',
+                     rng.choice(statuses), weighted_pick(rng, category_weights, CATEGORIES), 0, created,
+                     created + timedelta(seconds=rng.randrange(86400 * 90))))
+    return rows
+
+
+def gen_novel_tags(rng, start, count, profile, layout, options):
+    """按小说ID分片，每本小说1~MAX_TAGS个不重复的标签"""
+    tag_weights = zipf_cum_weights(len(TAGS), 0.8)
+    rows = []
+    for novel_id in range(start, start + count):
+        tags = {weighted_pick(rng, tag_weights, TAGS) for _ in range(rng.randint(1, MAX_TAGS))}
+        rows.extend((novel_id, tag) for tag in sorted(tags))
+    return rows
+
+
+def gen_chapters(rng, start, count, profile, layout, options):
+    text = TextGenerator(rng)
+    starts = layout['chapter_starts']
+    content_chapters = options['content_chapters']
+    rows = []
+    for chapter_id in range(start, start + count):
+        novel_index = bisect.bisect_right(starts, chapter_id) - 1
+        num = chapter_id - starts[novel_index] + 1
+        words = int(min(12000, max(800, rng.lognormvariate(CHAPTER_WORDS_MU, CHAPTER_WORDS_SIGMA))))
+        content = text.text(words) if content_chapters < 0 or num <= content_chapters else ''
+        created = BASE_TIME + timedelta(days=novel_index % 365, hours=num)
+        rows.append((chapter_id, novel_index + 1, num, f'第{num}章 {text.sentence(1)[:8]}',
+                     content, words, created, created))
+    return rows
+
+
+def _pick_chapter(rng, layout, novel_id):
+    """读者越往后流失越多，章节号偏向前面"""
+    total = layout['chapter_counts'][novel_id - 1]
+    num = int(total * rng.random() ** 2) + 1
+    return layout['chapter_starts'][novel_id - 1] + min(num, total) - 1
+
+
+def gen_reading_records(rng, start, count, profile, layout, options):
+    novel_weights = options['novel_weights']
+    user_weights, user_ids = options['shard_user_weights']
+    order = layout['popularity_order']
+
+    def pick():
+        novel_id = weighted_pick(rng, novel_weights, order)
+        return (weighted_pick(rng, user_weights, user_ids), _pick_chapter(rng, layout, novel_id), novel_id)
+
+    return [(user_id, chapter_id, novel_id, rng.choice((100, 100, 100, rng.randint(0, 99))),
+             rng.randint(30, 3600), random_time(rng))
+            for user_id, chapter_id, novel_id in unique_pairs(rng, count, pick)]
+
+
+def gen_favorites(rng, start, count, profile, layout, options):
+    novel_weights = options['novel_weights']
+    user_weights, user_ids = options['shard_user_weights']
+    order = layout['popularity_order']
+
+    def pick():
+        return weighted_pick(rng, user_weights, user_ids), weighted_pick(rng, novel_weights, order)
+
+    return [(user_id, novel_id, random_time(rng)) for user_id, novel_id in unique_pairs(rng, count, pick)]
+
+
+def gen_comments(rng, start, count, profile, layout, options):
+    text = TextGenerator(rng, pool_size=1000)
+    novel_weights = options['novel_weights']
+    user_weights = options['user_weights']
+    order = layout['popularity_order']
+    # 本分片内每本书的顶级评论，用于挂回复
+    top_level = {}
+    rows = []
+    for comment_id in range(start, start + count):
+        novel_id = weighted_pick(rng, novel_weights, order)
+        parents = top_level.get(novel_id)
+        parent_id = None
+        if parents and rng.random() < REPLY_RATIO:
+            # 较新的评论更容易被回复
+            parent_id = parents[-1 - int(len(parents) * rng.random() ** 2)]
+        created = BASE_TIME + timedelta(seconds=comment_id % TIME_SPAN_SECONDS)
+        rows.append((comment_id, novel_id, weighted_pick(rng, user_weights),
+                     text.sentence(rng.randint(1, 4)), parent_id, created, created))
+        if parent_id is None:
+            top_level.setdefault(novel_id, []).append(comment_id)
+    return rows
+
+
+# 表名 -> (生成函数, 列)
+TABLES = {
+    'users': (gen_users, ['User_id', 'Username', 'Password', 'Email', 'Phone', 'Created_at']),
+    'novels': (gen_novels, ['Novel_id', 'Author_id', 'Title', 'Description', 'Cover_url',
+                            'Status', 'Category', 'Word_count', 'Created_at', 'Updated_at']),
+    'novel_tags': (gen_novel_tags, ['Novel_id', 'Tag']),
+    'chapters': (gen_chapters, ['Chapter_id', 'Novel_id', 'Chapter_num', 'Title', 'Content',
+                                'Word_count', 'Created_at', 'Updated_at']),
+    'reading_records': (gen_reading_records, ['User_id', 'Chapter_id', 'Novel_id',
+                                              'Progress', 'Duration', 'Last_read']),
+    'favorites': (gen_favorites, ['User_id', 'Novel_id', 'Created_at']),
+    'comments': (gen_comments, ['Comment_id', 'Novel_id', 'User_id', 'Content',
+                                'Parent_id', 'Created_at', 'Updated_at'])
+}
+# 行数不由档位直接给出的表：按哪张表的ID区间分片
+SHARD_BY = {'novel_tags': 'novels'}
+
+
+# ==================== 文件与导入 ====================
+def _escape(value):
+    """MySQL LOAD DATA 默认格式：制表符分隔，反斜杠转义，NULL写作\\N"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, str):
+        return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+    return str(value)
+
+
+def write_rows(rows, path):
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        f.writelines('\t'.join(map(_escape, row)) + '\n' for row in rows)
+
+
+def _prepare_session(cursor):
+    # 批量导入时跳过唯一性和外键检查
+    cursor.execute("SET SESSION unique_checks = 0")
+    cursor.execute("SET SESSION foreign_key_checks = 0")
+
+
+def load_file(conn, table, columns, path):
+    with conn.cursor() as cursor:
+        _prepare_session(cursor)
+        cursor.execute(f"""
+            LOAD DATA LOCAL INFILE %s INTO TABLE {table}
+            CHARACTER SET utf8mb4 ({', '.join(columns)})
+        """, (path,))
+    conn.commit()
+
+
+def insert_rows(conn, table, columns, rows):
+    """多行INSERT，executemany会把同一条 INSERT ... VALUES 合并成多行语句"""
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    with conn.cursor() as cursor:
+        _prepare_session(cursor)
+        for start in range(0, len(rows), INSERT_BATCH):
+            cursor.executemany(sql, rows[start:start + INSERT_BATCH])
+    conn.commit()
+
+
+# 热度权重在主进程计算一次，由 Pool 的 initializer 传给每个子进程
+_weights = {}
+
+
+def _init_worker(novel_weights, user_weights):
+    _weights['novel'] = novel_weights
+    _weights['user'] = user_weights
+
+
+def run_shard(task):
+    """子进程入口：生成一个分片，写文件并/或导入数据库"""
+    table, shard, shards, start, count, profile, layout, options = task
+    func, columns = TABLES[table]
+
+    # 种子只由 基础种子/表名/分片号 决定，与进程调度无关
+    rng = random.Random(f"{options['seed']}:{table}:{shard}")
+    if table in ('reading_records', 'favorites', 'comments'):
+        options = dict(options, novel_weights=_weights['novel'], user_weights=_weights['user'])
+    if table in ('reading_records', 'favorites'):
+        options['shard_user_weights'] = shard_user_weights(_weights['user'], shard, shards)
+
+    started = time.perf_counter()
+    rows = func(rng, start, count, profile, layout, options)
+
+    method = options['method']
+    if options['out_dir'] or method == 'infile':
+        directory = options['out_dir'] or tempfile.gettempdir()
+        path = os.path.join(directory, f'{table}.{shard:05d}.tsv')
+        write_rows(rows, path)
+    else:
+        path = None
+
+    if options['load']:
+        conn = pymysql.connect(**options['db_config'], local_infile=True)
+        try:
+            if method == 'infile':
+                try:
+                    load_file(conn, table, columns, path)
+                except pymysql.err.OperationalError:
+                    # 服务端未开启local_infile时退回INSERT
+                    insert_rows(conn, table, columns, rows)
+            else:
+                insert_rows(conn, table, columns, rows)
+        finally:
+            conn.close()
+        if not options['out_dir'] and path:
+            os.remove(path)
+
+    return table, len(rows), time.perf_counter() - started
+
+
+def build_tasks(profile, layout, options):
+    tasks = []
+    for table in TABLES:
+        total = profile[SHARD_BY.get(table, table)]
+        shards = (total + SHARD_ROWS - 1) // SHARD_ROWS
+        for shard, start in enumerate(range(0, total, SHARD_ROWS)):
+            tasks.append((table, shard, shards, start + 1, min(SHARD_ROWS, total - start),
+                          profile, layout, options))
+    return tasks
+
+
+def finalize(db_config):
+    """
+    导入后回填派生数据：小说总字数、继续阅读索引、评论归属作者/回复数/作者计数，
+    再按源表对账全部历史的每日指标
+    """
+    conn = pymysql.connect(**db_config)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                UPDATE novels n JOIN (
+                    SELECT Novel_id, SUM(Word_count) AS words FROM chapters GROUP BY Novel_id
+                ) c ON n.Novel_id = c.Novel_id
+                SET n.Word_count = c.words
+            """)
+            rebuild_reading_positions(cursor)
+            backfill_comment_moderation(cursor)
+        conn.commit()
+        platform_metrics.reconcile(conn, platform_metrics.first_day(conn), date.today())
+    finally:
+        conn.close()
+
+
+def generate(profile, db_config=None, seed=42, workers=None, method='infile',
+             out_dir=None, load=True, content_chapters=5):
+    """
+    生成并导入一整套数据，返回 {表名: 行数}
+    content_chapters: 每本书前几章生成正文，-1 表示全部章节都有正文
+    """
+    db_config = db_config or DB_CONFIG
+    if load:
+        conn = pymysql.connect(**db_config)
+        try:
+            migrate(conn)
+        finally:
+            conn.close()
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+
+    layout = build_layout(profile, seed)
+    options = {
+        'seed': seed,
+        'method': method,
+        'out_dir': out_dir,
+        'load': load,
+        'db_config': db_config,
+        'content_chapters': content_chapters
+    }
+    tasks = build_tasks(profile, layout, options)
+
+    totals = {table: 0 for table in TABLES}
+    started = time.perf_counter()
+    novel_weights = zipf_cum_weights(profile['novels'], NOVEL_ZIPF_S)
+    user_weights = pareto_cum_weights(profile['users'], USER_PARETO_ALPHA, random.Random(f'{seed}:users'))
+    with multiprocessing.Pool(workers or os.cpu_count(), initializer=_init_worker,
+                              initargs=(novel_weights, user_weights)) as pool:
+        for table, rows, seconds in pool.imap_unordered(run_shard, tasks):
+            totals[table] += rows
+            elapsed = time.perf_counter() - started
+            done = sum(totals.values())
+            print(f"  {table:<16} +{rows:>8} 行 ({seconds:.1f}s)   累计 {done} 行，"
+                  f"{done / elapsed * 60 / 1e6:.2f} 百万行/分钟")
+
+    if load:
+        finalize(db_config)
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description='FlutterPage 测试数据生成')
+    parser.add_argument('--profile', default='small', choices=sorted(PROFILES))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--method', default='infile', choices=['infile', 'insert'])
+    parser.add_argument('--out', default=None, help='保留生成的数据文件到该目录')
+    parser.add_argument('--no-load', action='store_true', help='只生成文件，不导入数据库')
+    parser.add_argument('--content-chapters', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.no_load and not args.out:
+        parser.error('--no-load 需要同时指定 --out')
+
+    print(f"🚀 生成数据: {args.profile} {PROFILES[args.profile]}")
+    started = time.perf_counter()
+    totals = generate(PROFILES[args.profile], seed=args.seed, workers=args.workers,
+                      method=args.method, out_dir=args.out, load=not args.no_load,
+                      content_chapters=args.content_chapters)
+    elapsed = time.perf_counter() - started
+    print(f"✅ 完成: {sum(totals.values())} 行，用时 {elapsed:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,340 @@
+# drafts.py
+"""
+章节草稿增量保存
+- 自动保存只提交相对上一版本的差异（ops），按版本号保存在 draft_revisions
+- 每 SNAPSHOT_INTERVAL 个版本、或差异比正文还大时，改存一次全文快照
+- 任意历史版本 = 不晚于它的最近快照 + 之后的差异依次应用
+- 最新版本全文缓存在内存中，连续自动保存不需要回放版本链
+- 发布时在一个事务里把草稿写入 chapters 并更新小说总字数
+
+差异格式（ops）：按顺序作用于旧文本的操作列表
+    正整数 n   保留 n 个字符
+    负整数 -n  删除 n 个字符
+    字符串 s   插入 s
+    例：'你好世界' -> '你好，新世界'：[2, '，新', 2]
+    客户端提交的长度按UTF-16码元计（与JavaScript字符串的 length 一致，emoji等BMP以外的字符占2），
+    由 ops_from_utf16 换算为码点后再应用；draft_revisions 中保存的差异按码点计
+"""
+import json
+import threading
+from datetime import datetime
+
+import pymysql
+
+from text_stats import count_words
+
+# 每隔多少个版本保存一次全文快照
+SNAPSHOT_INTERVAL = 20
+
+# 最新版本全文缓存：draft_id -> (版本号, 全文)
+DRAFT_CACHE_SIZE = 200
+draft_cache = {}
+_cache_lock = threading.Lock()
+
+
+class DraftConflict(Exception):
+    """提交的 base_version 不是草稿的最新版本"""
+
+    def __init__(self, current_version):
+        super().__init__(f'草稿已更新到版本 {current_version}')
+        self.current_version = current_version
+
+
+# ==================== 差异 ====================
+def apply_delta(text, ops):
+    """把ops应用到text上，ops必须恰好覆盖整个旧文本"""
+    if not isinstance(ops, list):
+        raise ValueError('ops必须是列表')
+
+    parts = []
+    pos = 0
+    for op in ops:
+        if isinstance(op, str):
+            parts.append(op)
+        elif isinstance(op, int) and not isinstance(op, bool) and op > 0:
+            if pos + op > len(text):
+                raise ValueError('保留长度超出原文')
+            parts.append(text[pos:pos + op])
+            pos += op
+        elif isinstance(op, int) and not isinstance(op, bool) and op < 0:
+            if pos - op > len(text):
+                raise ValueError('删除长度超出原文')
+            pos -= op
+        else:
+            raise ValueError(f'无效的操作: {op!r}')
+
+    if pos != len(text):
+        raise ValueError(f'ops只覆盖了原文的 {pos}/{len(text)} 个字符')
+    return ''.join(parts)
+
+
+def _code_points(text, pos, units):
+    """从 pos 开始恰好 units 个UTF-16码元对应的码点数"""
+    # units 个码点至少有 units 个码元，截取足够长的一段编码后按码元截断
+    chunk = text[pos:pos + units].encode('utf-16-le', 'surrogatepass')[:units * 2]
+    if len(chunk) < units * 2:
+        raise ValueError('保留或删除的长度超出原文')
+    try:
+        return len(chunk.decode('utf-16-le'))
+    except UnicodeDecodeError:
+        raise ValueError('长度落在一个字符的代理对中间')
+
+
+def ops_from_utf16(text, ops):
+    """把ops中按UTF-16码元计的保留/删除长度换算为码点数；text 中没有BMP以外的字符时两者相同"""
+    if not isinstance(ops, list) or not text or max(text) <= '\uffff':
+        return ops
+
+    converted = []
+    pos = 0
+    for op in ops:
+        if isinstance(op, int) and not isinstance(op, bool) and op != 0:
+            count = _code_points(text, pos, abs(op))
+            converted.append(count if op > 0 else -count)
+            pos += count
+        else:
+            # 插入的字符串和无效的操作原样交给 apply_delta
+            converted.append(op)
+    return converted
+
+
+def _common_length(old, new, limit, from_end=False):
+    """二分查找公共前缀（或后缀）长度，每次比较是C层的切片比较"""
+    low, high = 0, limit
+    while low < high:
+        mid = (low + high + 1) // 2
+        if from_end:
+            same = old[len(old) - mid:] == new[len(new) - mid:]
+        else:
+            same = old[:mid] == new[:mid]
+        if same:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def make_delta(old, new):
+    """按公共前缀和后缀生成ops（自动保存两次之间通常只改动一处）"""
+    limit = min(len(old), len(new))
+    prefix = _common_length(old, new, limit)
+    suffix = _common_length(old, new, limit - prefix, from_end=True)
+
+    ops = []
+    if prefix:
+        ops.append(prefix)
+    if len(old) - prefix - suffix:
+        ops.append(-(len(old) - prefix - suffix))
+    if len(new) - prefix - suffix:
+        ops.append(new[prefix:len(new) - suffix])
+    if suffix:
+        ops.append(suffix)
+    return ops
+
+
+def _cache_head(draft_id, version, content):
+    with _cache_lock:
+        while len(draft_cache) >= DRAFT_CACHE_SIZE and draft_id not in draft_cache:
+            draft_cache.pop(next(iter(draft_cache)))
+        draft_cache[draft_id] = (version, content)
+
+
+def _cached_head(draft_id, version):
+    entry = draft_cache.get(draft_id)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+    return None
+
+
+# ==================== 存储 ====================
+def _lock_draft(cursor, draft_id, author_id):
+    cursor.execute("""
+        SELECT * FROM chapter_drafts
+        WHERE Draft_id = %s AND Author_id = %s
+        FOR UPDATE
+    """, (draft_id, author_id))
+    draft = cursor.fetchone()
+    if not draft:
+        raise LookupError('草稿不存在或无权限')
+    return draft
+
+
+def _insert_revision(cursor, draft_id, version, is_snapshot, body):
+    cursor.execute("""
+        INSERT INTO draft_revisions (Draft_id, Version, Is_snapshot, Body, Created_at)
+        VALUES (%s, %s, %s, %s, %s)
+    """, (draft_id, version, 1 if is_snapshot else 0, body, datetime.now()))
+
+
+def rebuild(conn, draft_id, version):
+    """重建指定版本的全文"""
+    cached = _cached_head(draft_id, version)
+    if cached is not None:
+        return cached
+
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    try:
+        cursor.execute("""
+            SELECT Version, Body FROM draft_revisions
+            WHERE Draft_id = %s AND Version <= %s AND Is_snapshot = 1
+            ORDER BY Version DESC LIMIT 1
+        """, (draft_id, version))
+        snapshot = cursor.fetchone()
+        if not snapshot:
+            raise LookupError(f'版本 {version} 不存在')
+
+        cursor.execute("""
+            SELECT Version, Body FROM draft_revisions
+            WHERE Draft_id = %s AND Version > %s AND Version <= %s
+            ORDER BY Version ASC
+        """, (draft_id, snapshot['Version'], version))
+        deltas = cursor.fetchall()
+    finally:
+        cursor.close()
+
+    if snapshot['Version'] + len(deltas) != version:
+        raise LookupError(f'版本 {version} 不存在')
+
+    content = snapshot['Body']
+    for row in deltas:
+        content = apply_delta(content, json.loads(row['Body']))
+    return content
+
+
+def create_draft(conn, novel_id, author_id, title, content='', chapter_num=None, chapter_id=None):
+    """新建草稿，版本1为全文快照；chapter_id 不为空时表示修改已发布的章节"""
+    cursor = conn.cursor()
+    try:
+        now = datetime.now()
+        cursor.execute("""
+            INSERT INTO chapter_drafts (Novel_id, Author_id, Chapter_id, Chapter_num, Title,
+                                        Version, Word_count, Created_at, Updated_at)
+            VALUES (%s, %s, %s, %s, %s, 1, %s, %s, %s)
+        """, (novel_id, author_id, chapter_id, chapter_num, title, count_words(content), now, now))
+        draft_id = cursor.lastrowid
+        _insert_revision(cursor, draft_id, 1, True, content)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    _cache_head(draft_id, 1, content)
+    return draft_id
+
+
+def save_revision(conn, draft_id, author_id, base_version, ops=None, content=None, title=None):
+    """
+    在 base_version 之上保存一个新版本，提交ops（长度按UTF-16码元计）或全文二选一
+    返回 (新版本号, 字数)；base_version 不是最新版本时抛出 DraftConflict
+    """
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    try:
+        draft = _lock_draft(cursor, draft_id, author_id)
+        if draft['Version'] != base_version:
+            raise DraftConflict(draft['Version'])
+
+        old = rebuild(conn, draft_id, base_version)
+        if ops is None:
+            ops = make_delta(old, content)
+        else:
+            ops = ops_from_utf16(old, ops)
+            content = apply_delta(old, ops)
+
+        version = base_version + 1
+        body = json.dumps(ops, ensure_ascii=False, separators=(',', ':'))
+        # 定期快照限制回放长度；差异比全文还大时直接存全文
+        if version % SNAPSHOT_INTERVAL == 0 or len(body) >= len(content):
+            _insert_revision(cursor, draft_id, version, True, content)
+        else:
+            _insert_revision(cursor, draft_id, version, False, body)
+
+        word_count = count_words(content)
+        cursor.execute("""
+            UPDATE chapter_drafts
+            SET Version = %s, Word_count = %s, Title = COALESCE(%s, Title), Updated_at = %s
+            WHERE Draft_id = %s
+        """, (version, word_count, title, datetime.now(), draft_id))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    _cache_head(draft_id, version, content)
+    return version, word_count
+
+
+def publish(conn, draft_id, author_id, version=None):
+    """
+    把草稿的指定版本（默认最新）发布到 chapters，与小说总字数的更新在同一事务中
+    返回 (chapter_id, novel_id, 是否新建章节)
+    """
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    try:
+        draft = _lock_draft(cursor, draft_id, author_id)
+        version = version or draft['Version']
+        if version > draft['Version']:
+            raise LookupError(f'版本 {version} 不存在')
+
+        content = rebuild(conn, draft_id, version)
+        word_count = count_words(content)
+        now = datetime.now()
+
+        chapter_id = draft['Chapter_id']
+        if chapter_id:
+            cursor.execute("""
+                SELECT Word_count FROM chapters
+                WHERE Chapter_id = %s AND Novel_id = %s
+                FOR UPDATE
+            """, (chapter_id, draft['Novel_id']))
+            chapter = cursor.fetchone()
+            if not chapter:
+                raise LookupError('章节不存在')
+            cursor.execute("""
+                UPDATE chapters
+                SET Title = %s, Content = %s, Word_count = %s, Updated_at = %s
+                WHERE Chapter_id = %s
+            """, (draft['Title'], content, word_count, now, chapter_id))
+            word_diff = word_count - chapter['Word_count']
+            created = False
+        else:
+            if draft['Chapter_num'] is None:
+                cursor.execute("""
+                    SELECT COALESCE(MAX(Chapter_num), 0) + 1 AS next_num
+                    FROM chapters WHERE Novel_id = %s
+                """, (draft['Novel_id'],))
+                draft['Chapter_num'] = cursor.fetchone()['next_num']
+            cursor.execute("""
+                INSERT INTO chapters (Novel_id, Chapter_num, Title, Content,
+                                     Word_count, Created_at, Updated_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, (draft['Novel_id'], draft['Chapter_num'], draft['Title'], content,
+                  word_count, now, now))
+            chapter_id = cursor.lastrowid
+            word_diff = word_count
+            created = True
+
+        cursor.execute("""
+            UPDATE novels
+            SET Word_count = Word_count + %s, Updated_at = %s
+            WHERE Novel_id = %s
+        """, (word_diff, now, draft['Novel_id']))
+
+        # 之后再发布同一草稿时更新这一章，而不是重复插入
+        cursor.execute("""
+            UPDATE chapter_drafts
+            SET Chapter_id = %s, Chapter_num = %s, Published_version = %s, Updated_at = %s
+            WHERE Draft_id = %s
+        """, (chapter_id, draft['Chapter_num'], version, now, draft_id))
+
+        conn.commit()
+        return chapter_id, draft['Novel_id'], created
+
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
@@ -0,0 +1,381 @@
+# facet_index.py
+"""
+分面筛选索引
+- 每个标签、分类、状态、字数区间各有一个小说ID位图，组合筛选就是位图求交
+- 位图按ID高16位分块（类似Roaring Bitmap）：稀疏块存有序 array('H')，稠密块存 65536 位的整数位集
+- 筛选结果与全文检索结果求交后，各分面的计数直接由位图交集的基数得到，不再需要 GROUP BY
+- 其它进程的修改按 novels.Updated_at 增量拉取
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+import pymysql
+
+from async_log import get_logger
+
+# 块内元素超过该数量时由有序数组转为位集（4096个uint16 = 8KB，与位集大小相同）
+ARRAY_MAX = 4096
+_BITSET_BYTES = 65536 // 8
+
+# 增量拉取的间隔（秒）
+REFRESH_INTERVAL = 5
+
+# 字数区间（单位：字），键用于请求参数
+WORD_BUCKETS = [
+    (0, '0-10', '10万字以下'),
+    (100000, '10-30', '10-30万字'),
+    (300000, '30-100', '30-100万字'),
+    (1000000, '100-300', '100-300万字'),
+    (3000000, '300+', '300万字以上')
+]
+WORD_BUCKET_LABELS = {key: label for _, key, label in WORD_BUCKETS}
+
+# 分面名称 -> 每个分面返回的最大取值数
+FACETS = {
+    'category': 50,
+    'tag': 30,
+    'status': 3,
+    'word_count': len(WORD_BUCKETS)
+}
+
+logger = get_logger('search.facet')
+
+_FACET_ROWS_SQL = """
+    SELECT n.Novel_id, n.Status, n.Category, n.Word_count, n.Created_at, n.Updated_at,
+           GROUP_CONCAT(t.Tag SEPARATOR '\\n') AS tags
+    FROM novels n
+    LEFT JOIN novel_tags t ON t.Novel_id = n.Novel_id
+    WHERE n.Updated_at >= %s
+    GROUP BY n.Novel_id
+"""
+
+
+def word_bucket(word_count):
+    key = WORD_BUCKETS[0][1]
+    for low, bucket, _ in WORD_BUCKETS:
+        if (word_count or 0) >= low:
+            key = bucket
+    return key
+
+
+# ==================== 压缩位图 ====================
+def _array_to_bits(values):
+    bits = bytearray(_BITSET_BYTES)
+    for v in values:
+        bits[v >> 3] |= 1 << (v & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def _bits_to_array(bits):
+    data = bits.to_bytes(_BITSET_BYTES, 'little')
+    return array('H', (i << 3 | b for i, byte in enumerate(data) if byte
+                       for b in range(8) if byte >> b & 1))
+
+
+def _pack(values):
+    """按元素数量选择存储方式；values 为有序 array('H')"""
+    return values if len(values) <= ARRAY_MAX else _array_to_bits(values)
+
+
+def _container_len(c):
+    return len(c) if isinstance(c, array) else c.bit_count()
+
+
+def _intersect_arrays(a, b):
+    """两个有序数组的交集：大小悬殊时在大数组里二分查找，否则用集合"""
+    if len(a) > len(b):
+        a, b = b, a
+    if len(a) * 16 < len(b):
+        n = len(b)
+        for v in a:
+            i = bisect_left(b, v)
+            if i < n and b[i] == v:
+                yield v
+    else:
+        other = set(b)
+        for v in a:
+            if v in other:
+                yield v
+
+
+def _and_containers(a, b):
+    if isinstance(a, int) and isinstance(b, int):
+        bits = a & b
+        if not bits:
+            return None
+        return _bits_to_array(bits) if bits.bit_count() <= ARRAY_MAX else bits
+    if isinstance(a, int):
+        a, b = b, a
+    if isinstance(b, int):
+        data = b.to_bytes(_BITSET_BYTES, 'little')
+        values = array('H', (v for v in a if data[v >> 3] >> (v & 7) & 1))
+    else:
+        values = array('H', _intersect_arrays(a, b))
+    return values or None
+
+
+def _or_containers(a, b):
+    if isinstance(a, array) and isinstance(b, array):
+        merged = array('H', sorted(set(a).union(b)))
+        return _pack(merged)
+    bits_a = a if isinstance(a, int) else _array_to_bits(a)
+    bits_b = b if isinstance(b, int) else _array_to_bits(b)
+    return bits_a | bits_b
+
+
+class Bitmap:
+    """小说ID集合：高16位 -> 块（有序 array('H') 或整数位集）"""
+
+    __slots__ = ('containers', '_dense')
+
+    def __init__(self, containers=None):
+        self.containers = containers or {}
+        # 计数用：块的位集形式，修改时清空
+        self._dense = {}
+
+    @classmethod
+    def from_ids(cls, ids):
+        groups = {}
+        for x in sorted(set(ids)):
+            groups.setdefault(x >> 16, array('H')).append(x & 0xFFFF)
+        return cls({hi: _pack(values) for hi, values in groups.items()})
+
+    def add(self, x):
+        hi, lo = x >> 16, x & 0xFFFF
+        self._dense.pop(hi, None)
+        c = self.containers.get(hi)
+        if c is None:
+            self.containers[hi] = array('H', [lo])
+        elif isinstance(c, int):
+            self.containers[hi] = c | (1 << lo)
+        else:
+            i = bisect_left(c, lo)
+            if i == len(c) or c[i] != lo:
+                c.insert(i, lo)
+                if len(c) > ARRAY_MAX:
+                    self.containers[hi] = _array_to_bits(c)
+
+    def discard(self, x):
+        hi, lo = x >> 16, x & 0xFFFF
+        self._dense.pop(hi, None)
+        c = self.containers.get(hi)
+        if c is None:
+            return
+        if isinstance(c, int):
+            c &= ~(1 << lo)
+            if c.bit_count() <= ARRAY_MAX:
+                c = _bits_to_array(c)
+            self.containers[hi] = c
+        else:
+            i = bisect_left(c, lo)
+            if i < len(c) and c[i] == lo:
+                del c[i]
+        if not _container_len(self.containers[hi]):
+            del self.containers[hi]
+
+    def __contains__(self, x):
+        c = self.containers.get(x >> 16)
+        if c is None:
+            return False
+        lo = x & 0xFFFF
+        if isinstance(c, int):
+            return bool(c >> lo & 1)
+        i = bisect_left(c, lo)
+        return i < len(c) and c[i] == lo
+
+    def __len__(self):
+        return sum(_container_len(c) for c in self.containers.values())
+
+    def __iter__(self):
+        for hi in sorted(self.containers):
+            c = self.containers[hi]
+            base = hi << 16
+            for lo in (_bits_to_array(c) if isinstance(c, int) else c):
+                yield base | lo
+
+    def __and__(self, other):
+        result = {}
+        for hi, c in self.containers.items():
+            o = other.containers.get(hi)
+            if o is not None:
+                merged = _and_containers(c, o)
+                if merged is not None:
+                    result[hi] = merged
+        return Bitmap(result)
+
+    def __or__(self, other):
+        result = dict(self.containers)
+        for hi, o in other.containers.items():
+            c = result.get(hi)
+            result[hi] = o if c is None else _or_containers(c, o)
+        return Bitmap(result)
+
+    def dense(self, hi):
+        """块的位集形式（缓存），同一结果集与多个分面计数时只转换一次"""
+        bits = self._dense.get(hi)
+        if bits is None:
+            c = self.containers[hi]
+            bits = c if isinstance(c, int) else _array_to_bits(c)
+            self._dense[hi] = bits
+        return bits
+
+    def and_count(self, other):
+        """交集的基数，不生成交集本身"""
+        total = 0
+        for hi in self.containers:
+            if hi in other.containers:
+                total += (self.dense(hi) & other.dense(hi)).bit_count()
+        return total
+
+
+# ==================== 分面索引 ====================
+class FacetIndex:
+
+    def __init__(self):
+        # 分面 -> 取值 -> Bitmap
+        self.bitmaps = {facet: {} for facet in FACETS}
+        # Novel_id -> (分面取值..., Created_at)，更新时据此从旧位图中移除
+        self.novels = {}
+        self.all = Bitmap()
+        self.last_updated = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.novels)
+
+    @staticmethod
+    def _facet_values(row):
+        tags = row.get('tags') or ''
+        if isinstance(tags, str):
+            tags = tags.split('\n')
+        return {
+            'category': {row['Category']} if row.get('Category') else set(),
+            'tag': {t for t in tags if t},
+            'status': {row['Status']} if row.get('Status') else set(),
+            'word_count': {word_bucket(row.get('Word_count'))}
+        }
+
+    def update(self, row):
+        """新增或更新一本小说"""
+        novel_id = row['Novel_id']
+        values = self._facet_values(row)
+        with self._lock:
+            old = self.novels.get(novel_id)
+            if old is not None:
+                for facet, old_values in old[0].items():
+                    for value in old_values - values[facet]:
+                        bitmap = self.bitmaps[facet].get(value)
+                        if bitmap is not None:
+                            bitmap.discard(novel_id)
+                            if not len(bitmap):
+                                del self.bitmaps[facet][value]
+            for facet, new_values in values.items():
+                for value in new_values:
+                    self.bitmaps[facet].setdefault(value, Bitmap()).add(novel_id)
+            self.all.add(novel_id)
+            created = row.get('Created_at')
+            self.novels[novel_id] = (values, created.timestamp() if created else 0)
+            updated = row.get('Updated_at')
+            if updated is not None and (self.last_updated is None or updated > self.last_updated):
+                self.last_updated = updated
+
+    def filter(self, filters, base=None):
+        """
+        filters: {'category': [...], 'tag': [...], 'status': [...], 'word_count': [...]}
+        同一分面内多个取值为“或”，标签之间为“且”，不同分面之间为“且”
+        base: 全文检索结果位图，None 表示全部小说
+        """
+        result = self.all if base is None else base
+        with self._lock:
+            for facet, values in filters.items():
+                if not values or facet not in self.bitmaps:
+                    continue
+                bitmaps = [self.bitmaps[facet].get(v, Bitmap()) for v in values]
+                if facet == 'tag':
+                    for bitmap in bitmaps:
+                        result = result & bitmap
+                else:
+                    union = bitmaps[0]
+                    for bitmap in bitmaps[1:]:
+                        union = union | bitmap
+                    result = result & union
+        return result
+
+    def counts(self, result):
+        """结果集中各分面取值的数量，按数量倒序"""
+        facets = {}
+        with self._lock:
+            for facet, limit in FACETS.items():
+                items = []
+                for value, bitmap in self.bitmaps[facet].items():
+                    count = len(bitmap) if result is self.all else result.and_count(bitmap)
+                    if count:
+                        item = {'value': value, 'count': count}
+                        if facet == 'word_count':
+                            item['label'] = WORD_BUCKET_LABELS[value]
+                        items.append(item)
+                items.sort(key=lambda item: (-item['count'], item['value']))
+                facets[facet] = items[:limit]
+        return facets
+
+    def order_by_created(self, ids):
+        """按创建时间倒序排列（与原SQL的 ORDER BY Created_at DESC 一致）"""
+        novels = self.novels
+        return sorted(ids, key=lambda i: (novels[i][1] if i in novels else 0, i), reverse=True)
+
+
+# 当前使用的索引
+facet_index = None
+_last_refresh = 0.0
+_refresh_lock = threading.Lock()
+
+
+def _load_rows(connect, since):
+    conn = connect()
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    try:
+        cursor.execute(_FACET_ROWS_SQL, (since,))
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def get_index(connect):
+    """首次调用时全量构建，之后按间隔拉取 Updated_at 之后有变化的小说"""
+    global facet_index, _last_refresh
+    index = facet_index
+    now = time.time()
+    if index is None:
+        with _refresh_lock:
+            if facet_index is None:
+                started = time.perf_counter()
+                index = FacetIndex()
+                for row in _load_rows(connect, '1970-01-01'):
+                    index.update(row)
+                facet_index = index
+                _last_refresh = now
+                logger.info('分面索引构建完成', novels=len(index),
+                            ms=round((time.perf_counter() - started) * 1000, 1))
+            return facet_index
+
+    if now - _last_refresh >= REFRESH_INTERVAL and _refresh_lock.acquire(blocking=False):
+        try:
+            # Updated_at 只精确到秒，用 >= 重新拉取同一秒的行，重复更新无副作用
+            for row in _load_rows(connect, index.last_updated or '1970-01-01'):
+                index.update(row)
+            _last_refresh = now
+        except Exception as e:
+            logger.warning('分面索引刷新失败', error=str(e))
+        finally:
+            _refresh_lock.release()
+    return index
+
+
+def update_novel(row):
+    """写操作成功后调用，只更新本进程已建立的索引"""
+    index = facet_index
+    if index is not None:
+        index.update(row)
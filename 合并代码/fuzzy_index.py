@@ -0,0 +1,298 @@
+# fuzzy_index.py
+"""
+模糊搜索（容错 + 拼音）
+- 标题归一化后，连同拼音全拼、首字母（pypinyin可选）作为匹配键
+- 候选：n元组倒排表（标题用二元组，拼音字母区分度低用三元组），只用最稀有的几个n元组统计共享数量；
+  比n元组还短的查询改用单字倒排表找包含它的键
+- 校验：查询与键的“子串编辑距离”（查询可匹配键中任意一段），超过上限立即停止
+- 中文查询同时转成拼音再与拼音键匹配，同音错字也能找到
+- 每次查询有时间预算，超时返回已校验的结果并标记为不完整
+- 标题修改后旧键只标记作废，作废键超过 REBUILD_DEAD_RATIO 时在刷新时整体重建
+"""
+import threading
+import time
+from array import array
+from collections import Counter
+
+import pymysql
+
+from async_log import get_logger
+import search_text
+from search_text import has_cjk, normalize, pinyin_variants
+
+# 单次查询的时间预算（秒）
+FUZZY_BUDGET = 0.005
+# 最多校验的候选键数
+MAX_CANDIDATES = 300
+# 候选计数时最多累计的倒排表长度
+POSTING_BUDGET = 8000
+# 增量拉取的间隔（秒）
+REFRESH_INTERVAL = 5
+# 作废键占比超过该值（且不少于 REBUILD_MIN_DEAD 个）时整体重建
+REBUILD_DEAD_RATIO = 0.2
+REBUILD_MIN_DEAD = 1000
+
+# 键的类型
+TITLE = 0
+PINYIN = 1
+INITIALS = 2
+
+logger = get_logger('search.fuzzy')
+
+_FUZZY_ROWS_SQL = """
+    SELECT Novel_id, Title, Updated_at FROM novels
+    WHERE Updated_at >= %s
+"""
+
+
+def max_distance(query):
+    """允许的编辑距离：中文每个字信息量大，阈值比拼音/英文小"""
+    n = len(query)
+    if has_cjk(query):
+        return 0 if n <= 2 else 1 if n <= 6 else 2
+    return 0 if n <= 3 else 1 if n <= 7 else 2
+
+
+# 各类键的n元组长度
+GRAM_SIZES = {TITLE: 2, PINYIN: 3, INITIALS: 3}
+
+
+def _grams(key, n):
+    """带开头标记的n元组，短查询也能用开头定位；不同长度的n元组共用一个倒排表"""
+    padded = '\x02' + key
+    return {padded[i:i + n] for i in range(max(1, len(padded) - n + 1))}
+
+
+def substring_distance(query, text, limit):
+    """
+    query 与 text 中任意一段的最小编辑距离（起止位置不计代价）
+    某一行最小值已超过 limit 时提前返回 limit + 1
+    """
+    if query in text:
+        return 0
+    prev = [0] * (len(text) + 1)
+    for i, qc in enumerate(query, 1):
+        cur = [i]
+        best = i
+        left = i
+        for j, tc in enumerate(text):
+            value = prev[j] if qc == tc else prev[j] + 1
+            if prev[j + 1] + 1 < value:
+                value = prev[j + 1] + 1
+            if left + 1 < value:
+                value = left + 1
+            cur.append(value)
+            left = value
+            if value < best:
+                best = value
+        if best > limit:
+            return limit + 1
+        prev = cur
+    return min(prev)
+
+
+class FuzzyIndex:
+
+    def __init__(self):
+        self.keys = []
+        self.key_novels = array('i')
+        self.postings = {}
+        # 单字 -> 键，用于比n元组还短的查询
+        self.chars = {}
+        # 标题修改后旧键作废，整体重建时清理
+        self.dead = set()
+        self.novel_keys = {}
+        self.last_updated = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.novel_keys)
+
+    def update(self, row):
+        """新增或更新一本小说的标题"""
+        title = row['Title'] or ''
+        keys = [(normalize(title), TITLE)]
+        variants = pinyin_variants(title)
+        if variants:
+            keys += [(variants[0], PINYIN), (variants[1], INITIALS)]
+
+        with self._lock:
+            old = self.novel_keys.get(row['Novel_id'])
+            if old is not None:
+                if [self.keys[k] for k in old] == [key for key, _ in keys]:
+                    return
+                self.dead.update(old)
+
+            key_ids = []
+            for key, kind in keys:
+                if not key:
+                    continue
+                key_id = len(self.keys)
+                self.keys.append(key)
+                self.key_novels.append(row['Novel_id'])
+                for gram in _grams(key, GRAM_SIZES[kind]):
+                    posting = self.postings.get(gram)
+                    if posting is None:
+                        posting = self.postings[gram] = array('I')
+                    posting.append(key_id)
+                for char in set(key):
+                    posting = self.chars.get(char)
+                    if posting is None:
+                        posting = self.chars[char] = array('I')
+                    posting.append(key_id)
+                key_ids.append(key_id)
+            self.novel_keys[row['Novel_id']] = key_ids
+
+            updated = row.get('Updated_at')
+            if updated is not None and (self.last_updated is None or updated > self.last_updated):
+                self.last_updated = updated
+
+    def needs_rebuild(self):
+        return len(self.dead) >= REBUILD_MIN_DEAD and len(self.dead) > REBUILD_DEAD_RATIO * len(self.keys)
+
+    def _short_candidates(self, query):
+        """比n元组还短的查询（此时允许的距离为0）：取最短的单字倒排表，保留包含查询的键"""
+        postings = [self.chars.get(char) for char in set(query)]
+        if not all(postings):
+            return []
+        candidates = []
+        dead = self.dead
+        for key_id in min(postings, key=len):
+            if key_id not in dead and query in self.keys[key_id]:
+                candidates.append(key_id)
+                if len(candidates) >= MAX_CANDIDATES:
+                    break
+        return candidates
+
+    def _candidates(self, query, n, limit_distance):
+        """
+        按共享n元组数量排序的候选键
+        只统计最稀有的几个n元组（倒排表总长度不超过 POSTING_BUDGET），常见n元组对区分候选帮助不大
+        """
+        if len(query) < n:
+            return self._short_candidates(query)
+
+        all_grams = _grams(query, n)
+        postings = sorted((self.postings[g] for g in all_grams if g in self.postings), key=len)
+        if not postings:
+            return []
+
+        used, total = [], 0
+        for posting in postings:
+            if used and total + len(posting) > POSTING_BUDGET:
+                break
+            used.append(posting)
+            total += len(posting)
+
+        counts = Counter()
+        for posting in used:
+            counts.update(posting)
+
+        # 每处编辑最多破坏n个n元组，开头标记的n元组在子串匹配时不一定出现，未统计的n元组都按命中算
+        min_shared = len(all_grams) - 1 - n * limit_distance - (len(postings) - len(used))
+        dead = self.dead
+        return [key_id for key_id, shared in counts.most_common(MAX_CANDIDATES)
+                if shared >= min_shared and key_id not in dead]
+
+    def search(self, query, limit=100, budget=FUZZY_BUDGET):
+        """
+        返回 ([(Novel_id, 编辑距离)], 是否完整)，按距离升序
+        """
+        started = time.perf_counter()
+        text = normalize(query)
+        if not text:
+            return [], True
+
+        # (查询文本, n元组长度)：先匹配标题原文，再匹配拼音键（中文查询先转成拼音）
+        passes = [(text, GRAM_SIZES[TITLE])]
+        if has_cjk(text):
+            variants = pinyin_variants(text)
+            if variants:
+                passes.append((variants[0], GRAM_SIZES[PINYIN]))
+        elif search_text.lazy_pinyin is not None:
+            passes.append((text, GRAM_SIZES[PINYIN]))
+
+        best = {}
+        complete = True
+        with self._lock:
+            for number, (pass_text, n) in enumerate(passes):
+                # 剩余预算平均分给剩下的几轮
+                remaining = budget - (time.perf_counter() - started)
+                deadline = time.perf_counter() + remaining / (len(passes) - number)
+                limit_distance = max_distance(pass_text)
+                for key_id in self._candidates(pass_text, n, limit_distance):
+                    if time.perf_counter() > deadline:
+                        complete = False
+                        break
+                    distance = substring_distance(pass_text, self.keys[key_id], limit_distance)
+                    if distance <= limit_distance:
+                        novel_id = self.key_novels[key_id]
+                        # 距离相同时标题原文匹配排在拼音匹配前面
+                        score = (distance, number)
+                        if novel_id not in best or score < best[novel_id]:
+                            best[novel_id] = score
+
+        ranked = sorted(best.items(), key=lambda item: (item[1], -item[0]))
+        return [(novel_id, score[0]) for novel_id, score in ranked[:limit]], complete
+
+
+# 当前使用的索引
+fuzzy_index = None
+_last_refresh = 0.0
+_refresh_lock = threading.Lock()
+
+
+def _load_rows(connect, since):
+    conn = connect()
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    try:
+        cursor.execute(_FUZZY_ROWS_SQL, (since,))
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _build(connect):
+    started = time.perf_counter()
+    index = FuzzyIndex()
+    for row in _load_rows(connect, '1970-01-01'):
+        index.update(row)
+    logger.info('模糊搜索索引构建完成', novels=len(index), keys=len(index.keys),
+                ms=round((time.perf_counter() - started) * 1000, 1))
+    return index
+
+
+def get_index(connect):
+    """首次调用时全量构建，之后按间隔拉取 Updated_at 之后有变化的小说，作废键过多时重建"""
+    global fuzzy_index, _last_refresh
+    index = fuzzy_index
+    now = time.time()
+    if index is None:
+        with _refresh_lock:
+            if fuzzy_index is None:
+                fuzzy_index = _build(connect)
+                _last_refresh = now
+            return fuzzy_index
+
+    if now - _last_refresh >= REFRESH_INTERVAL and _refresh_lock.acquire(blocking=False):
+        try:
+            if index.needs_rebuild():
+                # 重建期间的写入由下一次增量拉取补上（按 Updated_at >= 上次最大值拉取）
+                fuzzy_index = index = _build(connect)
+            else:
+                for row in _load_rows(connect, index.last_updated or '1970-01-01'):
+                    index.update(row)
+            _last_refresh = now
+        except Exception as e:
+            logger.warning('模糊搜索索引刷新失败', error=str(e))
+        finally:
+            _refresh_lock.release()
+    return index
+
+
+def update_novel(row):
+    """写操作成功后调用，只更新本进程已建立的索引"""
+    index = fuzzy_index
+    if index is not None:
+        index.update(row)
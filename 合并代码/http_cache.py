@@ -0,0 +1,67 @@
+# http_cache.py
+"""
+HTTP条件请求支持（ETag / Last-Modified / 304）
+- ETag 只由数据计算（Updated_at 加上字数、条数等廉价字段），不需要读取响应体；
+  不含进程内状态，多进程部署和重启后同一份数据的ETag相同
+- Updated_at 只精确到秒，同一秒内的修改靠一起参与计算的字数、条数区分
+- 客户端缓存仍有效时直接返回304，不再查询和发送正文
+- 各接口的 Cache-Control 策略集中配置
+"""
+import hashlib
+from datetime import datetime, timezone
+
+from flask import Response, request
+
+# 各接口的Cache-Control策略
+# no-cache 表示客户端每次都要带条件请求回来验证，命中时只返回304
+CACHE_POLICIES = {
+    'novel': 'public, max-age=60',
+    'chapter_list': 'public, no-cache',
+    'chapter': 'public, max-age=300',
+    'comments': 'public, no-cache'
+}
+
+def make_etag(kind, key, *parts):
+    """根据类型、ID及数据字段（如Updated_at、字数）生成弱ETag"""
+    raw = '|'.join(str(p) for p in (kind, key) + parts)
+    digest = hashlib.md5(raw.encode('utf-8')).hexdigest()[:16]
+    return f'W/"{digest}"'
+
+
+def _to_utc(value):
+    """数据库中的时间为无时区时间，按UTC处理并去掉微秒（HTTP日期只精确到秒）"""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.replace(microsecond=0)
+
+
+def is_not_modified(etag, last_modified=None):
+    """判断请求携带的 If-None-Match / If-Modified-Since 是否仍然有效"""
+    if request.if_none_match:
+        # 有If-None-Match时忽略If-Modified-Since（RFC 7232）
+        return request.if_none_match.contains_weak(etag.removeprefix('W/').strip('"'))
+
+    if last_modified is not None and request.if_modified_since is not None:
+        return _to_utc(last_modified) <= request.if_modified_since
+    return False
+
+
+def set_cache_headers(response, etag, last_modified=None, policy=None):
+    """给响应加上ETag、Last-Modified和Cache-Control"""
+    response.headers['ETag'] = etag
+    if isinstance(last_modified, datetime):
+        response.last_modified = _to_utc(last_modified)
+    if policy:
+        response.headers['Cache-Control'] = CACHE_POLICIES.get(policy, policy)
+    return response
+
+
+def not_modified(etag, last_modified=None, policy=None):
+    """缓存有效时返回304响应，否则返回None"""
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    if not is_not_modified(etag, last_modified):
+        return None
+    return set_cache_headers(Response(status=304), etag, last_modified, policy)
@@ -0,0 +1,496 @@
+# income_ledger.py
+"""
+作者收入账本（复式记账）
+- 每笔业务是一条 ledger_transactions，下挂若干 ledger_entries，同一笔业务的分录金额之和为0
+- 分录只追加不修改，更正通过新的业务冲销；金额统一用“分”（整数）
+- ledger_accounts 保存每个账户的当前余额快照和版本号，查询可提现余额是一次主键读取，不需要对历史求和
+- 记账时按读到的版本号更新余额（乐观并发）：版本已变化说明有并发记账，整笔回滚后重试或返回冲突
+- 提现请求按 (作者, 请求键) 幂等，重复提交返回同一条提现记录
+- 每日批处理把前一天的阅读事件（reading_events 汇总）按阅读次数折算为作者收入
+
+账户：
+    author   <作者ID> available   可提现余额
+    author   <作者ID> frozen      提现处理中冻结的金额
+    platform 0        reading     阅读收入来源（对方科目，余额为负）
+    platform 0        payout      已打款给作者的金额
+    platform 0        fee         提现手续费
+
+用法:
+    python income_ledger.py settle [YYYY-MM-DD]   结算指定日期的阅读收入（默认昨天）
+"""
+import sys
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+import pymysql
+
+from async_log import get_logger
+import reading_events
+
+AUTHOR = 'author'
+PLATFORM = 'platform'
+
+AVAILABLE = 'available'
+FROZEN = 'frozen'
+READING = 'reading'
+PAYOUT = 'payout'
+FEE = 'fee'
+
+# 收入类分录（计入累计收入）
+INCOME_TYPES = ('chapter', 'tip', 'vip', 'ad', 'bonus')
+
+# 每次去重阅读（同一用户同一天同一章节只算一次）折算的作者收入（分）
+INCOME_PER_READ = 1
+
+# 提现：最低金额（分）、手续费率、支持的方式
+MIN_WITHDRAWAL = 10000
+WITHDRAWAL_FEE_RATE = Decimal('0.01')
+WITHDRAWAL_METHODS = ('alipay', 'wechat', 'bank')
+
+# 版本冲突时的重试次数
+MAX_RETRIES = 3
+
+# 列表每页最大条数
+MAX_PAGE_SIZE = 100
+
+logger = get_logger('income_ledger')
+
+
+class LedgerConflict(Exception):
+    """账户余额在读取后被并发修改"""
+
+    def __init__(self, account_id, current_version=None):
+        super().__init__('账户余额已变化，请刷新后重试')
+        self.account_id = account_id
+        self.current_version = current_version
+
+
+def to_cents(amount):
+    """元（字符串或数字）-> 分，最多两位小数"""
+    try:
+        value = Decimal(str(amount))
+    except InvalidOperation:
+        raise ValueError('金额格式不正确')
+    if not value.is_finite() or value != value.quantize(Decimal('0.01')):
+        raise ValueError('金额最多保留两位小数')
+    return int(value * 100)
+
+
+def to_yuan(cents):
+    return float(Decimal(int(cents or 0)) / 100)
+
+
+# ==================== 账户与记账 ====================
+def get_account(cursor, owner_type, owner_id, account_type):
+    """读取账户（不存在时创建），返回 {Account_id, Balance, Total_income, Version}"""
+    cursor.execute("""
+        SELECT Account_id, Balance, Total_income, Version FROM ledger_accounts
+        WHERE Owner_type = %s AND Owner_id = %s AND Account_type = %s
+    """, (owner_type, owner_id, account_type))
+    account = cursor.fetchone()
+    if account is None:
+        cursor.execute("""
+            INSERT IGNORE INTO ledger_accounts (Owner_type, Owner_id, Account_type, Balance,
+                                                Total_income, Version, Updated_at)
+            VALUES (%s, %s, %s, 0, 0, 0, %s)
+        """, (owner_type, owner_id, account_type, datetime.now()))
+        cursor.execute("""
+            SELECT Account_id, Balance, Total_income, Version FROM ledger_accounts
+            WHERE Owner_type = %s AND Owner_id = %s AND Account_type = %s
+        """, (owner_type, owner_id, account_type))
+        account = cursor.fetchone()
+    return account
+
+
+def post_transaction(cursor, txn_type, postings, idempotency_key=None, biz_date=None):
+    """
+    记一笔业务（不提交事务）
+    postings: [(账户, 金额(分), 分录类型, Novel_id, 备注)]，账户为 get_account 的返回值
+    按账户读取时的版本号更新余额，任一账户版本已变化则抛出 LedgerConflict
+    返回 Txn_id
+    """
+    if sum(amount for _, amount, _, _, _ in postings) != 0:
+        raise ValueError('分录金额之和必须为0')
+
+    now = datetime.now()
+    biz_date = biz_date or now.date()
+    cursor.execute("""
+        INSERT INTO ledger_transactions (Txn_type, Idempotency_key, Created_at)
+        VALUES (%s, %s, %s)
+    """, (txn_type, idempotency_key, now))
+    txn_id = cursor.lastrowid
+
+    # 账户ID -> [余额, 本次累计收入, 读取时的版本号]
+    states = {}
+    entries = []
+    for account, amount, entry_type, novel_id, memo in postings:
+        state = states.get(account['Account_id'])
+        if state is None:
+            state = states[account['Account_id']] = [account['Balance'], 0, account['Version']]
+        state[0] += amount
+        if entry_type in INCOME_TYPES and amount > 0:
+            state[1] += amount
+        entries.append((txn_id, account['Account_id'], entry_type, amount, state[0],
+                        novel_id, biz_date, memo, now))
+
+    for account_id, (balance, income, version) in states.items():
+        cursor.execute("""
+            UPDATE ledger_accounts
+            SET Balance = %s, Total_income = Total_income + %s, Version = Version + 1, Updated_at = %s
+            WHERE Account_id = %s AND Version = %s
+        """, (balance, income, now, account_id, version))
+        if cursor.rowcount != 1:
+            raise LedgerConflict(account_id)
+
+    cursor.executemany("""
+        INSERT INTO ledger_entries (Txn_id, Account_id, Entry_type, Amount, Balance_after,
+                                    Novel_id, Biz_date, Memo, Created_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """, entries)
+    return txn_id
+
+
+def _with_retries(conn, func, retries=MAX_RETRIES):
+    """func(cursor) 在一个事务中执行，版本冲突时整体回滚重试"""
+    for attempt in range(retries):
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        try:
+            result = func(cursor)
+            conn.commit()
+            return result
+        except LedgerConflict:
+            conn.rollback()
+            if attempt == retries - 1:
+                raise
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+
+# ==================== 查询 ====================
+def overview(conn, author_id, today=None):
+    """余额来自账户快照；昨日/本月收入按 Biz_date 读取索引范围内的分录"""
+    today = today or date.today()
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    try:
+        cursor.execute("""
+            SELECT Account_id, Account_type, Balance, Total_income, Version FROM ledger_accounts
+            WHERE Owner_type = %s AND Owner_id = %s AND Account_type IN (%s, %s)
+        """, (AUTHOR, author_id, AVAILABLE, FROZEN))
+        accounts = {row['Account_type']: row for row in cursor.fetchall()}
+        available = accounts.get(AVAILABLE)
+
+        result = {
+            'available_balance': to_yuan(available['Balance'] if available else 0),
+            'frozen_balance': to_yuan(accounts[FROZEN]['Balance'] if FROZEN in accounts else 0),
+            'total_income': to_yuan(available['Total_income'] if available else 0),
+            'balance_version': available['Version'] if available else 0,
+            'yesterday_income': 0.0,
+            'monthly_income': 0.0
+        }
+        if available is None:
+            return result
+
+        yesterday = today - timedelta(days=1)
+        month_start = min(today.replace(day=1), yesterday)
+        placeholders = ', '.join(['%s'] * len(INCOME_TYPES))
+        cursor.execute(f"""
+            SELECT Biz_date, SUM(Amount) AS amount FROM ledger_entries
+            WHERE Account_id = %s AND Biz_date >= %s AND Entry_type IN ({placeholders})
+            GROUP BY Biz_date
+        """, (available['Account_id'], month_start) + INCOME_TYPES)
+        for row in cursor.fetchall():
+            if row['Biz_date'] == yesterday:
+                result['yesterday_income'] = to_yuan(row['amount'])
+            if row['Biz_date'] >= today.replace(day=1):
+                result['monthly_income'] = round(result['monthly_income'] + to_yuan(row['amount']), 2)
+        return result
+    finally:
+        cursor.close()
+
+
+def list_entries(conn, author_id, before_id=None, limit=20, entry_type=None):
+    """可提现账户的分录，按 Entry_id 倒序键集分页"""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    try:
+        cursor.execute("""
+            SELECT Account_id FROM ledger_accounts
+            WHERE Owner_type = %s AND Owner_id = %s AND Account_type = %s
+        """, (AUTHOR, author_id, AVAILABLE))
+        account = cursor.fetchone()
+        if account is None:
+            return [], None
+
+        query = """
+            SELECT e.Entry_id, e.Txn_id, e.Entry_type, e.Amount, e.Balance_after, e.Novel_id,
+                   n.Title AS novel_title, e.Biz_date, e.Memo, e.Created_at
+            FROM ledger_entries e
+            LEFT JOIN novels n ON n.Novel_id = e.Novel_id
+            WHERE e.Account_id = %s
+        """
+        params = [account['Account_id']]
+        if entry_type:
+            query += " AND e.Entry_type = %s"
+            params.append(entry_type)
+        if before_id:
+            query += " AND e.Entry_id < %s"
+            params.append(before_id)
+        query += " ORDER BY e.Entry_id DESC LIMIT %s"
+        params.append(limit)
+
+        cursor.execute(query, params)
+        entries = cursor.fetchall()
+        for entry in entries:
+            entry['Amount'] = to_yuan(entry['Amount'])
+            entry['Balance_after'] = to_yuan(entry['Balance_after'])
+        next_id = entries[-1]['Entry_id'] if len(entries) == limit else None
+        return entries, next_id
+    finally:
+        cursor.close()
+
+
+def list_withdrawals(conn, author_id, before_id=None, limit=20):
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    try:
+        query = """
+            SELECT Withdrawal_id, Amount, Fee, Method, Status, Created_at, Updated_at
+            FROM withdrawals WHERE Author_id = %s
+        """
+        params = [author_id]
+        if before_id:
+            query += " AND Withdrawal_id < %s"
+            params.append(before_id)
+        query += " ORDER BY Withdrawal_id DESC LIMIT %s"
+        params.append(limit)
+
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        for row in rows:
+            row['Actual'] = to_yuan(row['Amount'] - row['Fee'])
+            row['Amount'] = to_yuan(row['Amount'])
+            row['Fee'] = to_yuan(row['Fee'])
+        next_id = rows[-1]['Withdrawal_id'] if len(rows) == limit else None
+        return rows, next_id
+    finally:
+        cursor.close()
+
+
+# ==================== 提现 ====================
+def _find_withdrawal(cursor, author_id, request_key):
+    cursor.execute("""
+        SELECT * FROM withdrawals WHERE Author_id = %s AND Request_key = %s
+    """, (author_id, request_key))
+    return cursor.fetchone()
+
+
+def request_withdrawal(conn, author_id, request_key, amount, method, expected_version=None):
+    """
+    申请提现：可提现余额转入冻结账户，并生成一条 pending 的提现记录
+    amount 单位为分；同一 request_key 重复提交返回已有记录
+    expected_version: 客户端看到的余额版本，与当前版本不一致时抛出 LedgerConflict
+    返回 (提现记录, 是否新建)
+    """
+    if method not in WITHDRAWAL_METHODS:
+        raise ValueError('不支持的提现方式')
+    if amount < MIN_WITHDRAWAL:
+        raise ValueError(f'提现金额不能低于{MIN_WITHDRAWAL // 100}元')
+    if expected_version is not None:
+        expected_version = int(expected_version)
+    fee = int((Decimal(amount) * WITHDRAWAL_FEE_RATE).quantize(Decimal('1'), ROUND_HALF_UP))
+
+    def apply(cursor):
+        existing = _find_withdrawal(cursor, author_id, request_key)
+        if existing is not None:
+            return existing, False
+
+        available = get_account(cursor, AUTHOR, author_id, AVAILABLE)
+        if expected_version is not None and available['Version'] != expected_version:
+            raise LedgerConflict(available['Account_id'], available['Version'])
+        if available['Balance'] < amount:
+            raise ValueError('可提现余额不足')
+        frozen = get_account(cursor, AUTHOR, author_id, FROZEN)
+
+        txn_id = post_transaction(cursor, 'withdraw_request', [
+            (available, -amount, 'withdraw', None, '提现申请'),
+            (frozen, amount, 'withdraw', None, '提现冻结')
+        ], idempotency_key=f'withdraw:{author_id}:{request_key}')
+
+        now = datetime.now()
+        cursor.execute("""
+            INSERT INTO withdrawals (Author_id, Request_key, Amount, Fee, Method, Status,
+                                     Txn_id, Created_at, Updated_at)
+            VALUES (%s, %s, %s, %s, %s, 'pending', %s, %s, %s)
+        """, (author_id, request_key, amount, fee, method, txn_id, now, now))
+        return _find_withdrawal(cursor, author_id, request_key), True
+
+    try:
+        # 客户端指定了版本时冲突直接返回给客户端，不在服务端重试
+        return _with_retries(conn, apply, 1 if expected_version is not None else MAX_RETRIES)
+    except pymysql.err.IntegrityError:
+        # 同一请求键并发提交，另一个请求已经成功
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        try:
+            existing = _find_withdrawal(cursor, author_id, request_key)
+        finally:
+            cursor.close()
+        if existing is None:
+            raise
+        return existing, False
+
+
+def settle_withdrawal(conn, withdrawal_id, succeeded):
+    """
+    处理提现：成功时冻结金额转入平台打款和手续费账户，失败时退回可提现余额
+    只处理 pending 状态的记录，返回更新后的记录
+    """
+
+    def apply(cursor):
+        cursor.execute("SELECT * FROM withdrawals WHERE Withdrawal_id = %s", (withdrawal_id,))
+        withdrawal = cursor.fetchone()
+        if withdrawal is None:
+            raise LookupError('提现记录不存在')
+        if withdrawal['Status'] != 'pending':
+            raise ValueError('提现已处理')
+
+        author_id, amount, fee = withdrawal['Author_id'], withdrawal['Amount'], withdrawal['Fee']
+        frozen = get_account(cursor, AUTHOR, author_id, FROZEN)
+        if succeeded:
+            postings = [
+                (frozen, -amount, 'withdraw', None, '提现解冻'),
+                (get_account(cursor, PLATFORM, 0, PAYOUT), amount - fee, 'withdraw', None, '提现打款'),
+                (get_account(cursor, PLATFORM, 0, FEE), fee, 'withdraw_fee', None, '提现手续费')
+            ]
+        else:
+            postings = [
+                (frozen, -amount, 'withdraw', None, '提现失败解冻'),
+                (get_account(cursor, AUTHOR, author_id, AVAILABLE), amount, 'withdraw_refund', None, '提现失败退回')
+            ]
+        status = 'completed' if succeeded else 'failed'
+        txn_id = post_transaction(cursor, f'withdraw_{status}', postings,
+                                  idempotency_key=f'withdraw_settle:{withdrawal_id}')
+
+        # 状态条件保证同一提现只结算一次
+        cursor.execute("""
+            UPDATE withdrawals SET Status = %s, Settle_txn_id = %s, Updated_at = %s
+            WHERE Withdrawal_id = %s AND Status = 'pending'
+        """, (status, txn_id, datetime.now(), withdrawal_id))
+        if cursor.rowcount != 1:
+            raise ValueError('提现已处理')
+        cursor.execute("SELECT * FROM withdrawals WHERE Withdrawal_id = %s", (withdrawal_id,))
+        return cursor.fetchone()
+
+    return _with_retries(conn, apply)
+
+
+# ==================== 每日阅读收入结算 ====================
+def reading_income(conn, day):
+    """
+    由当天的阅读事件计算每位作者的收入，按去重阅读数计，重复刷同一章节不增加收入
+    返回 {作者ID: [(Novel_id, 去重阅读数, 收入(分))]}
+    """
+    reads = reading_events.unique_reads(day)
+    if not reads:
+        return {}
+
+    novel_ids = sorted(reads)
+    authors = {}
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    try:
+        # 分批按主键查询作者，IN 列表不宜过长
+        for i in range(0, len(novel_ids), 1000):
+            chunk = novel_ids[i:i + 1000]
+            cursor.execute(f"""
+                SELECT Novel_id, Author_id FROM novels
+                WHERE Novel_id IN ({', '.join(['%s'] * len(chunk))})
+            """, chunk)
+            for row in cursor.fetchall():
+                income = reads[row['Novel_id']] * INCOME_PER_READ
+                if income > 0:
+                    authors.setdefault(row['Author_id'], []).append(
+                        (row['Novel_id'], reads[row['Novel_id']], income))
+        return authors
+    finally:
+        cursor.close()
+
+
+def settle_reading_income(conn, day):
+    """
+    结算一天的阅读收入：每位作者一笔业务，幂等键为 reading:<日期>:<作者ID>，重复执行会跳过已结算的作者
+    返回 (结算的作者数, 总金额(分))
+    """
+    authors = reading_income(conn, day)
+    if not authors:
+        return 0, 0
+
+    cursor = conn.cursor()
+    try:
+        keys = {author_id: f'reading:{day.isoformat()}:{author_id}' for author_id in authors}
+        done = set()
+        key_list = list(keys.values())
+        for i in range(0, len(key_list), 1000):
+            chunk = key_list[i:i + 1000]
+            cursor.execute(f"""
+                SELECT Idempotency_key FROM ledger_transactions
+                WHERE Idempotency_key IN ({', '.join(['%s'] * len(chunk))})
+            """, chunk)
+            done.update(row[0] for row in cursor.fetchall())
+        conn.commit()
+    finally:
+        cursor.close()
+
+    settled, total = 0, 0
+    for author_id, novels in authors.items():
+        if keys[author_id] in done:
+            continue
+
+        def apply(cursor):
+            available = get_account(cursor, AUTHOR, author_id, AVAILABLE)
+            source = get_account(cursor, PLATFORM, 0, READING)
+            amount = sum(income for _, _, income in novels)
+            postings = [(available, income, 'chapter', novel_id, f'{day.isoformat()} 去重阅读 {count} 次')
+                        for novel_id, count, income in novels]
+            postings.append((source, -amount, 'chapter', None, f'{day.isoformat()} 作者 {author_id} 阅读收入'))
+            post_transaction(cursor, 'reading_income', postings, idempotency_key=keys[author_id], biz_date=day)
+            return amount
+
+        try:
+            total += _with_retries(conn, apply)
+            settled += 1
+        except pymysql.err.IntegrityError:
+            # 其它进程已结算该作者
+            continue
+
+    logger.info('阅读收入结算完成', day=day.isoformat(), authors=settled, cents=total)
+    return settled, total
+
+
+def main(argv):
+    if len(argv) < 2 or argv[1] != 'settle':
+        print(__doc__)
+        return 1
+
+    from migrations import get_db_connection
+
+    day = date.fromisoformat(argv[2]) if len(argv) > 2 else date.today() - timedelta(days=1)
+    if day >= date.today():
+        print('只能结算今天之前的日期')
+        return 1
+
+    conn = get_db_connection()
+    try:
+        started = time.perf_counter()
+        settled, total = settle_reading_income(conn, day)
+        print(f"✅ {day.isoformat()}: 结算 {settled} 位作者，共 {to_yuan(total):.2f} 元，"
+              f"{(time.perf_counter() - started) * 1000:.1f} ms")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,120 @@
+# json_response.py
+"""
+统一JSON响应层
+- 直接序列化DictCursor返回的行，datetime/date/time/timedelta/Decimal/bytes 由编码器处理，
+  接口中不再需要逐行 isoformat()/strftime()
+- 已安装orjson时使用orjson，否则回退到标准库json（ensure_ascii=False，中文按UTF-8输出）
+- 按端点统计编码耗时，并通过 Server-Timing 头返回，/metrics 中导出
+"""
+import base64
+import json
+import threading
+import time
+from datetime import date, datetime, time as dt_time, timedelta
+from decimal import Decimal
+
+from flask import Response, request
+
+try:
+    import orjson
+except ImportError:  # orjson为可选依赖
+    orjson = None
+
+# 端点 -> 编码统计
+encode_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _make_default(datetime_format=None):
+    """生成编码器的default回调，处理JSON原生不支持的类型"""
+
+    def default(obj):
+        if isinstance(obj, datetime):
+            return obj.strftime(datetime_format) if datetime_format else obj.isoformat()
+        if isinstance(obj, date):
+            return obj.isoformat()
+        if isinstance(obj, dt_time):
+            return obj.isoformat()
+        if isinstance(obj, timedelta):
+            # MySQL的TIME列在pymysql中返回timedelta
+            return obj.total_seconds()
+        if isinstance(obj, Decimal):
+            # SUM()等聚合结果为Decimal，整数值保持为整数；小数转成字符串，转float会静默丢失精度
+            return int(obj) if obj == obj.to_integral_value() else str(obj)
+        if isinstance(obj, (bytes, bytearray, memoryview)):
+            raw = bytes(obj)
+            try:
+                return raw.decode('utf-8')
+            except UnicodeDecodeError:
+                return base64.b64encode(raw).decode('ascii')
+        if isinstance(obj, (set, frozenset)):
+            return list(obj)
+        raise TypeError(f'无法序列化类型: {type(obj).__name__}')
+
+    return default
+
+
+_default = _make_default()
+
+
+def dumps(obj, datetime_format=None):
+    """把对象编码为UTF-8字节串"""
+    default = _make_default(datetime_format) if datetime_format else _default
+
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if datetime_format:
+            # 自定义日期格式时让datetime走default回调
+            option |= orjson.OPT_PASSTHROUGH_DATETIME
+        return orjson.dumps(obj, default=default, option=option)
+
+    return json.dumps(obj, default=default, ensure_ascii=False,
+                      separators=(',', ':')).encode('utf-8')
+
+
+def record_encode_time(endpoint, elapsed, size):
+    """记录某个端点一次编码的耗时（秒）和输出字节数"""
+    endpoint = endpoint or 'unknown'
+    with _stats_lock:
+        stats = encode_stats.get(endpoint)
+        if stats is None:
+            stats = encode_stats[endpoint] = {
+                'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'bytes': 0
+            }
+        ms = elapsed * 1000
+        stats['count'] += 1
+        stats['total_ms'] += ms
+        stats['max_ms'] = max(stats['max_ms'], ms)
+        stats['bytes'] += size
+
+
+def get_encode_stats():
+    """返回各端点的编码统计快照"""
+    with _stats_lock:
+        return {
+            endpoint: dict(stats, avg_ms=stats['total_ms'] / stats['count'] if stats['count'] else 0.0)
+            for endpoint, stats in encode_stats.items()
+        }
+
+
+def _current_endpoint():
+    try:
+        return request.endpoint
+    except RuntimeError:  # 不在请求上下文中
+        return None
+
+
+def json_response(payload, datetime_format=None):
+    """
+    与jsonify用法一致：return json_response({...}), 200
+    datetime_format 为None时日期输出ISO 8601格式
+    """
+    start = time.perf_counter()
+    body = dumps(payload, datetime_format)
+    elapsed = time.perf_counter() - start
+    record_encode_time(_current_endpoint(), elapsed, len(body))
+
+    response = Response(body, mimetype='application/json')
+    response.headers['Server-Timing'] = f'encode;dur={elapsed * 1000:.3f}'
+    return response
+
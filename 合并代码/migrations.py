@@ -0,0 +1,692 @@
+# migrations.py
+"""
+数据库结构与迁移管理
+- 所有表结构集中在这里，按版本号顺序执行，执行记录保存在 schema_migrations 表
+- 兼容旧脚本（6.py / 7.py）建出的不一致表结构，缺失的列会补齐
+- 为热点查询建立二级索引，并提供基于 EXPLAIN 的全表扫描检查
+
+用法:
+    python migrations.py migrate   执行所有未执行的迁移
+    python migrations.py status    查看迁移状态
+    python migrations.py check     EXPLAIN检查热点查询，有全表扫描时返回非0
+"""
+import sys
+from datetime import datetime
+
+import pymysql
+
+# 数据库配置
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': '123456',
+    'database': 'flutterpage',
+    'charset': 'utf8mb4'
+}
+
+# 已注册的迁移：[(版本号, 说明, 函数)]
+MIGRATIONS = []
+
+# 已注册的热点查询：[(名称, SQL, 参数)]
+HOT_QUERIES = []
+
+
+def get_db_connection():
+    return pymysql.connect(**DB_CONFIG)
+
+
+def migration(version, description):
+    """注册一个迁移，函数接收游标作为参数"""
+
+    def decorator(func):
+        if any(v == version for v, _, _ in MIGRATIONS):
+            raise ValueError(f'迁移版本重复: {version}')
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return func
+
+    return decorator
+
+
+def register_hot_query(name, sql, params=()):
+    """注册需要走索引的热点查询，check_hot_queries 会逐条EXPLAIN"""
+    HOT_QUERIES.append((name, sql, tuple(params)))
+
+
+# ==================== 工具函数 ====================
+def column_exists(cursor, table, column):
+    cursor.execute("""
+        SELECT COUNT(*) AS count FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    """, (table, column))
+    return _first_value(cursor.fetchone()) > 0
+
+
+def index_exists(cursor, table, index):
+    cursor.execute("""
+        SELECT COUNT(*) AS count FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+    """, (table, index))
+    return _first_value(cursor.fetchone()) > 0
+
+
+def add_column_if_missing(cursor, table, column, definition):
+    if not column_exists(cursor, table, column):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def create_index_if_missing(cursor, table, index, columns, unique=False):
+    """MySQL不支持 CREATE INDEX IF NOT EXISTS，先查 information_schema"""
+    if not index_exists(cursor, table, index):
+        kind = 'UNIQUE INDEX' if unique else 'INDEX'
+        cursor.execute(f"CREATE {kind} {index} ON {table} ({columns})")
+
+
+def _first_value(row):
+    if isinstance(row, dict):
+        return next(iter(row.values()))
+    return row[0]
+
+
+# ==================== 迁移定义 ====================
+@migration(1, '创建基础表结构')
+def create_base_tables(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            User_id INT AUTO_INCREMENT PRIMARY KEY,
+            Username VARCHAR(50) NOT NULL UNIQUE,
+            Password VARCHAR(255),
+            Email VARCHAR(100),
+            Phone VARCHAR(20) DEFAULT '',
+            Created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS novels (
+            Novel_id INT AUTO_INCREMENT PRIMARY KEY,
+            Author_id INT,
+            Title VARCHAR(200) NOT NULL,
+            Description TEXT,
+            Cover_url VARCHAR(255),
+            Status ENUM('draft', 'review', 'published') DEFAULT 'draft',
+            Word_count INT NOT NULL DEFAULT 0,
+            Created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            Updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS chapters (
+            Chapter_id INT AUTO_INCREMENT PRIMARY KEY,
+            Novel_id INT NOT NULL,
+            Chapter_num INT NOT NULL,
+            Title VARCHAR(200) NOT NULL,
+            Content MEDIUMTEXT,
+            Word_count INT NOT NULL DEFAULT 0,
+            Created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            Updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS reading_records (
+            Record_id INT AUTO_INCREMENT PRIMARY KEY,
+            User_id INT NOT NULL,
+            Chapter_id INT NOT NULL,
+            Novel_id INT NOT NULL,
+            Progress INT NOT NULL DEFAULT 0,
+            Duration INT NOT NULL DEFAULT 0,
+            Last_read DATETIME DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS favorites (
+            Favorite_id INT AUTO_INCREMENT PRIMARY KEY,
+            Novel_id INT NOT NULL,
+            User_id INT NOT NULL,
+            Created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS comments (
+            Comment_id INT AUTO_INCREMENT PRIMARY KEY,
+            Novel_id INT NOT NULL,
+            User_id INT NOT NULL,
+            Content TEXT NOT NULL,
+            Parent_id INT NULL,
+            Created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            Updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+
+@migration(2, '补齐旧脚本建表缺失的列')
+def reconcile_legacy_columns(cursor):
+    # 6.py / 7.py 建出的users表没有密码和手机号
+    add_column_if_missing(cursor, 'users', 'Password', 'VARCHAR(255)')
+    add_column_if_missing(cursor, 'users', 'Phone', "VARCHAR(20) DEFAULT ''")
+
+    # 6.py 建出的novels表只有 Title/Author，没有 Author_id/Status/Word_count 等
+    add_column_if_missing(cursor, 'novels', 'Author_id', 'INT')
+    add_column_if_missing(cursor, 'novels', 'Description', 'TEXT')
+    add_column_if_missing(cursor, 'novels', 'Cover_url', 'VARCHAR(255)')
+    add_column_if_missing(cursor, 'novels', 'Status',
+                          "ENUM('draft', 'review', 'published') DEFAULT 'draft'")
+    add_column_if_missing(cursor, 'novels', 'Word_count', 'INT NOT NULL DEFAULT 0')
+    add_column_if_missing(cursor, 'novels', 'Updated_at',
+                          'DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP')
+
+    # 旧的 Author 文本列：能对应到用户名的回填为 Author_id
+    if column_exists(cursor, 'novels', 'Author'):
+        cursor.execute("""
+            UPDATE novels n JOIN users u ON n.Author = u.Username
+            SET n.Author_id = u.User_id
+            WHERE n.Author_id IS NULL
+        """)
+
+
+@migration(3, '为热点查询建立二级索引')
+def create_hot_indexes(cursor):
+    # 注册/登录按用户名、邮箱查询
+    create_index_if_missing(cursor, 'users', 'idx_users_email', 'Email')
+
+    # 作者作品列表按更新时间倒序；首页列表按创建时间倒序
+    create_index_if_missing(cursor, 'novels', 'idx_novels_author_updated', 'Author_id, Updated_at')
+    create_index_if_missing(cursor, 'novels', 'idx_novels_created', 'Created_at')
+
+    # 章节目录按章节号排序
+    create_index_if_missing(cursor, 'chapters', 'idx_chapters_novel_num', 'Novel_id, Chapter_num')
+
+    # 阅读记录按(用户, 章节)定位，继续阅读按最后阅读时间
+    create_index_if_missing(cursor, 'reading_records', 'idx_reading_user_chapter', 'User_id, Chapter_id')
+    create_index_if_missing(cursor, 'reading_records', 'idx_reading_user_last', 'User_id, Last_read')
+
+    # 是否已收藏、我的收藏列表、收藏数统计
+    create_index_if_missing(cursor, 'favorites', 'idx_favorites_user_novel', 'User_id, Novel_id')
+    create_index_if_missing(cursor, 'favorites', 'idx_favorites_user_created', 'User_id, Created_at')
+    create_index_if_missing(cursor, 'favorites', 'idx_favorites_novel', 'Novel_id')
+
+    # 顶级评论分页、回复列表、评论列表的ETag（COUNT/MAX(Updated_at)）
+    create_index_if_missing(cursor, 'comments', 'idx_comments_novel_parent_created',
+                            'Novel_id, Parent_id, Created_at')
+    create_index_if_missing(cursor, 'comments', 'idx_comments_parent_created', 'Parent_id, Created_at')
+    create_index_if_missing(cursor, 'comments', 'idx_comments_novel_updated', 'Novel_id, Updated_at')
+
+
+@migration(4, '章节草稿与增量版本表')
+def create_draft_tables(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS chapter_drafts (
+            Draft_id INT AUTO_INCREMENT PRIMARY KEY,
+            Novel_id INT NOT NULL,
+            Author_id INT NOT NULL,
+            Chapter_id INT NULL,
+            Chapter_num INT NULL,
+            Title VARCHAR(200) NOT NULL,
+            Version INT NOT NULL DEFAULT 1,
+            Published_version INT NULL,
+            Word_count INT NOT NULL DEFAULT 0,
+            Created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            Updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            INDEX idx_drafts_author_updated (Author_id, Updated_at)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+    # 快照存全文，差异存ops的JSON；按(草稿, 版本)主键顺序回放
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS draft_revisions (
+            Draft_id INT NOT NULL,
+            Version INT NOT NULL,
+            Is_snapshot TINYINT NOT NULL DEFAULT 0,
+            Body MEDIUMTEXT NOT NULL,
+            Created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (Draft_id, Version)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+
+def rebuild_reading_positions(cursor):
+    """按 reading_records 重新生成每个用户在每本小说的最后阅读位置"""
+    cursor.execute("""
+        INSERT INTO reading_positions (User_id, Novel_id, Chapter_id, Progress, Last_read)
+        SELECT r.User_id, r.Novel_id, r.Chapter_id, r.Progress, r.Last_read
+        FROM reading_records r
+        JOIN (
+            SELECT User_id, Novel_id, MAX(Last_read) AS Last_read
+            FROM reading_records
+            GROUP BY User_id, Novel_id
+        ) latest ON r.User_id = latest.User_id AND r.Novel_id = latest.Novel_id
+                AND r.Last_read = latest.Last_read
+        ON DUPLICATE KEY UPDATE
+            Chapter_id = VALUES(Chapter_id),
+            Progress = VALUES(Progress),
+            Last_read = VALUES(Last_read)
+    """)
+
+
+@migration(5, '继续阅读索引表（每个用户每本小说的最后阅读位置）')
+def create_reading_positions(cursor):
+    # 主键保证每本小说一行；(User_id, Last_read) 覆盖索引支撑首页“最近阅读”的范围读
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS reading_positions (
+            User_id INT NOT NULL,
+            Novel_id INT NOT NULL,
+            Chapter_id INT NOT NULL,
+            Progress INT NOT NULL DEFAULT 0,
+            Last_read DATETIME NOT NULL,
+            PRIMARY KEY (User_id, Novel_id),
+            INDEX idx_positions_user_last (User_id, Last_read, Chapter_id, Progress)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+    rebuild_reading_positions(cursor)
+
+
+@migration(6, '小说分类与标签（分面筛选）')
+def create_novel_facets(cursor):
+    add_column_if_missing(cursor, 'novels', 'Category', 'VARCHAR(50) NULL')
+    create_index_if_missing(cursor, 'novels', 'idx_novels_category', 'Category')
+
+    # 每本小说的标签；(Tag, Novel_id) 用于按标签反查
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS novel_tags (
+            Novel_id INT NOT NULL,
+            Tag VARCHAR(50) NOT NULL,
+            PRIMARY KEY (Novel_id, Tag),
+            INDEX idx_novel_tags_tag (Tag, Novel_id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+    # 分面索引按 Updated_at 增量拉取
+    create_index_if_missing(cursor, 'novels', 'idx_novels_updated', 'Updated_at')
+
+
+@migration(7, '用户状态与管理后台（封禁、检索、审计日志）')
+def create_admin_tables(cursor):
+    add_column_if_missing(cursor, 'users', 'Is_admin', 'TINYINT NOT NULL DEFAULT 0')
+    add_column_if_missing(cursor, 'users', 'Status', "ENUM('active', 'banned') NOT NULL DEFAULT 'active'")
+    add_column_if_missing(cursor, 'users', 'Banned_at', 'DATETIME NULL')
+    add_column_if_missing(cursor, 'users', 'Ban_reason', 'VARCHAR(255) NULL')
+
+    # 后台用户列表按注册时间倒序，(Created_at, User_id) 支撑日期筛选和键集分页
+    create_index_if_missing(cursor, 'users', 'idx_users_created', 'Created_at, User_id')
+    # 用户名/邮箱子串搜索：ngram全文索引（MySQL 5.7.6+），不做全表扫描
+    if not index_exists(cursor, 'users', 'ft_users_search'):
+        cursor.execute("ALTER TABLE users ADD FULLTEXT INDEX ft_users_search (Username, Email) WITH PARSER ngram")
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS admin_audit_log (
+            Audit_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            Admin_id INT NOT NULL,
+            Action VARCHAR(50) NOT NULL,
+            Target_type VARCHAR(50) NOT NULL,
+            Target_ids TEXT NOT NULL,
+            Detail TEXT NULL,
+            Created_at DATETIME NOT NULL,
+            INDEX idx_audit_admin (Admin_id, Audit_id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+
+@migration(8, '平台每日指标计数（管理后台看板）')
+def create_daily_metrics(cursor):
+    # 主键 (Metric, Metric_date, Dimension)：看板按指标和日期区间读取
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS daily_metrics (
+            Metric VARCHAR(32) NOT NULL,
+            Metric_date DATE NOT NULL,
+            Dimension VARCHAR(50) NOT NULL DEFAULT '',
+            Value INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (Metric, Metric_date, Dimension)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+    # 用已有数据回填，之后由注册/发布时的计数器和每晚对账维护
+    cursor.execute("""
+        INSERT IGNORE INTO daily_metrics (Metric, Metric_date, Dimension, Value)
+        SELECT 'new_users', DATE(Created_at), '', COUNT(*) FROM users
+        WHERE Created_at IS NOT NULL GROUP BY DATE(Created_at)
+    """)
+    cursor.execute("""
+        INSERT IGNORE INTO daily_metrics (Metric, Metric_date, Dimension, Value)
+        SELECT 'new_novels', DATE(Created_at), COALESCE(Category, ''), COUNT(*) FROM novels
+        WHERE Created_at IS NOT NULL GROUP BY DATE(Created_at), COALESCE(Category, '')
+    """)
+
+
+@migration(9, '作者收入账本（复式记账、余额快照、提现）')
+def create_income_ledger(cursor):
+    # 每个账户的余额快照；Version 用于乐观并发
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ledger_accounts (
+            Account_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            Owner_type VARCHAR(16) NOT NULL,
+            Owner_id INT NOT NULL,
+            Account_type VARCHAR(32) NOT NULL,
+            Balance BIGINT NOT NULL DEFAULT 0,
+            Total_income BIGINT NOT NULL DEFAULT 0,
+            Version INT NOT NULL DEFAULT 0,
+            Updated_at DATETIME NOT NULL,
+            UNIQUE KEY uk_ledger_owner (Owner_type, Owner_id, Account_type)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ledger_transactions (
+            Txn_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            Txn_type VARCHAR(32) NOT NULL,
+            Idempotency_key VARCHAR(100) NULL,
+            Created_at DATETIME NOT NULL,
+            UNIQUE KEY uk_ledger_idempotency (Idempotency_key)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+    # 分录只追加；(Account_id, Entry_id) 支撑流水键集分页，(Account_id, Biz_date) 支撑按日统计
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ledger_entries (
+            Entry_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            Txn_id BIGINT NOT NULL,
+            Account_id BIGINT NOT NULL,
+            Entry_type VARCHAR(32) NOT NULL,
+            Amount BIGINT NOT NULL,
+            Balance_after BIGINT NOT NULL,
+            Novel_id INT NULL,
+            Biz_date DATE NOT NULL,
+            Memo VARCHAR(255) NULL,
+            Created_at DATETIME NOT NULL,
+            INDEX idx_entries_account (Account_id, Entry_id),
+            INDEX idx_entries_account_type (Account_id, Entry_type, Entry_id),
+            INDEX idx_entries_account_date (Account_id, Biz_date),
+            INDEX idx_entries_txn (Txn_id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS withdrawals (
+            Withdrawal_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            Author_id INT NOT NULL,
+            Request_key VARCHAR(64) NOT NULL,
+            Amount BIGINT NOT NULL,
+            Fee BIGINT NOT NULL,
+            Method VARCHAR(16) NOT NULL,
+            Status ENUM('pending', 'completed', 'failed') NOT NULL DEFAULT 'pending',
+            Txn_id BIGINT NOT NULL,
+            Settle_txn_id BIGINT NULL,
+            Created_at DATETIME NOT NULL,
+            Updated_at DATETIME NOT NULL,
+            UNIQUE KEY uk_withdraw_request (Author_id, Request_key),
+            INDEX idx_withdraw_author (Author_id, Withdrawal_id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+
+def backfill_comment_moderation(cursor):
+    """
+    按 comments 重新回填评论归属作者、回复数、作者已回复和每位作者的计数
+    已有评论视为已读，避免上线时未读数暴涨
+    """
+    cursor.execute("""
+        UPDATE comments c JOIN novels n ON n.Novel_id = c.Novel_id
+        SET c.Novel_author_id = n.Author_id, c.Is_read = 1, c.Updated_at = c.Updated_at
+        WHERE c.Parent_id IS NULL AND c.User_id <> n.Author_id
+    """)
+    cursor.execute("""
+        UPDATE comments c
+        JOIN (SELECT Parent_id, COUNT(*) AS replies FROM comments
+              WHERE Parent_id IS NOT NULL GROUP BY Parent_id) r ON r.Parent_id = c.Comment_id
+        SET c.Reply_count = r.replies, c.Updated_at = c.Updated_at
+    """)
+    cursor.execute("""
+        UPDATE comments c
+        JOIN (SELECT DISTINCT Parent_id, User_id FROM comments WHERE Parent_id IS NOT NULL) r
+          ON r.Parent_id = c.Comment_id AND r.User_id = c.Novel_author_id
+        SET c.Author_replied = 1, c.Updated_at = c.Updated_at
+    """)
+    cursor.execute("""
+        INSERT INTO author_comment_counters (Author_id, Unread, Unreplied, Total, Updated_at)
+        SELECT Novel_author_id, 0, SUM(Author_replied = 0), COUNT(*), NOW() FROM comments
+        WHERE Novel_author_id IS NOT NULL GROUP BY Novel_author_id
+        ON DUPLICATE KEY UPDATE Unread = VALUES(Unread), Unreplied = VALUES(Unreplied),
+                                Total = VALUES(Total), Updated_at = VALUES(Updated_at)
+    """)
+
+
+@migration(10, '作者评论管理（评论归属作者、已读/回复状态、未读计数）')
+def create_comment_moderation(cursor):
+    # 读者顶层评论所属作品的作者；作者回复和回复的回复为 NULL
+    add_column_if_missing(cursor, 'comments', 'Novel_author_id', 'INT NULL')
+    add_column_if_missing(cursor, 'comments', 'Is_read', 'TINYINT NOT NULL DEFAULT 0')
+    add_column_if_missing(cursor, 'comments', 'Author_replied', 'TINYINT NOT NULL DEFAULT 0')
+    add_column_if_missing(cursor, 'comments', 'Reply_count', 'INT NOT NULL DEFAULT 0')
+    add_column_if_missing(cursor, 'comments', 'Sentiment', 'VARCHAR(10) NULL')
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS author_comment_counters (
+            Author_id INT PRIMARY KEY,
+            Unread INT NOT NULL DEFAULT 0,
+            Unreplied INT NOT NULL DEFAULT 0,
+            Total INT NOT NULL DEFAULT 0,
+            Updated_at DATETIME NOT NULL
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+    # 先回填再建索引，回填时不必维护这些索引
+    backfill_comment_moderation(cursor)
+
+    # 作者评论管理的筛选都以 Novel_author_id 开头，末尾的 Comment_id 用于键集分页
+    create_index_if_missing(cursor, 'comments', 'idx_comments_author', 'Novel_author_id, Comment_id')
+    create_index_if_missing(cursor, 'comments', 'idx_comments_author_novel',
+                            'Novel_author_id, Novel_id, Comment_id')
+    create_index_if_missing(cursor, 'comments', 'idx_comments_author_read',
+                            'Novel_author_id, Is_read, Comment_id')
+    create_index_if_missing(cursor, 'comments', 'idx_comments_author_replied',
+                            'Novel_author_id, Author_replied, Comment_id')
+    create_index_if_missing(cursor, 'comments', 'idx_comments_author_sentiment',
+                            'Novel_author_id, Sentiment, Comment_id')
+    create_index_if_missing(cursor, 'comments', 'idx_comments_author_replies',
+                            'Novel_author_id, Reply_count, Comment_id')
+
+
+@migration(11, '评论情感与垃圾评论打分结果')
+def create_comment_scores(cursor):
+    add_column_if_missing(cursor, 'comments', 'Sentiment_score', 'FLOAT NULL')
+    add_column_if_missing(cursor, 'comments', 'Spam_score', 'FLOAT NULL')
+    add_column_if_missing(cursor, 'comments', 'Is_spam', 'TINYINT NOT NULL DEFAULT 0')
+    add_column_if_missing(cursor, 'comments', 'Scored_at', 'DATETIME NULL')
+
+    # 巡检补扫：Scored_at IS NULL 按 Comment_id 顺序读取；按情感筛选走迁移10的 idx_comments_author_sentiment
+    create_index_if_missing(cursor, 'comments', 'idx_comments_scored', 'Scored_at, Comment_id')
+
+
+# ==================== 热点查询 ====================
+register_hot_query('users.by_username', "SELECT * FROM users WHERE Username = %s", ('test_user',))
+register_hot_query('users.by_email', "SELECT * FROM users WHERE Email = %s", ('test@example.com',))
+register_hot_query('novels.by_author',
+                   "SELECT * FROM novels WHERE Author_id = %s ORDER BY Updated_at DESC LIMIT 10", (1,))
+register_hot_query('chapters.by_novel', """
+    SELECT Chapter_id, Novel_id, Chapter_num, Title, Word_count, Created_at, Updated_at
+    FROM chapters WHERE Novel_id = %s ORDER BY Chapter_num ASC
+""", (1,))
+register_hot_query('chapters.count_by_novel', "SELECT COUNT(*) FROM chapters WHERE Novel_id = %s", (1,))
+register_hot_query('reading.by_user_chapter',
+                   "SELECT * FROM reading_records WHERE User_id = %s AND Chapter_id = %s", (1, 1))
+register_hot_query('favorites.by_user_novel',
+                   "SELECT * FROM favorites WHERE User_id = %s AND Novel_id = %s", (1, 1))
+register_hot_query('favorites.by_user', """
+    SELECT * FROM favorites WHERE User_id = %s ORDER BY Created_at DESC LIMIT 10
+""", (1,))
+register_hot_query('favorites.count_by_novel', "SELECT COUNT(*) FROM favorites WHERE Novel_id = %s", (1,))
+register_hot_query('comments.top_level', """
+    SELECT * FROM comments WHERE Novel_id = %s AND Parent_id IS NULL
+    ORDER BY Created_at DESC LIMIT 20
+""", (1,))
+register_hot_query('comments.replies',
+                   "SELECT * FROM comments WHERE Parent_id = %s ORDER BY Created_at ASC", (1,))
+register_hot_query('comments.version', """
+    SELECT COUNT(*), MAX(Updated_at) FROM comments WHERE Novel_id = %s
+""", (1,))
+register_hot_query('reading.continue', """
+    SELECT Novel_id, Chapter_id, Progress, Last_read FROM reading_positions
+    WHERE User_id = %s ORDER BY Last_read DESC LIMIT 5
+""", (1,))
+register_hot_query('reading.history', """
+    SELECT Novel_id, Chapter_id, Progress, Duration, Last_read FROM reading_records
+    WHERE User_id = %s AND Last_read >= %s ORDER BY Last_read DESC LIMIT 100
+""", (1, '2024-01-01'))
+register_hot_query('drafts.by_author', """
+    SELECT * FROM chapter_drafts WHERE Author_id = %s ORDER BY Updated_at DESC LIMIT 20
+""", (1,))
+register_hot_query('drafts.snapshot', """
+    SELECT Version, Body FROM draft_revisions
+    WHERE Draft_id = %s AND Version <= %s AND Is_snapshot = 1
+    ORDER BY Version DESC LIMIT 1
+""", (1, 1))
+register_hot_query('novels.updated_since', """
+    SELECT Novel_id FROM novels WHERE Updated_at >= %s
+""", ('2024-01-01',))
+register_hot_query('novel_tags.by_tag', "SELECT Novel_id FROM novel_tags WHERE Tag = %s", ('玄幻',))
+register_hot_query('admin.users_by_created', """
+    SELECT User_id FROM users
+    WHERE Created_at < %s OR (Created_at = %s AND User_id < %s)
+    ORDER BY Created_at DESC, User_id DESC LIMIT 21
+""", ('2024-01-01', '2024-01-01', 1))
+register_hot_query('admin.users_prefix', """
+    SELECT User_id FROM users WHERE Username LIKE %s OR Email LIKE %s
+""", ('test%', 'test%'))
+register_hot_query('admin.users_substring', """
+    SELECT User_id FROM users WHERE MATCH(Username, Email) AGAINST (%s IN BOOLEAN MODE)
+""", ('"test"',))
+register_hot_query('metrics.window', """
+    SELECT Metric, Metric_date, Dimension, Value FROM daily_metrics
+    WHERE Metric IN ('new_users', 'new_novels', 'active_users') AND Metric_date >= %s AND Metric_date <= %s
+""", ('2024-01-01', '2024-01-31'))
+register_hot_query('ledger.entries_by_account', """
+    SELECT * FROM ledger_entries WHERE Account_id = %s AND Entry_id < %s ORDER BY Entry_id DESC LIMIT 20
+""", (1, 1000))
+register_hot_query('ledger.withdrawals_by_author', """
+    SELECT * FROM withdrawals WHERE Author_id = %s ORDER BY Withdrawal_id DESC LIMIT 20
+""", (1,))
+register_hot_query('comments.by_author', """
+    SELECT Comment_id FROM comments WHERE Novel_author_id = %s AND Comment_id < %s
+    ORDER BY Comment_id DESC LIMIT 21
+""", (1, 1000))
+register_hot_query('comments.author_unreplied', """
+    SELECT Comment_id FROM comments WHERE Novel_author_id = %s AND Author_replied = 0
+    ORDER BY Comment_id DESC LIMIT 21
+""", (1,))
+register_hot_query('comments.unscored', """
+    SELECT Comment_id, Content FROM comments WHERE Scored_at IS NULL AND Comment_id > %s
+    ORDER BY Comment_id LIMIT 200
+""", (0,))
+register_hot_query('comments.author_sentiment', """
+    SELECT Comment_id FROM comments WHERE Novel_author_id = %s AND Sentiment = %s
+    ORDER BY Comment_id DESC LIMIT 21
+""", (1, 'negative'))
+
+
+# ==================== 执行与检查 ====================
+def ensure_migrations_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            Version INT PRIMARY KEY,
+            Description VARCHAR(255),
+            Applied_at DATETIME
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+
+def applied_versions(cursor):
+    ensure_migrations_table(cursor)
+    cursor.execute("SELECT Version FROM schema_migrations")
+    return {_first_value(row) for row in cursor.fetchall()}
+
+
+def migrate(conn, target=None):
+    """执行所有未执行的迁移（可指定目标版本），返回本次执行的版本号列表"""
+    cursor = conn.cursor()
+    executed = []
+
+    try:
+        done = applied_versions(cursor)
+        conn.commit()
+
+        for version, description, func in MIGRATIONS:
+            if version in done:
+                continue
+            if target is not None and version > target:
+                break
+
+            print(f"⏳ 执行迁移 {version}: {description}")
+            func(cursor)
+            cursor.execute("""
+                INSERT INTO schema_migrations (Version, Description, Applied_at)
+                VALUES (%s, %s, %s)
+            """, (version, description, datetime.now()))
+            conn.commit()
+            executed.append(version)
+
+        return executed
+
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def check_hot_queries(conn):
+    """
+    对每条热点查询执行EXPLAIN，type为ALL（全表扫描）的记为问题
+    返回 [(名称, 表名, EXPLAIN行)]，空列表表示全部通过
+    """
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    problems = []
+
+    try:
+        for name, sql, params in HOT_QUERIES:
+            cursor.execute("EXPLAIN " + sql, params)
+            for row in cursor.fetchall():
+                if (row.get('type') or '').upper() == 'ALL':
+                    problems.append((name, row.get('table'), row))
+        return problems
+    finally:
+        cursor.close()
+
+
+def print_status(conn):
+    cursor = conn.cursor()
+    try:
+        done = applied_versions(cursor)
+        conn.commit()
+    finally:
+        cursor.close()
+
+    for version, description, _ in MIGRATIONS:
+        mark = '✅' if version in done else '⬜'
+        print(f"{mark} {version:>3}  {description}")
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'migrate'
+    conn = get_db_connection()
+
+    try:
+        if command == 'migrate':
+            executed = migrate(conn)
+            print(f"✅ 迁移完成，本次执行 {len(executed)} 个")
+        elif command == 'status':
+            print_status(conn)
+        elif command == 'check':
+            problems = check_hot_queries(conn)
+            for name, table, row in problems:
+                print(f"❌ {name}: 表 {table} 全表扫描 (rows={row.get('rows')})")
+            if problems:
+                sys.exit(1)
+            print(f"✅ {len(HOT_QUERIES)} 条热点查询均使用索引")
+        else:
+            print(f"未知命令: {command}")
+            sys.exit(2)
+    finally:
+        conn.close()
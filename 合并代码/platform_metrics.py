@@ -0,0 +1,252 @@
+# platform_metrics.py
+"""
+平台运营指标（管理后台的用户增长、作品分类分布）
+- daily_metrics 表按 (指标, 日期, 维度) 保存每日计数，注册、发布作品时在同一事务里 +1
+- 后台图表一次查询读取预聚合的序列，不再对 users / novels 做 GROUP BY DATE(Created_at)
+- 每晚对账：用源表重算指定日期的计数覆盖计数器（修正直接改库、回滚等造成的偏差），
+  活跃用户数由阅读事件分区统计
+- 看板结果在进程内缓存 DASHBOARD_TTL 秒
+
+用法:
+    python platform_metrics.py reconcile [YYYY-MM-DD]   重算指定日期（默认昨天）
+    python platform_metrics.py reconcile --days N       重算最近N天（不含今天）
+    python platform_metrics.py reconcile --all          重算全部历史
+"""
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import pymysql
+
+from async_log import get_logger
+import reading_events
+
+# 指标名称
+NEW_USERS = 'new_users'
+NEW_NOVELS = 'new_novels'
+ACTIVE_USERS = 'active_users'
+
+# 累计型指标（总数 = 历史每日新增之和）
+CUMULATIVE = (NEW_USERS, NEW_NOVELS)
+
+# 无分类的作品在图表中的名称
+UNCATEGORIZED = '未分类'
+
+# 看板缓存时间（秒）与最大天数
+DASHBOARD_TTL = 60
+MAX_DAYS = 365
+
+logger = get_logger('platform_metrics')
+
+# (days, end) -> (时间, 结果)
+_dashboard_cache = {}
+_cache_lock = threading.Lock()
+
+
+def increment(cursor, metric, dimension='', day=None, delta=1):
+    """
+    在调用方的事务里累加当天计数，随业务数据一起提交或回滚
+    dimension: 维度取值（如作品分类），没有维度时为空字符串
+    """
+    cursor.execute("""
+        INSERT INTO daily_metrics (Metric, Metric_date, Dimension, Value)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE Value = Value + VALUES(Value)
+    """, (metric, day or date.today(), dimension or '', delta))
+
+
+# ==================== 对账 ====================
+def reconcile(conn, start, end):
+    """
+    用源表重算 [start, end) 的每日计数并覆盖原值，返回写入的行数
+    今天的计数仍在累加中，调用方一般传 end=今天
+    """
+    cursor = conn.cursor()
+    start_at = datetime.combine(start, datetime.min.time())
+    end_at = datetime.combine(end, datetime.min.time())
+
+    try:
+        cursor.execute("""
+            DELETE FROM daily_metrics
+            WHERE Metric IN (%s, %s) AND Metric_date >= %s AND Metric_date < %s
+        """, (NEW_USERS, NEW_NOVELS, start, end))
+
+        # 按 Created_at 范围读取，走 idx_users_created / idx_novels_created
+        cursor.execute("""
+            INSERT INTO daily_metrics (Metric, Metric_date, Dimension, Value)
+            SELECT %s, DATE(Created_at), '', COUNT(*) FROM users
+            WHERE Created_at >= %s AND Created_at < %s
+            GROUP BY DATE(Created_at)
+        """, (NEW_USERS, start_at, end_at))
+        written = cursor.rowcount
+
+        cursor.execute("""
+            INSERT INTO daily_metrics (Metric, Metric_date, Dimension, Value)
+            SELECT %s, DATE(Created_at), COALESCE(Category, ''), COUNT(*) FROM novels
+            WHERE Created_at >= %s AND Created_at < %s
+            GROUP BY DATE(Created_at), COALESCE(Category, '')
+        """, (NEW_NOVELS, start_at, end_at))
+        written += cursor.rowcount
+
+        # 活跃用户：当天有阅读事件的不同用户数
+        active = []
+        day = start
+        while day < end:
+            users = reading_events.load_partition(day)['user']
+            if len(users):
+                active.append((ACTIVE_USERS, day, '', len(set(users.tolist()))))
+            day += timedelta(days=1)
+        if active:
+            cursor.executemany("""
+                REPLACE INTO daily_metrics (Metric, Metric_date, Dimension, Value)
+                VALUES (%s, %s, %s, %s)
+            """, active)
+            written += len(active)
+
+        conn.commit()
+        with _cache_lock:
+            _dashboard_cache.clear()
+        return written
+
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def first_day(conn):
+    """最早的注册/发布日期，没有数据时为今天"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT LEAST(COALESCE((SELECT MIN(Created_at) FROM users), NOW()),
+                         COALESCE((SELECT MIN(Created_at) FROM novels), NOW()))
+        """)
+        value = cursor.fetchone()[0]
+        return value.date() if isinstance(value, datetime) else date.today()
+    finally:
+        cursor.close()
+
+
+# ==================== 看板 ====================
+def _load_rows(conn, start, end):
+    """窗口内的每日计数 + 窗口之前各维度的累计值（Metric_date 为 NULL），一次查询"""
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    try:
+        cursor.execute("""
+            SELECT Metric, Metric_date, Dimension, Value FROM daily_metrics
+            WHERE Metric IN (%s, %s, %s) AND Metric_date >= %s AND Metric_date <= %s
+            UNION ALL
+            SELECT Metric, NULL, Dimension, SUM(Value) FROM daily_metrics
+            WHERE Metric IN (%s, %s) AND Metric_date < %s
+            GROUP BY Metric, Dimension
+        """, (NEW_USERS, NEW_NOVELS, ACTIVE_USERS, start, end, NEW_USERS, NEW_NOVELS, start))
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def build_dashboard(rows, start, end):
+    """把查询结果整理成按天补零的序列和分类分布"""
+    dates = []
+    day = start
+    while day <= end:
+        dates.append(day)
+        day += timedelta(days=1)
+    index = {d: i for i, d in enumerate(dates)}
+
+    daily = {metric: [0] * len(dates) for metric in (NEW_USERS, NEW_NOVELS, ACTIVE_USERS)}
+    base = {metric: 0 for metric in CUMULATIVE}
+    categories = {}
+
+    for row in rows:
+        metric, value = row['Metric'], int(row['Value'])
+        if metric == NEW_NOVELS:
+            name = row['Dimension'] or UNCATEGORIZED
+            categories[name] = categories.get(name, 0) + value
+        if row['Metric_date'] is None:
+            base[metric] += value
+        else:
+            daily[metric][index[row['Metric_date']]] += value
+
+    def cumulative(metric):
+        totals, total = [], base[metric]
+        for value in daily[metric]:
+            total += value
+            totals.append(total)
+        return totals
+
+    return {
+        'dates': [d.isoformat() for d in dates],
+        'user_growth': {
+            'new_users': daily[NEW_USERS],
+            'total_users': cumulative(NEW_USERS),
+            'active_users': daily[ACTIVE_USERS]
+        },
+        'novel_growth': {
+            'new_novels': daily[NEW_NOVELS],
+            'total_novels': cumulative(NEW_NOVELS)
+        },
+        'categories': [{'category': name, 'count': count}
+                       for name, count in sorted(categories.items(), key=lambda item: (-item[1], item[0]))]
+    }
+
+
+def get_dashboard(connect, days=30, end=None):
+    """最近 days 天（含 end 当天，默认今天）的看板数据"""
+    days = max(1, min(int(days), MAX_DAYS))
+    end = end or date.today()
+    key = (days, end)
+    now = time.time()
+
+    cached = _dashboard_cache.get(key)
+    if cached is not None and now - cached[0] < DASHBOARD_TTL:
+        return cached[1]
+
+    start = end - timedelta(days=days - 1)
+    conn = connect()
+    try:
+        rows = _load_rows(conn, start, end)
+    finally:
+        conn.close()
+
+    dashboard = build_dashboard(rows, start, end)
+    with _cache_lock:
+        # 过期的日期不会再被访问，顺手清掉
+        for old in [k for k, (t, _) in _dashboard_cache.items() if now - t >= DASHBOARD_TTL]:
+            del _dashboard_cache[old]
+        _dashboard_cache[key] = (now, dashboard)
+    return dashboard
+
+
+def main(argv):
+    if len(argv) < 2 or argv[1] != 'reconcile':
+        print(__doc__)
+        return 1
+
+    from migrations import get_db_connection
+
+    today = date.today()
+    conn = get_db_connection()
+    try:
+        if len(argv) > 2 and argv[2] == '--all':
+            start, end = first_day(conn), today
+        elif len(argv) > 3 and argv[2] == '--days':
+            start, end = today - timedelta(days=int(argv[3])), today
+        else:
+            start = date.fromisoformat(argv[2]) if len(argv) > 2 else today - timedelta(days=1)
+            end = start + timedelta(days=1)
+
+        started = time.perf_counter()
+        written = reconcile(conn, start, end)
+        print(f"✅ {start.isoformat()} ~ {(end - timedelta(days=1)).isoformat()}: "
+              f"写入 {written} 行，{(time.perf_counter() - started) * 1000:.1f} ms")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,349 @@
+# query_profiler.py
+"""
+SQL查询性能分析
+- ProfiledConnection 替代 pymysql.connect，创建的游标会记录每条SQL的耗时、返回行数和调用端点
+- SQL归一化为指纹（参数和字面量替换为?），按 (端点, 指纹) 维护HDR风格的延迟直方图
+- 同一请求内同一指纹执行超过 N_PLUS_ONE_THRESHOLD 次记为N+1查询
+- /metrics 输出Prometheus文本格式（含 json_response 的编码统计），每个响应带 Server-Timing 头
+"""
+import math
+import re
+import threading
+import time
+from collections import deque
+
+import pymysql
+from flask import Response, g, has_request_context, request
+
+from async_log import get_logger
+from json_response import get_encode_stats
+
+# 慢查询阈值（毫秒）
+SLOW_QUERY_MS = 100
+
+# 同一请求内同一指纹执行次数超过该值视为N+1
+N_PLUS_ONE_THRESHOLD = 5
+
+# 保留最近的慢查询
+SLOW_QUERY_LOG_SIZE = 100
+
+# 直方图导出的分位数
+EXPORT_QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+
+# ==================== SQL指纹 ====================
+_COMMENT_RE = re.compile(r'/\*.*?\*/|--[^\n]*', re.S)
+_STRING_RE = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_PARAM_RE = re.compile(r'%\([^)]+\)s|%s')
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_VALUES_RE = re.compile(r'(VALUES\s*)\(\?\+\)(?:\s*,\s*\(\?\+\))*', re.I)
+_SPACE_RE = re.compile(r'\s+')
+
+_fingerprint_cache = {}
+# 只缓存较短的SQL：批量INSERT展开后的语句可达数MB，且每批不同，缓存只会占内存
+FINGERPRINT_CACHE_SIZE = 10000
+MAX_CACHED_SQL_LENGTH = 4096
+
+
+def fingerprint(sql):
+    """把SQL归一化为指纹：去注释、参数和字面量替换为?、IN列表折叠、空白压缩"""
+    cached = _fingerprint_cache.get(sql)
+    if cached is not None:
+        return cached
+
+    fp = _COMMENT_RE.sub(' ', sql)
+    fp = _STRING_RE.sub('?', fp)
+    fp = _PARAM_RE.sub('?', fp)
+    fp = _NUMBER_RE.sub('?', fp)
+    fp = _SPACE_RE.sub(' ', fp).strip()
+    fp = _IN_LIST_RE.sub('(?+)', fp)
+    fp = _VALUES_RE.sub(r'\1(?+)', fp)
+
+    if len(sql) <= MAX_CACHED_SQL_LENGTH and len(_fingerprint_cache) < FINGERPRINT_CACHE_SIZE:
+        _fingerprint_cache[sql] = fp
+    return fp
+
+
+# ==================== 延迟直方图 ====================
+class LatencyHistogram:
+    """
+    HDR风格对数-线性直方图（单位微秒）
+    每个2的幂区间再线性划分 SUB_BUCKETS 个子桶，相对误差约 1/SUB_BUCKETS
+    """
+    SUB_BUCKETS = 32
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def _index(self, micros):
+        micros = int(micros)
+        if micros < self.SUB_BUCKETS:
+            return micros
+        exponent = micros.bit_length() - self.SUB_BUCKETS.bit_length()
+        return (exponent + 1) * self.SUB_BUCKETS + (micros >> exponent) - self.SUB_BUCKETS
+
+    def _upper_bound(self, index):
+        if index < self.SUB_BUCKETS:
+            return index + 1
+        exponent = index // self.SUB_BUCKETS - 1
+        mantissa = index % self.SUB_BUCKETS + self.SUB_BUCKETS
+        return (mantissa + 1) << exponent
+
+    def record(self, seconds):
+        micros = max(0.0, seconds * 1e6)
+        index = self._index(micros)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q):
+        """返回分位数（秒），取所在桶的上界"""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self._upper_bound(index) / 1e6, self.max)
+        return self.max
+
+
+# ==================== 全局统计 ====================
+# (端点, 指纹) -> {'hist': LatencyHistogram, 'rows': 行数合计}
+query_stats = {}
+# (端点, 指纹) -> N+1 次数
+n_plus_one_stats = {}
+# 端点 -> 慢查询次数
+slow_query_counts = {}
+slow_query_log = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+_stats_lock = threading.Lock()
+
+logger = get_logger('sql')
+
+
+def _current_endpoint():
+    if has_request_context():
+        return request.endpoint or 'unknown'
+    return 'background'
+
+
+def record_query(sql, elapsed, rows):
+    """记录一次查询，游标在每次execute后调用"""
+    endpoint = _current_endpoint()
+    fp = fingerprint(sql if isinstance(sql, str) else sql.decode('utf-8', 'replace'))
+
+    slow = elapsed * 1000 >= SLOW_QUERY_MS
+
+    with _stats_lock:
+        stats = query_stats.get((endpoint, fp))
+        if stats is None:
+            stats = query_stats[(endpoint, fp)] = {'hist': LatencyHistogram(), 'rows': 0}
+        stats['hist'].record(elapsed)
+        stats['rows'] += max(rows, 0)
+
+        if slow:
+            slow_query_counts[endpoint] = slow_query_counts.get(endpoint, 0) + 1
+            slow_query_log.append({
+                'endpoint': endpoint,
+                'fingerprint': fp,
+                'ms': round(elapsed * 1000, 3),
+                'rows': rows,
+                'time': time.time()
+            })
+
+    if slow:
+        logger.warning('慢查询', endpoint=endpoint, fingerprint=fp,
+                       ms=round(elapsed * 1000, 3), rows=rows)
+
+    if has_request_context():
+        queries = g.setdefault('profiled_queries', [])
+        queries.append((fp, elapsed, rows))
+
+
+# ==================== 游标与连接 ====================
+class ProfilingCursorMixin:
+    """
+    在execute/executemany外层计时
+    pymysql的executemany内部会调用execute，批量执行期间内层调用不再记录，
+    整批按未展开的SQL模板记录一次
+    """
+    _in_executemany = False
+
+    def execute(self, query, args=None):
+        if self._in_executemany:
+            return super().execute(query, args)
+        start = time.perf_counter()
+        try:
+            return super().execute(query, args)
+        finally:
+            record_query(query, time.perf_counter() - start, self.rowcount)
+
+    def executemany(self, query, args):
+        start = time.perf_counter()
+        self._in_executemany = True
+        try:
+            return super().executemany(query, args)
+        finally:
+            self._in_executemany = False
+            record_query(query, time.perf_counter() - start, self.rowcount)
+
+
+class ProfiledCursor(ProfilingCursorMixin, pymysql.cursors.Cursor):
+    pass
+
+
+class ProfiledDictCursor(ProfilingCursorMixin, pymysql.cursors.DictCursor):
+    pass
+
+
+class ProfiledSSCursor(ProfilingCursorMixin, pymysql.cursors.SSCursor):
+    pass
+
+
+class ProfiledSSDictCursor(ProfilingCursorMixin, pymysql.cursors.SSDictCursor):
+    pass
+
+
+PROFILED_CURSORS = {
+    pymysql.cursors.Cursor: ProfiledCursor,
+    pymysql.cursors.DictCursor: ProfiledDictCursor,
+    pymysql.cursors.SSCursor: ProfiledSSCursor,
+    pymysql.cursors.SSDictCursor: ProfiledSSDictCursor
+}
+
+
+class ProfiledConnection(pymysql.connections.Connection):
+    """conn.cursor(pymysql.cursors.DictCursor) 等调用自动换成带计时的游标"""
+
+    def cursor(self, cursor=None):
+        cursor = cursor or self.cursorclass
+        return super().cursor(PROFILED_CURSORS.get(cursor, cursor))
+
+
+def connect(**kwargs):
+    """替代 pymysql.connect"""
+    return ProfiledConnection(**kwargs)
+
+
+# ==================== 请求钩子与导出 ====================
+def _append_server_timing(response, entry):
+    existing = response.headers.get('Server-Timing')
+    response.headers['Server-Timing'] = f'{existing}, {entry}' if existing else entry
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_metrics():
+    """生成Prometheus文本格式的指标"""
+    lines = [
+        '# HELP flutterpage_db_query_seconds SQL查询耗时',
+        '# TYPE flutterpage_db_query_seconds summary'
+    ]
+    with _stats_lock:
+        snapshot = [(key, stats['hist'], stats['rows']) for key, stats in query_stats.items()]
+        n_plus_one = dict(n_plus_one_stats)
+        slow = dict(slow_query_counts)
+
+        for (endpoint, fp), hist, _ in snapshot:
+            labels = f'endpoint="{_escape_label(endpoint)}",fingerprint="{_escape_label(fp)}"'
+            for q in EXPORT_QUANTILES:
+                lines.append(f'flutterpage_db_query_seconds{{{labels},quantile="{q}"}} {hist.percentile(q):.6f}')
+            lines.append(f'flutterpage_db_query_seconds_sum{{{labels}}} {hist.total:.6f}')
+            lines.append(f'flutterpage_db_query_seconds_count{{{labels}}} {hist.count}')
+
+    lines += [
+        '# HELP flutterpage_db_query_rows_total SQL返回或影响的行数',
+        '# TYPE flutterpage_db_query_rows_total counter'
+    ]
+    for (endpoint, fp), _, rows in snapshot:
+        labels = f'endpoint="{_escape_label(endpoint)}",fingerprint="{_escape_label(fp)}"'
+        lines.append(f'flutterpage_db_query_rows_total{{{labels}}} {rows}')
+
+    lines += [
+        '# HELP flutterpage_n_plus_one_total 单个请求内同一SQL指纹重复执行超过阈值的次数',
+        '# TYPE flutterpage_n_plus_one_total counter'
+    ]
+    for (endpoint, fp), count in n_plus_one.items():
+        labels = f'endpoint="{_escape_label(endpoint)}",fingerprint="{_escape_label(fp)}"'
+        lines.append(f'flutterpage_n_plus_one_total{{{labels}}} {count}')
+
+    lines += [
+        '# HELP flutterpage_slow_queries_total 超过慢查询阈值的SQL次数',
+        '# TYPE flutterpage_slow_queries_total counter'
+    ]
+    for endpoint, count in slow.items():
+        lines.append(f'flutterpage_slow_queries_total{{endpoint="{_escape_label(endpoint)}"}} {count}')
+
+    encode = get_encode_stats()
+    lines += [
+        '# HELP flutterpage_json_encode_seconds 响应JSON编码耗时',
+        '# TYPE flutterpage_json_encode_seconds summary'
+    ]
+    for endpoint, stats in encode.items():
+        labels = f'endpoint="{_escape_label(endpoint)}"'
+        lines.append(f'flutterpage_json_encode_seconds_sum{{{labels}}} {stats["total_ms"] / 1000:.6f}')
+        lines.append(f'flutterpage_json_encode_seconds_count{{{labels}}} {stats["count"]}')
+
+    lines += [
+        '# HELP flutterpage_json_encode_max_seconds 单次响应JSON编码的最大耗时',
+        '# TYPE flutterpage_json_encode_max_seconds gauge'
+    ]
+    for endpoint, stats in encode.items():
+        lines.append(f'flutterpage_json_encode_max_seconds{{endpoint="{_escape_label(endpoint)}"}} {stats["max_ms"] / 1000:.6f}')
+
+    lines += [
+        '# HELP flutterpage_json_response_bytes_total 编码输出的响应字节数',
+        '# TYPE flutterpage_json_response_bytes_total counter'
+    ]
+    for endpoint, stats in encode.items():
+        lines.append(f'flutterpage_json_response_bytes_total{{endpoint="{_escape_label(endpoint)}"}} {stats["bytes"]}')
+
+    return '\n'.join(lines) + '\n'
+
+
+def init_profiling(app):
+    """为Flask应用注册查询统计钩子和 /metrics 端点"""
+
+    @app.before_request
+    def start_profiling():
+        g.request_start = time.perf_counter()
+        g.profiled_queries = []
+
+    @app.after_request
+    def finish_profiling(response):
+        queries = g.get('profiled_queries', [])
+        endpoint = request.endpoint or 'unknown'
+
+        # 同一指纹在本请求中的执行次数
+        counts = {}
+        for fp, _, _ in queries:
+            counts[fp] = counts.get(fp, 0) + 1
+        repeated = {fp: n for fp, n in counts.items() if n > N_PLUS_ONE_THRESHOLD}
+        if repeated:
+            with _stats_lock:
+                for fp in repeated:
+                    n_plus_one_stats[(endpoint, fp)] = n_plus_one_stats.get((endpoint, fp), 0) + 1
+            response.headers['X-N-Plus-One'] = str(max(repeated.values()))
+            for fp, n in repeated.items():
+                logger.warning('N+1查询', endpoint=endpoint, fingerprint=fp, count=n)
+
+        db_ms = sum(elapsed for _, elapsed, _ in queries) * 1000
+        _append_server_timing(response, f'db;dur={db_ms:.3f};desc="{len(queries)} queries"')
+        if 'request_start' in g:
+            total_ms = (time.perf_counter() - g.request_start) * 1000
+            _append_server_timing(response, f'app;dur={total_ms:.3f}')
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+    return app
@@ -0,0 +1,340 @@
+# reading_events.py
+"""
+阅读事件时间序列
+- 每次阅读追加一条定长记录（时间、用户、小说、章节、时长、进度），只追加不修改
+- 按天分区：reading_events/YYYY-MM-DD/events-<进程号>.bin，多进程各写各的文件，互不加锁
+- 每天的数据汇总为按小时、按天的小说/章节统计（阅读次数、读者数、阅读时长），存为 rollup.json
+- 过去的日期汇总后不再变化，查询几个月的趋势只需读取对应天数的汇总
+- 有NumPy时用向量化计算汇总，没有时退回纯Python
+
+用法:
+    python reading_events.py rollup [YYYY-MM-DD]   汇总指定日期（默认昨天）
+    python reading_events.py rollup --all          汇总所有缺少汇总的日期
+"""
+import json
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from datetime import date, datetime, timedelta
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from async_log import get_logger
+
+# 事件存储目录
+EVENTS_DIR = os.environ.get('READING_EVENTS_DIR',
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'reading_events'))
+
+# 记录格式：时间戳(秒) 用户 小说 章节 时长(秒) 进度
+RECORD = struct.Struct('<qiiiii')
+FIELDS = ('ts', 'user', 'novel', 'chapter', 'duration', 'progress')
+if np is not None:
+    RECORD_DTYPE = np.dtype([('ts', '<i8'), ('user', '<i4'), ('novel', '<i4'),
+                             ('chapter', '<i4'), ('duration', '<i4'), ('progress', '<i4')])
+
+ROLLUP_FILE = 'rollup.json'
+
+# 已汇总日期的缓存：日期字符串 -> (汇总, 计算时间)；过去的日期计算时间为None，不再变化
+# 按最近使用淘汰，容量覆盖一次最长366天的趋势查询
+rollup_cache = {}
+ROLLUP_CACHE_DAYS = 400
+# 当天的汇总最多每隔这么多秒重算一次，趋势图允许这点延迟
+TODAY_ROLLUP_INTERVAL = 60
+_files = {}
+_files_lock = threading.Lock()
+
+logger = get_logger('reading_events')
+
+
+# ==================== 写入 ====================
+def _day_dir(day):
+    return os.path.join(EVENTS_DIR, day.isoformat())
+
+
+def _event_file(day):
+    """
+    该日期本进程的事件文件（O_APPEND，每条记录一次write），调用方需持有 _files_lock
+    打开新日期的文件时只关闭更早日期的文件，补写旧日期的事件不会关掉当天的文件
+    """
+    key = day.isoformat()
+    fd = _files.get(key)
+    if fd is None:
+        for old in [k for k in _files if k < key]:
+            os.close(_files.pop(old))
+        os.makedirs(_day_dir(day), exist_ok=True)
+        path = os.path.join(_day_dir(day), f'events-{os.getpid()}.bin')
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        _files[key] = fd
+    return fd
+
+
+def append(user_id, novel_id, chapter_id, duration=0, progress=0, ts=None):
+    """追加一条阅读事件；统计数据，写入失败只记日志不影响请求"""
+    ts = int(time.time() if ts is None else ts)
+    try:
+        record = RECORD.pack(ts, user_id, novel_id, chapter_id, int(duration or 0), int(progress or 0))
+        # 写入时持有锁：跨天关闭的fd号可能被其它连接复用，不能在别的线程写入途中关闭
+        with _files_lock:
+            os.write(_event_file(date.fromtimestamp(ts)), record)
+    except (OSError, struct.error) as e:
+        logger.warning('阅读事件写入失败', error=str(e))
+
+
+# ==================== 读取 ====================
+def _partition_files(day):
+    directory = _day_dir(day)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.startswith('events-') and name.endswith('.bin'))
+
+
+def load_partition(day):
+    """
+    读取一天的全部事件，返回按列的数组字典
+    写入中断留下的半条记录直接截掉
+    """
+    if np is not None:
+        parts = []
+        for path in _partition_files(day):
+            count = os.path.getsize(path) // RECORD.size
+            parts.append(np.fromfile(path, dtype=RECORD_DTYPE, count=count))
+        records = np.concatenate(parts) if parts else np.zeros(0, dtype=RECORD_DTYPE)
+        return {field: records[field] for field in FIELDS}
+
+    columns = {field: array('q' if field == 'ts' else 'i') for field in FIELDS}
+    for path in _partition_files(day):
+        with open(path, 'rb') as f:
+            data = f.read()
+        usable = len(data) - len(data) % RECORD.size
+        for record in RECORD.iter_unpack(data[:usable]):
+            for field, value in zip(FIELDS, record):
+                columns[field].append(value)
+    return columns
+
+
+# ==================== 汇总 ====================
+def _rollup_numpy(columns, key_field, day_start):
+    """按 (key, 小时) 汇总阅读次数、去重读者数和时长"""
+    keys = columns[key_field].astype(np.int64)
+    users = columns['user'].astype(np.int64)
+    hours = (columns['ts'] - day_start) // 3600
+    durations = columns['duration'].astype(np.int64)
+
+    hourly = {}
+    if len(keys):
+        # (key, 小时) 合成一个整数
+        combined = keys * 24 + hours
+        groups, inverse = np.unique(combined, return_inverse=True)
+        reads = np.bincount(inverse)
+        duration_sum = np.bincount(inverse, weights=durations)
+        # 去重读者：先对 (分组, 用户) 去重，再按分组计数
+        pairs = np.unique(inverse.astype(np.int64) << 32 | users)
+        readers = np.bincount(pairs >> 32, minlength=len(groups))
+        for group, r, u, d in zip(groups.tolist(), reads.tolist(), readers.tolist(), duration_sum.tolist()):
+            hourly.setdefault(str(group // 24), []).append([group % 24, r, u, int(d)])
+
+    daily = {}
+    if len(keys):
+        groups, inverse = np.unique(keys, return_inverse=True)
+        reads = np.bincount(inverse)
+        duration_sum = np.bincount(inverse, weights=durations)
+        pairs = np.unique(inverse.astype(np.int64) << 32 | users)
+        readers = np.bincount(pairs >> 32, minlength=len(groups))
+        for key, r, u, d in zip(groups.tolist(), reads.tolist(), readers.tolist(), duration_sum.tolist()):
+            daily[str(key)] = [r, u, int(d)]
+    return hourly, daily
+
+
+def _rollup_python(columns, key_field, day_start):
+    hourly_acc = {}
+    daily_acc = {}
+    for ts, user, key, duration in zip(columns['ts'], columns['user'], columns[key_field], columns['duration']):
+        hour = (ts - day_start) // 3600
+        for acc, group in ((hourly_acc, (key, hour)), (daily_acc, key)):
+            entry = acc.get(group)
+            if entry is None:
+                entry = acc[group] = [0, set(), 0]
+            entry[0] += 1
+            entry[1].add(user)
+            entry[2] += duration
+
+    hourly = {}
+    for (key, hour), (reads, users, duration) in sorted(hourly_acc.items()):
+        hourly.setdefault(str(key), []).append([hour, reads, len(users), duration])
+    daily = {str(key): [reads, len(users), duration]
+             for key, (reads, users, duration) in sorted(daily_acc.items())}
+    return hourly, daily
+
+
+def compute_rollup(day):
+    """汇总一天的事件：novel/chapter 各有 hourly（[小时, 次数, 读者, 时长]）和 daily（[次数, 读者, 时长]）"""
+    columns = load_partition(day)
+    day_start = int(datetime.combine(day, datetime.min.time()).timestamp())
+    rollup_func = _rollup_numpy if np is not None else _rollup_python
+
+    rollup = {'day': day.isoformat(), 'events': len(columns['ts'])}
+    for name, field in (('novel', 'novel'), ('chapter', 'chapter')):
+        hourly, daily = rollup_func(columns, field, day_start)
+        rollup[f'{name}_hourly'] = hourly
+        rollup[f'{name}_daily'] = daily
+    return rollup
+
+
+def build_rollup(day):
+    """计算并写入 rollup.json，过去的日期汇总后不再变化"""
+    rollup = compute_rollup(day)
+    directory = _day_dir(day)
+    if os.path.isdir(directory):
+        tmp_path = os.path.join(directory, ROLLUP_FILE + f'.{os.getpid()}.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(rollup, f, separators=(',', ':'))
+        os.replace(tmp_path, os.path.join(directory, ROLLUP_FILE))
+    _cache_rollup(day.isoformat(), rollup, None)
+    return rollup
+
+
+def _cache_rollup(key, rollup, computed_at):
+    """放入汇总缓存（放到最近使用的位置），超出容量时淘汰最久未用的日期"""
+    rollup_cache.pop(key, None)
+    while len(rollup_cache) >= ROLLUP_CACHE_DAYS:
+        try:
+            rollup_cache.pop(next(iter(rollup_cache)), None)
+        except (StopIteration, RuntimeError):
+            break
+    rollup_cache[key] = (rollup, computed_at)
+
+
+def get_rollup(day):
+    """读取一天的汇总：当天的汇总最多每 TODAY_ROLLUP_INTERVAL 秒重算一次，过去的日期优先读文件"""
+    key = day.isoformat()
+    today = date.today()
+
+    if day >= today:
+        cached = rollup_cache.get(key)
+        if cached is not None and time.monotonic() - cached[1] < TODAY_ROLLUP_INTERVAL:
+            return cached[0]
+        rollup = compute_rollup(day)
+        _cache_rollup(key, rollup, time.monotonic())
+        return rollup
+
+    # 跨天后昨天留下的带计算时间的缓存不完整，需要重新读取
+    cached = rollup_cache.get(key)
+    if cached is not None and cached[1] is None:
+        _cache_rollup(key, cached[0], None)
+        return cached[0]
+
+    path = os.path.join(_day_dir(day), ROLLUP_FILE)
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            rollup = json.load(f)
+        _cache_rollup(key, rollup, None)
+        return rollup
+
+    if not os.path.isdir(_day_dir(day)):
+        # 没有任何事件的日期
+        return None
+    return build_rollup(day)
+
+
+def count_unique_reads(columns):
+    """
+    按小说统计去重阅读：同一用户同一天重复阅读同一章节只算一次
+
+    >>> count_unique_reads({'user': [1, 1, 1, 2], 'novel': [5, 5, 5, 5], 'chapter': [9, 9, 10, 9]})
+    {5: 3}
+    """
+    if np is not None:
+        users = np.asarray(columns['user'], dtype=np.int64)
+        if not len(users):
+            return {}
+        # (用户, 章节) 合成一个整数去重，同一章节总属于同一本小说
+        pairs, first = np.unique(users << 32 | np.asarray(columns['chapter'], dtype=np.int64),
+                                 return_index=True)
+        novels, counts = np.unique(np.asarray(columns['novel'], dtype=np.int64)[first], return_counts=True)
+        return dict(zip(novels.tolist(), counts.tolist()))
+
+    counts = {}
+    for user, novel, chapter in set(zip(columns['user'], columns['novel'], columns['chapter'])):
+        counts[novel] = counts.get(novel, 0) + 1
+    return counts
+
+
+def unique_reads(day):
+    """一天内各小说的去重阅读数，用于按阅读量结算作者收入"""
+    return count_unique_reads(load_partition(day))
+
+
+# ==================== 查询 ====================
+def series(kind, key, days=30, granularity='day', end=None):
+    """
+    返回某本小说/某个章节最近若干天的趋势
+    granularity='day'：[{'time': 日期, 'reads', 'readers', 'duration'}]
+    granularity='hour'：按小时展开（读者数为该小时内去重）
+    """
+    end = end or date.today()
+    key = str(key)
+    points = []
+    for offset in range(days - 1, -1, -1):
+        day = end - timedelta(days=offset)
+        rollup = get_rollup(day)
+        if granularity == 'hour':
+            hours = {}
+            if rollup:
+                hours = {row[0]: row[1:] for row in rollup[f'{kind}_hourly'].get(key, [])}
+            for hour in range(24):
+                reads, readers, duration = hours.get(hour, (0, 0, 0))
+                points.append({
+                    'time': f'{day.isoformat()} {hour:02d}:00',
+                    'reads': reads,
+                    'readers': readers,
+                    'duration': duration
+                })
+        else:
+            reads, readers, duration = (rollup[f'{kind}_daily'].get(key, (0, 0, 0))
+                                        if rollup else (0, 0, 0))
+            points.append({
+                'time': day.isoformat(),
+                'reads': reads,
+                'readers': readers,
+                'duration': duration
+            })
+    return points
+
+
+def main(argv):
+    if len(argv) < 2 or argv[1] != 'rollup':
+        print(__doc__)
+        return 1
+
+    if len(argv) > 2 and argv[2] == '--all':
+        today = date.today()
+        days = []
+        if os.path.isdir(EVENTS_DIR):
+            for name in sorted(os.listdir(EVENTS_DIR)):
+                try:
+                    day = date.fromisoformat(name)
+                except ValueError:
+                    continue
+                if day < today and not os.path.exists(os.path.join(_day_dir(day), ROLLUP_FILE)):
+                    days.append(day)
+    else:
+        days = [date.fromisoformat(argv[2]) if len(argv) > 2 else date.today() - timedelta(days=1)]
+
+    for day in days:
+        started = time.perf_counter()
+        rollup = build_rollup(day)
+        print(f"✅ {day.isoformat()}: {rollup['events']} 条事件，"
+              f"{(time.perf_counter() - started) * 1000:.1f} ms"
+              f"（{'NumPy' if np is not None else '纯Python'}）")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
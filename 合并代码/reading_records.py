@@ -0,0 +1,76 @@
+# reading_records.py
+"""
+阅读记录写入
+- 8.py 的 update_reading 和 5.py 的翻页接口共用，两处的记录方式保持一致
+- 同时维护 reading_positions（继续阅读索引），首页不再需要对全部阅读记录做GROUP BY
+- 阅读事件（reading_events）用于阅读趋势统计和作者阅读收入结算，
+  由调用方在提交事务后调用 log_read 追加，回滚的阅读不会计入
+- record_read 只执行SQL，不提交，由调用方决定事务边界
+- 用户阅读历史按 idx_reading_user_last 范围读取，不扫描阅读事件分区
+"""
+from datetime import datetime, timedelta
+
+import reading_events
+
+
+def record_read(cursor, user_id, chapter_id, novel_id, progress=None, duration=0):
+    """
+    更新（或新建）用户在该章节的阅读记录，progress为None时保留原进度
+    cursor 需为 DictCursor，返回 (进度, 阅读时间)
+    """
+    cursor.execute("""
+        SELECT Record_id, Progress FROM reading_records
+        WHERE User_id = %s AND Chapter_id = %s
+    """, (user_id, chapter_id))
+    record = cursor.fetchone()
+    now = datetime.now()
+
+    if record:
+        progress = record['Progress'] if progress is None else min(100, max(0, progress))
+        cursor.execute("""
+            UPDATE reading_records
+            SET Progress = %s, Duration = Duration + %s, Last_read = %s
+            WHERE Record_id = %s
+        """, (progress, duration, now, record['Record_id']))
+    else:
+        progress = 0 if progress is None else min(100, max(0, progress))
+        cursor.execute("""
+            INSERT INTO reading_records (User_id, Chapter_id, Novel_id,
+                                        Progress, Duration, Last_read)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, (user_id, chapter_id, novel_id, progress, duration, now))
+
+    # 继续阅读索引：每个用户每本小说只保留最后阅读的位置
+    cursor.execute("""
+        INSERT INTO reading_positions (User_id, Novel_id, Chapter_id, Progress, Last_read)
+        VALUES (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            Chapter_id = VALUES(Chapter_id),
+            Progress = VALUES(Progress),
+            Last_read = VALUES(Last_read)
+    """, (user_id, novel_id, chapter_id, progress, now))
+
+    return progress, now
+
+
+def log_read(user_id, chapter_id, novel_id, progress, duration, read_at):
+    """事务提交后追加阅读事件，参数为 record_read 的入参及其返回的进度和阅读时间"""
+    reading_events.append(user_id, novel_id, chapter_id, duration, progress, read_at.timestamp())
+
+
+def user_history(cursor, user_id, days=7, limit=100):
+    """用户最近 days 天读过的章节（按最后阅读时间倒序），cursor 需为 DictCursor"""
+    cursor.execute("""
+        SELECT Novel_id, Chapter_id, Progress, Duration, Last_read
+        FROM reading_records
+        WHERE User_id = %s AND Last_read >= %s
+        ORDER BY Last_read DESC
+        LIMIT %s
+    """, (user_id, datetime.now() - timedelta(days=days), limit))
+    return [{
+        'time': row['Last_read'],
+        'novel_id': row['Novel_id'],
+        'chapter_id': row['Chapter_id'],
+        'duration': row['Duration'],
+        'progress': row['Progress']
+    } for row in cursor.fetchall()]
@@ -0,0 +1,43 @@
+# search_text.py
+"""
+搜索用的文本处理
+- normalize: 全角转半角、统一大小写、去掉空白，输入法和大小写不同的查询得到同一个键
+- normalize_query: 同上但保留单个空格，用于搜索关键词（空格分隔的词不能粘在一起）
+- pinyin_variants: 中文标题的全拼和首字母（pypinyin为可选依赖，未安装时不生成拼音）
+"""
+import unicodedata
+
+try:
+    from pypinyin import lazy_pinyin
+except ImportError:  # 未安装pypinyin时只按原文匹配
+    lazy_pinyin = None
+
+
+def normalize(text):
+    """NFKC（全角字母数字转半角）+ casefold，并去掉所有空白"""
+    if not text:
+        return ''
+    return ''.join(unicodedata.normalize('NFKC', text).casefold().split())
+
+
+def normalize_query(text):
+    """NFKC + casefold，首尾空白去掉，中间连续空白合并为一个空格"""
+    if not text:
+        return ''
+    return ' '.join(unicodedata.normalize('NFKC', text).casefold().split())
+
+
+def has_cjk(text):
+    return any('一' <= ch <= '鿿' or '㐀' <= ch <= '䶿' for ch in text)
+
+
+def pinyin_variants(text):
+    """
+    返回 (全拼, 首字母)，如 '斗破苍穹' -> ('doupocangqiong', 'dpcq')
+    不含中文或未安装pypinyin时返回空元组
+    """
+    if lazy_pinyin is None or not has_cjk(text):
+        return ()
+    syllables = [normalize(s) for s in lazy_pinyin(text)]
+    syllables = [s for s in syllables if s]
+    return ''.join(syllables), ''.join(s[0] for s in syllables)
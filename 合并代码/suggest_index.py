@@ -0,0 +1,272 @@
+# suggest_index.py
+"""
+搜索联想（边输入边提示）
+- 小说标题、作者用户名及其拼音全拼/首字母归一化后放入一个有序数组，前缀查询用二分查找定位区间
+- 区间内按热度（收藏数，作者为其作品收藏数之和）取前N条，结果（条目下标）按前缀缓存
+- 单字前缀区间最大，结果常驻不淘汰；其它前缀按最近使用淘汰
+- 新增小说时原地插入；热度只增不减，受影响前缀的缓存结果与新条目合并后原地更新，不需要清除
+- 其它进程新增的小说按 Novel_id 增量拉取；热度变化靠定期在后台整体重建
+"""
+import heapq
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+
+import pymysql
+
+from async_log import get_logger
+from search_text import normalize, pinyin_variants
+
+# 单次最多返回的联想条数
+SUGGEST_LIMIT = 10
+# 前缀结果缓存条数（不含常驻的单字前缀）
+PREFIX_CACHE_SIZE = 5000
+# 增量拉取新小说的间隔（秒）
+REFRESH_INTERVAL = 5
+# 整体重建（更新热度）的间隔（秒）
+REBUILD_INTERVAL = 600
+
+NOVEL = 'novel'
+AUTHOR = 'author'
+ICONS = {NOVEL: 'fas fa-book', AUTHOR: 'fas fa-user'}
+
+# 比任何字符都大，用于求前缀区间的上界
+_PREFIX_END = '\U0010ffff'
+
+logger = get_logger('search.suggest')
+
+_SUGGEST_ROWS_SQL = """
+    SELECT n.Novel_id, n.Title, u.User_id, u.Username,
+           COUNT(f.Favorite_id) AS favorites
+    FROM novels n
+    JOIN users u ON n.Author_id = u.User_id
+    LEFT JOIN favorites f ON f.Novel_id = n.Novel_id
+    WHERE n.Status = 'published' AND n.Novel_id > %s
+    GROUP BY n.Novel_id
+    ORDER BY n.Novel_id
+"""
+
+
+def _match_keys(text):
+    keys = {normalize(text), *pinyin_variants(text)}
+    keys.discard('')
+    return keys
+
+
+class SuggestIndex:
+    """有序键数组 + 条目表；keys[i] 对应条目 refs[i]"""
+
+    def __init__(self):
+        self.keys = []
+        self.refs = array('I')
+        # 条目按列存储
+        self.kinds = []
+        self.ids = array('i')
+        self.texts = []
+        self.weights = array('q')
+        self.item_keys = []
+        self.positions = {}
+        self.max_novel_id = 0
+        # 前缀 -> 热度最高的条目下标；单字前缀放在 pinned 中常驻
+        self.pinned = {}
+        self.cache = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.kinds)
+
+    # ---------- 构建 ----------
+    def _new_item(self, kind, item_id, text, weight, keys):
+        idx = len(self.kinds)
+        self.kinds.append(kind)
+        self.ids.append(item_id)
+        self.texts.append(text)
+        self.weights.append(weight)
+        self.item_keys.append(keys)
+        self.positions[(kind, item_id)] = idx
+        return idx
+
+    @classmethod
+    def build(cls, rows):
+        """rows: Novel_id/Title/User_id/Username/favorites，一次排序建好有序数组"""
+        index = cls()
+        pairs = []
+        for row in rows:
+            for idx, keys in index._collect(row):
+                pairs.extend((key, idx) for key in keys)
+        pairs.sort()
+        index.keys = [key for key, _ in pairs]
+        index.refs = array('I', (idx for _, idx in pairs))
+        # 单字前缀区间最大，建好后先算一遍常驻缓存
+        for first in {key[0] for key in index.keys}:
+            index.suggest(first)
+        return index
+
+    def _collect(self, row):
+        """登记一本小说及其作者，返回需要新插入的 (条目, 键集合)"""
+        weight = row['favorites'] or 0
+        added = []
+        self.max_novel_id = max(self.max_novel_id, row['Novel_id'])
+
+        author = self.positions.get((AUTHOR, row['User_id']))
+        if author is None:
+            keys = _match_keys(row['Username'])
+            author = self._new_item(AUTHOR, row['User_id'], row['Username'], weight, keys)
+            added.append((author, keys))
+        else:
+            self.weights[author] += weight
+
+        if (NOVEL, row['Novel_id']) not in self.positions:
+            keys = _match_keys(row['Title'])
+            novel = self._new_item(NOVEL, row['Novel_id'], f"{row['Title']} - {row['Username']}", weight, keys)
+            added.append((novel, keys))
+        return added
+
+    def add(self, row):
+        """插入一本小说（原地插入有序数组），并把新条目合并进受影响前缀的缓存结果"""
+        with self._lock:
+            touched = []
+            for idx, keys in self._collect(row):
+                for key in keys:
+                    pos = bisect_right(self.keys, key)
+                    self.keys.insert(pos, key)
+                    self.refs.insert(pos, idx)
+                touched.append(idx)
+            # 作者热度增加也会影响作者名前缀下的排序
+            author = self.positions[(AUTHOR, row['User_id'])]
+            if author not in touched:
+                touched.append(author)
+
+            # 其它条目热度不变，原来的前N条加上变化的条目重新取前N条即为新结果
+            for idx in touched:
+                for key in self.item_keys[idx]:
+                    for end in range(1, len(key) + 1):
+                        prefix = key[:end]
+                        cache = self.pinned if end == 1 else self.cache
+                        top = cache.get(prefix)
+                        if top is not None:
+                            cache[prefix] = self._top_of(set(top) | {idx})
+
+    # ---------- 查询 ----------
+    def _top_of(self, candidates):
+        weights = self.weights
+        return heapq.nlargest(SUGGEST_LIMIT, candidates, key=lambda i: (weights[i], -i))
+
+    def _cached(self, prefix):
+        if len(prefix) == 1:
+            return self.pinned.get(prefix)
+        top = self.cache.pop(prefix, None)
+        if top is not None:
+            # 重新放到末尾，淘汰时从最久未用的开始
+            self.cache[prefix] = top
+        return top
+
+    def _store(self, prefix, top):
+        if len(prefix) == 1:
+            self.pinned[prefix] = top
+            return
+        while len(self.cache) >= PREFIX_CACHE_SIZE:
+            try:
+                self.cache.pop(next(iter(self.cache)), None)
+            except (StopIteration, RuntimeError):
+                break
+        self.cache[prefix] = top
+
+    def suggest(self, query, limit=SUGGEST_LIMIT):
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        limit = min(limit, SUGGEST_LIMIT)
+
+        top = self._cached(prefix)
+        if top is None:
+            with self._lock:
+                lo = bisect_left(self.keys, prefix)
+                hi = bisect_left(self.keys, prefix + _PREFIX_END, lo)
+                # 同一条目可能由原文和拼音多个键命中，先去重再取热度最高的
+                top = self._top_of(set(self.refs[lo:hi]))
+                self._store(prefix, top)
+        return [{
+            'type': self.kinds[i],
+            'id': self.ids[i],
+            'text': self.texts[i],
+            'icon': ICONS[self.kinds[i]]
+        } for i in top[:limit]]
+
+
+# 当前使用的索引（整体重建时直接替换）
+suggest_index = None
+_last_refresh = 0.0
+_last_rebuild = 0.0
+_refresh_lock = threading.Lock()
+_rebuilding = False
+
+
+def _load_rows(connect, after_id=0):
+    conn = connect()
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    try:
+        cursor.execute(_SUGGEST_ROWS_SQL, (after_id,))
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def rebuild(connect):
+    """从数据库整体重建（包括最新热度）"""
+    global suggest_index, _last_rebuild, _last_refresh, _rebuilding
+    try:
+        started = time.perf_counter()
+        index = SuggestIndex.build(_load_rows(connect))
+        suggest_index = index
+        _last_rebuild = _last_refresh = time.time()
+        logger.info('联想索引重建完成', items=len(index), keys=len(index.keys),
+                    ms=round((time.perf_counter() - started) * 1000, 1))
+        return index
+    finally:
+        _rebuilding = False
+
+
+def get_index(connect):
+    """
+    返回可用的联想索引；首次调用时同步构建
+    之后按间隔增量拉取新小说，到期的整体重建放到后台线程，期间继续使用旧索引
+    """
+    global _last_refresh, _rebuilding
+    index = suggest_index
+    if index is None:
+        with _refresh_lock:
+            if suggest_index is None:
+                return rebuild(connect)
+            return suggest_index
+
+    now = time.time()
+    if now - _last_refresh >= REFRESH_INTERVAL and _refresh_lock.acquire(blocking=False):
+        try:
+            if now - _last_rebuild >= REBUILD_INTERVAL and not _rebuilding:
+                _rebuilding = True
+                threading.Thread(target=rebuild, args=(connect,), daemon=True).start()
+            else:
+                for row in _load_rows(connect, index.max_novel_id):
+                    index.add(row)
+            _last_refresh = now
+        except Exception as e:
+            logger.warning('联想索引刷新失败', error=str(e))
+        finally:
+            _refresh_lock.release()
+    return index
+
+
+def add_novel(novel_id, title, author_id, author_name, favorites=0):
+    """add_novel 成功后调用，只更新本进程已建立的索引"""
+    index = suggest_index
+    if index is not None and author_name:
+        index.add({
+            'Novel_id': novel_id,
+            'Title': title,
+            'User_id': author_id,
+            'Username': author_name,
+            'favorites': favorites
+        })
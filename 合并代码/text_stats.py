@@ -0,0 +1,182 @@
+# text_stats.py
+"""
+中日韩文本统计
+- 字数 = 中日韩文字数 + 拉丁单词数，标点和空白不计入
+- 同时统计标点数和段落数
+- 不逐字符循环：文本编码为UTF-16后拆成高字节和低字节两个序列，
+  分别用256项查表（bytes.translate）得到候选类别位，再按位与得到每个字符的类别，
+  计数和单词边界判断都用大整数位运算在C层完成，不需要逐字符的正则匹配
+- 只含空白（包括全角空格）的行不算段落；这类行较少，用一次正则单独统计
+"""
+import re
+
+# ==================== 字符类别定义 ====================
+# 每条规则：(类别位, 高字节集合, 低字节集合)，高低字节同时命中时该字符具有此类别位
+# 一组规则最多8个类别位，所以分成A、B两组
+ALL_BYTES = range(256)
+
+# 中日韩文字所在的整块区域（按UTF-16高字节）：注音/谚文字母/汉字扩展A/基本汉字、谚文音节、兼容汉字
+CJK_BLOCKS = set(range(0x31, 0xA0)) | set(range(0xAC, 0xD8)) | {0xF9, 0xFA}
+
+ASCII_PUNCT = set(b'!"#$%&\'()*+,-./:;<=>?@[\\]^_`{|}~')
+ASCII_ALNUM = set(b'0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz')
+
+# 全角标点 U+FF01-FF0F, FF1A-FF20, FF3B-FF40, FF5B-FF65
+FULLWIDTH_PUNCT = (set(range(0x01, 0x10)) | set(range(0x1A, 0x21)) |
+                   set(range(0x3B, 0x41)) | set(range(0x5B, 0x66)))
+# 全角数字和字母
+FULLWIDTH_ALNUM = set(range(0x10, 0x1A)) | set(range(0x21, 0x3B)) | set(range(0x41, 0x5B))
+
+# A组：中日韩文字、标点、换行
+CJK = 0x01
+KANA = 0x02          # U+3040-30FF 假名
+CJK_SUPP = 0x04      # U+20000-3FFFF 扩展区汉字，只统计代理对的高位
+PUNCT_CJK = 0x08     # U+3001-303F 中日韩标点
+PUNCT_FULL = 0x10    # 全角标点
+PUNCT_GENERAL = 0x20  # U+2010-205E 通用标点（破折号、引号、省略号等）
+PUNCT_ASCII = 0x40   # ASCII和Latin-1标点
+NEWLINE = 0x80
+
+RULES_A = [
+    (CJK, CJK_BLOCKS, ALL_BYTES),
+    (KANA, {0x30}, range(0x40, 0x100)),
+    (CJK_SUPP, {0xD8}, range(0x40, 0xC0)),
+    (PUNCT_CJK, {0x30}, range(0x01, 0x40)),
+    (PUNCT_FULL, {0xFF}, FULLWIDTH_PUNCT),
+    (PUNCT_GENERAL, {0x20}, set(range(0x10, 0x5F)) - set(range(0x28, 0x30))),
+    (PUNCT_ASCII, {0x00}, ASCII_PUNCT | set(range(0xA1, 0xC0))),
+    (NEWLINE, {0x00}, {0x0A}),
+]
+
+# B组：拉丁单词
+WORD_ASCII = 0x01     # ASCII字母数字和Latin-1字母
+WORD_EXT = 0x02       # U+0100-05FF 拉丁扩展、希腊文、西里尔文等
+WORD_FULL = 0x04      # 全角字母数字
+JOIN_ASCII = 0x08     # 单词内部的连接符 ' -
+JOIN_GENERAL = 0x10   # ‐ ‑ ’
+
+RULES_B = [
+    (WORD_ASCII, {0x00}, ASCII_ALNUM | (set(range(0xC0, 0x100)) - {0xD7, 0xF7})),
+    (WORD_EXT, set(range(0x01, 0x06)), ALL_BYTES),
+    (WORD_FULL, {0xFF}, FULLWIDTH_ALNUM),
+    (JOIN_ASCII, {0x00}, {0x27, 0x2D}),
+    (JOIN_GENERAL, {0x20}, {0x10, 0x11, 0x19}),
+]
+
+CJK_BITS = CJK | KANA | CJK_SUPP
+PUNCT_BITS = PUNCT_CJK | PUNCT_FULL | PUNCT_GENERAL | PUNCT_ASCII
+WORD_BITS = WORD_ASCII | WORD_EXT | WORD_FULL
+JOIN_BITS = JOIN_ASCII | JOIN_GENERAL
+
+
+def _build_tables(rules):
+    hi = bytearray(256)
+    lo = bytearray(256)
+    for bit, hi_set, lo_set in rules:
+        for b in hi_set:
+            hi[b] |= bit
+        for b in lo_set:
+            lo[b] |= bit
+    return bytes(hi), bytes(lo)
+
+
+HI_A, LO_A = _build_tables(RULES_A)
+HI_B, LO_B = _build_tables(RULES_B)
+
+
+def _classify(hi, lo, hi_table, lo_table):
+    """高低字节分别查表后按位与，结果是大整数，每个字符对应其中一个字节"""
+    return (int.from_bytes(hi.translate(hi_table), 'big') &
+            int.from_bytes(lo.translate(lo_table), 'big'))
+
+
+# 每个字节最低位为1的掩码，按目前最长文本缓存，较短文本直接右移截取
+_ones = {'size': 0, 'value': 0}
+
+
+def _ones_mask(n):
+    if n > _ones['size']:
+        size = max(n, 2 * _ones['size'], 65536)
+        _ones['value'] = int.from_bytes(b'\x01' * size, 'big')
+        _ones['size'] = size
+    return _ones['value'] >> (8 * (_ones['size'] - n))
+
+
+# 换行后只有空白（不含换行本身）直到下一个换行或文本结尾的行，以及开头这样的行
+_SPACE_LINE = re.compile(r'\n[^\S\n]+(?=\n|$)')
+_LEADING_SPACE_LINE = re.compile(r'[^\S\n]+(?:\n|$)')
+
+
+def _count_bits(value):
+    return value.bit_count() if hasattr(value, 'bit_count') else bin(value).count('1')
+
+
+def _count_latin_words(classes, ones):
+    """
+    单词开头 = 单词字符，且前一个字符不是单词字符，
+    也不是夹在单词字符之后的连接符（如 it's、e-mail 算一个词）
+    右移8位即对齐到前一个字符
+    """
+    # 同一字符的单词位/连接位互斥，归一到每字节最低位
+    word = (classes | classes >> 1 | classes >> 2) & ones
+    if not word:
+        return 0
+    join = (classes >> 3 | classes >> 4) & ones
+    starts = word & ~(word >> 8) & ~((join >> 8) & (word >> 16))
+    return _count_bits(starts)
+
+
+def text_stats(text):
+    """
+    返回文本统计：
+    word_count  字数（中日韩文字 + 拉丁单词）
+    cjk_chars   中日韩文字数
+    latin_words 拉丁单词数
+    punctuation 标点数
+    paragraphs  段落数（含非空白字符的行数）
+    """
+    if not text:
+        return {
+            'word_count': 0, 'cjk_chars': 0, 'latin_words': 0,
+            'punctuation': 0, 'paragraphs': 0
+        }
+
+    if '\r' in text:
+        text = text.replace('\r\n', '\n')
+
+    encoded = text.encode('utf-16-be', 'surrogatepass')
+    hi = encoded[0::2]
+    lo = encoded[1::2]
+
+    # 乘以类别位即得到该类别的掩码
+    ones = _ones_mask(len(hi))
+
+    classes_a = _classify(hi, lo, HI_A, LO_A)
+    classes_b = _classify(hi, lo, HI_B, LO_B)
+
+    # 同组内各类别位按高字节区分，一个字符最多命中一位，直接数1的个数
+    cjk_chars = _count_bits(classes_a & ones * CJK_BITS)
+    punctuation = _count_bits(classes_a & ones * PUNCT_BITS)
+    latin_words = _count_latin_words(classes_b, ones)
+
+    # 段落数 = 行数 - 空行数；空行即紧跟在换行符后的换行符，以及开头、结尾的空行
+    newline = classes_a >> 7 & ones
+    blank = _count_bits(newline & (newline >> 8)) + (text[0] == '\n') + (text[-1] == '\n')
+    # 再减去只有空白字符的行
+    blank += len(_SPACE_LINE.findall(text))
+    if _LEADING_SPACE_LINE.match(text):
+        blank += 1
+    paragraphs = _count_bits(newline) + 1 - blank
+
+    return {
+        'word_count': cjk_chars + latin_words,
+        'cjk_chars': cjk_chars,
+        'latin_words': latin_words,
+        'punctuation': punctuation,
+        'paragraphs': paragraphs
+    }
+
+
+def count_words(text):
+    """章节字数（存入 chapters.Word_count）"""
+    return text_stats(text)['word_count']
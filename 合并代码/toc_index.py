@@ -0,0 +1,169 @@
+# toc_index.py
+"""
+小说目录（TOC）内存索引
+- 每本小说一个索引，章节ID/章节号/字数/更新时间存为紧凑的 array，按章节号有序
+- 所有标题拼成一个字符串表，按偏移量数组切片取出
+- 支持按章节号区间查询（二分查找），以及带版本号的完整目录（压缩结果随索引缓存）
+- add_chapter 时在末尾原地追加，插到中间时构建新索引替换；
+  其它写操作（导入、发布草稿）直接丢弃索引，下次访问时重建
+"""
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+
+from compression import PrecompressedBody
+from json_response import dumps
+
+# 最多保留的小说索引数
+TOC_INDEX_SIZE = 200
+
+# novel_id -> TocIndex
+toc_indexes = {}
+_index_lock = threading.Lock()
+
+
+def _timestamp(value):
+    return int(value.timestamp()) if value else 0
+
+
+class TocIndex:
+    """单本小说的目录，rows 需按 Chapter_num 升序"""
+
+    def __init__(self, novel_id, rows, novel_updated):
+        self.novel_id = novel_id
+        # 构建索引时 novels.Updated_at 的值，数据库中的值更新后索引失效
+        self.novel_updated = novel_updated
+        self.ids = array('i')
+        self.nums = array('i')
+        self.words = array('i')
+        self.updated = array('q')
+        self.title_offsets = array('I', [0])
+        self.latest = 0
+        self._lock = threading.Lock()
+        self._blob = None
+
+        titles = []
+        for row in rows:
+            self.ids.append(row['Chapter_id'])
+            self.nums.append(row['Chapter_num'])
+            self.words.append(row['Word_count'] or 0)
+            self.updated.append(_timestamp(row['Updated_at']))
+            titles.append(row['Title'])
+            self.title_offsets.append(self.title_offsets[-1] + len(row['Title']))
+        self.titles = ''.join(titles)
+        if self.updated:
+            self.latest = max(self.updated)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def version(self):
+        """
+        目录版本号：最近更新时间（秒）左移20位再加章节数
+        同一秒内连续添加章节时章节数不同，版本号仍然递增
+        """
+        return (self.latest << 20) | (len(self.ids) & 0xFFFFF)
+
+    def title(self, i):
+        return self.titles[self.title_offsets[i]:self.title_offsets[i + 1]]
+
+    def row(self, i):
+        return {
+            'Chapter_id': self.ids[i],
+            'Chapter_num': self.nums[i],
+            'Title': self.title(i),
+            'Word_count': self.words[i],
+            'Updated_at': datetime.fromtimestamp(self.updated[i])
+        }
+
+    def rows(self, start=0, end=None):
+        return [self.row(i) for i in range(start, len(self.ids) if end is None else end)]
+
+    def range(self, first_num, last_num):
+        """章节号在 [first_num, last_num] 内的章节"""
+        return self.rows(bisect_left(self.nums, first_num), bisect_right(self.nums, last_num))
+
+    def position(self, chapter_id):
+        """章节在目录中的下标，不存在时返回None"""
+        try:
+            return self.ids.index(chapter_id)
+        except ValueError:
+            return None
+
+    def append(self, row, novel_updated):
+        """
+        在末尾追加章节并返回自身；章节号不在末尾时返回按新目录构建的新索引，
+        由调用方替换，正在读取旧索引的请求不受影响
+        """
+        with self._lock:
+            if self.nums and row['Chapter_num'] < self.nums[-1]:
+                rows = self.rows() + [row]
+                rows.sort(key=lambda r: r['Chapter_num'])
+                return TocIndex(self.novel_id, rows, novel_updated)
+
+            self.ids.append(row['Chapter_id'])
+            self.nums.append(row['Chapter_num'])
+            self.words.append(row['Word_count'] or 0)
+            self.updated.append(_timestamp(row['Updated_at']))
+            self.titles += row['Title']
+            self.title_offsets.append(len(self.titles))
+            self.latest = max(self.latest, self.updated[-1])
+            self.novel_updated = novel_updated
+            self._blob = None
+            return self
+
+    def blob(self):
+        """完整目录，按列存储以减小体积，压缩结果随索引缓存"""
+        blob = self._blob
+        if blob is None:
+            with self._lock:
+                blob = PrecompressedBody(dumps({
+                    'status': 'success',
+                    'novel_id': self.novel_id,
+                    'version': self.version,
+                    'total': len(self.ids),
+                    'columns': ['Chapter_id', 'Chapter_num', 'Title', 'Word_count'],
+                    'ids': self.ids.tolist(),
+                    'nums': self.nums.tolist(),
+                    'titles': [self.title(i) for i in range(len(self.ids))],
+                    'words': self.words.tolist()
+                }))
+                self._blob = blob
+        return blob
+
+
+def get_index(novel_id, novel_updated, load_rows):
+    """
+    返回最新的目录索引
+    novel_updated: 数据库中 novels.Updated_at；load_rows(): 按章节号升序查询目录行
+    """
+    index = toc_indexes.get(novel_id)
+    if (index is not None and novel_updated is not None and index.novel_updated is not None
+            and index.novel_updated >= novel_updated):
+        return index
+
+    index = TocIndex(novel_id, load_rows(), novel_updated)
+    with _index_lock:
+        while len(toc_indexes) >= TOC_INDEX_SIZE and novel_id not in toc_indexes:
+            toc_indexes.pop(next(iter(toc_indexes)), None)
+        toc_indexes[novel_id] = index
+    return index
+
+
+def add_chapter(novel_id, row, novel_updated):
+    """add_chapter 成功后调用，只更新已建立的索引"""
+    index = toc_indexes.get(novel_id)
+    if index is None:
+        return
+    updated = index.append(row, novel_updated)
+    if updated is not index:
+        with _index_lock:
+            # 期间索引被丢弃或替换时不再放回
+            if toc_indexes.get(novel_id) is index:
+                toc_indexes[novel_id] = updated
+
+
+def invalidate(novel_id):
+    toc_indexes.pop(novel_id, None)